@@ -7,6 +7,7 @@ from app.routers.auth import  oauth2_scheme
 
 #import models
 from app.models.basic_auth_models import TokenData, User
+from app.services.user_cache import verified_users
 
 #import constants
 from app.settings import Oauth2Settings, DatabaseSettings
@@ -15,21 +16,20 @@ SECRET_KEY = Oauth2Settings.SECRET_KEY.value
 
 #database dependency
 from app.dependencies.db_dependencies import get_db
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
+from app.repositories import users as users_repository
+from app.repositories.projections import EXISTS
+from motor.motor_asyncio import AsyncIOMotorDatabase
 import os
 
-db_dependency = Annotated[MongoClient, Depends(get_db)] # for use: db: db_dependency
+db_dependency = Annotated[AsyncIOMotorDatabase, Depends(get_db)] # for use: db: db_dependency
 
 # Verify if the username exists in the database
-def get_user(username: str, db: MongoClient ):
-    users_collection = db["users"] # get access to the "users" collection
-
+async def get_user(username: str, db: AsyncIOMotorDatabase):
     # check if the username exists in the database
-    user = users_collection.find_one({"username": username})
+    user = await users_repository.find_user(db, username, EXISTS)
     if user is None:
         return False # the username does not exist
-    return User(username=user["username"])
+    return User(username=username)
 
 # Verify if the user is authenticated with the jwt token and return the username if it is authenticated
 # It is a dependency for authenticated routes
@@ -48,8 +48,13 @@ async def get_current_user(db: db_dependency,token: Annotated[str, Depends(oauth
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(username=token_data.username, db=db)
-    if user is None:
+    # the signature of the token is already verified, the database is only checked when the user is not cached
+    user = verified_users.get(token_data.username)
+    if user is not None:
+        return user
+    user = await get_user(username=token_data.username, db=db)
+    if not user:
         raise credentials_exception
+    verified_users.set(token_data.username, user)
     return user
 
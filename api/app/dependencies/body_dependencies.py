@@ -0,0 +1,56 @@
+# Request bodies validated straight into the documents that are inserted in the database,
+# see the TypedDicts of app/models/work_out.py
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.models.work_out import workout_adapter, plan_adapter
+
+def validation_errors(error: ValidationError, prefix: tuple = ("body",)):
+    """
+    The errors of pydantic in the format of the 422 responses of FastAPI
+    """
+    return [{**detail, "loc": (*prefix, *detail["loc"])} for detail in error.errors(include_url=False, include_context=False)]
+
+async def validate_body(request: Request, adapter: TypeAdapter):
+    try:
+        return adapter.validate_json(await request.body())
+    except ValidationError as error:
+        raise RequestValidationError(validation_errors(error))
+
+async def workout_body(request: Request) -> dict:
+    return await validate_body(request, workout_adapter)
+
+async def plan_body(request: Request) -> dict:
+    return await validate_body(request, plan_adapter)
+
+def inline_schema(model: type[BaseModel]):
+    """
+    JSON schema of the model with the nested models written in place, for the "openapi_extra" of the routes
+    that read the body themselves (FastAPI only adds the models of the declared parameters to the components)
+    """
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(definitions[node["$ref"].split("/")[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
+def openapi_body(model: type[BaseModel], bulk: bool = False):
+    """
+    "openapi_extra" that documents a body of the model, or a JSON array / NDJSON of them when bulk
+    """
+    schema = inline_schema(model)
+    if bulk:
+        content = {"application/json": {"schema": {"type": "array", "items": schema}},
+                   "application/x-ndjson": {"schema": schema}}
+    else:
+        content = {"application/json": {"schema": schema}}
+    return {"requestBody": {"required": True, "content": content}}
@@ -1,21 +1,102 @@
 import os
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
-from app.settings import DatabaseSettings
+import asyncio
+import logging
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+from app.settings import DatabaseSettings, MetricsSettings
+from app.services.metrics import MongoCommandListener
 
-# Dependency to initialize the database client
-def get_db():
-    mongo_db = None
+logger = logging.getLogger("uvicorn.error")
+
+# One pooled asyncio client (Motor) per worker process, shared by every router.
+# It is created by the lifespan of the app (see app/main.py) or lazily on first use.
+_mongo_client = None
+
+def get_mongo_uri():
+    if DatabaseSettings.MONGO_URI.value is not None:
+        return DatabaseSettings.MONGO_URI.value
     if os.environ.get("PRODUCTION") == "True":
-        uri = f"mongodb+srv://{DatabaseSettings.MONGO_USERNAME.value}:{DatabaseSettings.MONGO_PASSWORD.value}@{DatabaseSettings.MONGO_CLUSTER.value}/?retryWrites=true&w=majority&appName=ClusterSportReg"
-        mongo_db = MongoClient(uri)
+        return f"mongodb+srv://{DatabaseSettings.MONGO_USERNAME.value}:{DatabaseSettings.MONGO_PASSWORD.value}@{DatabaseSettings.MONGO_CLUSTER.value}/?retryWrites=true&w=majority&appName=ClusterSportReg"
+    return "mongodb://bd-sportreg-dev:27017/"
+
+def get_mongo_client_options():
+    """
+    Keyword arguments for the client: pool size, timeouts and credentials
+    """
+    uri = get_mongo_uri()
+    options = {
+        "maxPoolSize": DatabaseSettings.MONGO_MAX_POOL_SIZE.value,
+        "minPoolSize": DatabaseSettings.MONGO_MIN_POOL_SIZE.value,
+        "maxIdleTimeMS": DatabaseSettings.MONGO_MAX_IDLE_TIME_MS.value,
+        "connectTimeoutMS": DatabaseSettings.MONGO_CONNECT_TIMEOUT_MS.value,
+        "serverSelectionTimeoutMS": DatabaseSettings.MONGO_SERVER_SELECTION_TIMEOUT_MS.value,
+        "socketTimeoutMS": DatabaseSettings.MONGO_SOCKET_TIMEOUT_MS.value,
+    }
+    if MetricsSettings.ENABLED.value:
+        options["event_listeners"] = [MongoCommandListener()]
+    if uri.startswith("mongodb+srv://"):
+        if DatabaseSettings.MONGO_SRV_MAX_HOSTS.value > 0:
+            options["srvMaxHosts"] = DatabaseSettings.MONGO_SRV_MAX_HOSTS.value
+    elif DatabaseSettings.MONGO_URI.value is None:
+        # development database, the credentials are not in the uri
+        options["username"] = DatabaseSettings.MONGO_USERNAME.value
+        options["password"] = DatabaseSettings.MONGO_PASSWORD.value
+    return options
 
+def get_mongo_client():
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = AsyncIOMotorClient(get_mongo_uri(), **get_mongo_client_options())
+    return _mongo_client
+
+async def ping_db(attempts: int = 1, delay: float = 0):
+    """
+    Check that the database answers, retrying a few times. Returns True if it does.
+    """
+    client = get_mongo_client()
+    for attempt in range(1, attempts + 1):
+        try:
+            await client.admin.command("ping")
+            return True
+        except PyMongoError as error:
+            logger.warning(f"MongoDB ping failed (attempt {attempt}/{attempts}): {error}")
+            if attempt < attempts:
+                await asyncio.sleep(delay)
+    return False
+
+async def init_db():
+    """
+    Create the shared client and check the connection, called on startup. Returns True if the database answers.
+    In production the app does not start without a database.
+    """
+    get_mongo_client()
+    if await ping_db(DatabaseSettings.MONGO_STARTUP_PING_ATTEMPTS.value,
+                     DatabaseSettings.MONGO_STARTUP_PING_DELAY_SECONDS.value):
+        logger.info("MongoDB connection pool ready")
+        return True
+    elif os.environ.get("PRODUCTION") == "True":
+        raise RuntimeError("Could not connect to MongoDB")
     else:
-        mongo_db = MongoClient("mongodb://bd-sportreg-dev:27017/",
-                                   username=DatabaseSettings.MONGO_USERNAME.value,
-                                   password=DatabaseSettings.MONGO_PASSWORD.value)
+        logger.error("MongoDB is not reachable, requests that use the database will fail")
+        return False
 
-    # Get the database
-    mongo_db = mongo_db["sportreg"]
+def close_db():
+    """
+    Close the shared client and its pool, called on shutdown.
+    """
+    global _mongo_client
+    if _mongo_client is not None:
+        _mongo_client.close()
+        _mongo_client = None
 
-    return mongo_db
+def reset_after_fork():
+    """
+    Forget the client of the parent process without closing it (its sockets are shared with the parent),
+    the worker creates its own pool. Called by gunicorn after forking a worker.
+    """
+    global _mongo_client
+    _mongo_client = None
+
+# Dependency to get the database from the shared client
+def get_db():
+    return get_mongo_client()[DatabaseSettings.MONGO_DATABASE.value]
@@ -0,0 +1,52 @@
+"""
+Production server: gunicorn with uvicorn workers, one per CPU by default (WEB_CONCURRENCY), so bcrypt,
+the markdown rendering and the validation of large bodies use every core. Run it from the api directory (/code in the container):
+
+    gunicorn app.main:app -c app/gunicorn_conf.py
+
+Every worker runs the lifespan of the app, so it creates its own MongoDB pool and thread pools after the fork.
+The pools of the settings (HASHING_WORKERS, MARKDOWN_EXPORT_WORKERS) are per worker, by default the CPUs are shared between them.
+Send SIGHUP to the gunicorn process for a rolling restart: new workers are started and the old ones finish
+their requests (GRACEFUL_TIMEOUT) before exiting. A worker is also replaced after MAX_REQUESTS, which caps its memory.
+"""
+import os
+import shutil
+import tempfile
+
+cpus = os.cpu_count() or 1
+workers = int(os.environ.get("WEB_CONCURRENCY") or cpus)
+
+# before app.settings is imported, the workers inherit the modules of the arbiter
+os.environ.setdefault("HASHING_WORKERS", str(max(1, cpus // workers)))
+os.environ.setdefault("MARKDOWN_EXPORT_WORKERS", str(max(1, cpus // workers)))
+if workers > 1:
+    # the metrics of every worker are written to this directory and added up by /metrics
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "sportreg-metrics"))
+
+from app.settings import ServingSettings
+
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = ServingSettings.BIND.value
+max_requests = ServingSettings.MAX_REQUESTS.value
+max_requests_jitter = ServingSettings.MAX_REQUESTS_JITTER.value
+graceful_timeout = ServingSettings.GRACEFUL_TIMEOUT.value
+timeout = ServingSettings.TIMEOUT.value
+keepalive = ServingSettings.KEEPALIVE.value
+accesslog = "-"
+
+def on_starting(server):
+    # the files of the workers of a previous run would be added to the metrics
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+def post_fork(server, worker):
+    # only matters with --preload, when the arbiter imported the app before forking
+    from app.dependencies.db_dependencies import reset_after_fork
+    reset_after_fork()
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,9 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .routers import workouts, plans, markdown, auth
+from fastapi.responses import Response, JSONResponse
+from .routers import workouts, plans, markdown, auth, stats
+from .dependencies.db_dependencies import init_db, close_db, get_db, ping_db
+from .repositories.indexes import ensure_indexes
+from .repositories.storage import ReservedUsernameError
+from .services.passwords import shutdown_executor as shutdown_passwords_executor
+from .services.markdown_export import shutdown_executor as shutdown_markdown_export_executor
+from .services.metrics import MetricsMiddleware, get_latest_metrics
+from .services.compression import CompressionMiddleware
+from .settings import MetricsSettings, CompressionSettings
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	# one pooled MongoDB client per worker, shared by all the routers
+	if await init_db():
+		await ensure_indexes(get_db())
+	yield
+	close_db()
+	shutdown_passwords_executor()
+	shutdown_markdown_export_executor()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,11 +34,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if CompressionSettings.ENABLED.value:
+    app.add_middleware(CompressionMiddleware)
+
+# added last so it is the outermost middleware and times everything
+if MetricsSettings.ENABLED.value:
+    app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(ReservedUsernameError)
+async def reserved_username_handler(request, error: ReservedUsernameError):
+	# a "current_user" that names a collection of the api, it has no workouts
+	return JSONResponse(status_code=400, content={"detail": "Invalid username"})
+
 #include routers
 app.include_router(auth.router)
 app.include_router(workouts.router)
 app.include_router(plans.router)
 app.include_router(markdown.router)
+app.include_router(stats.router)
 
 @app.get("/")
 def get_state_prod_or_develop():
@@ -29,3 +62,21 @@ def get_state_prod_or_develop():
 		return {"State": "Production"}
 	else:
  		return {"State": "Development"}
+
+@app.get("/ready", include_in_schema=False)
+async def get_ready():
+	"""
+	Readiness of the worker for the load balancer or the orchestrator: 503 while the database does not answer
+	"""
+	if await ping_db():
+		return {"State": "Ready"}
+	return JSONResponse(status_code=503, content={"State": "Database unavailable"})
+
+if MetricsSettings.ENABLED.value:
+	@app.get("/metrics", include_in_schema=False)
+	def get_metrics():
+		"""
+		Metrics in the Prometheus text format
+		"""
+		content, content_type = get_latest_metrics()
+		return Response(content=content, media_type=content_type)
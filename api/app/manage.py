@@ -0,0 +1,111 @@
+"""
+Maintenance commands, run them from the api directory (or /code in the container):
+
+    python -m app.manage export-markdown --all --output-dir /data/markdowns
+    python -m app.manage export-markdown --users wladi mime --lang en --output-dir /data/markdowns
+    python -m app.manage migrate-storage --all --batch-size 1000
+    python -m app.manage backfill-summaries --all
+    python -m app.manage rebuild-stats --all --batch-size 1000
+    python -m app.manage ensure-indexes
+"""
+import argparse
+import asyncio
+import os
+
+from app.dependencies.db_dependencies import get_db, close_db
+from app.repositories import users as users_repository
+from app.repositories import indexes
+from app.services import markdown_export
+from app.services import storage_migration
+from app.services import summary_backfill
+from app.services import stats_rebuild
+
+async def export_markdown(args):
+    db = get_db()
+    usernames = args.users or await users_repository.find_usernames(db)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    exported = 0
+    async for username, content in markdown_export.export_markdowns(db, usernames, args.lang):
+        with open(os.path.join(args.output_dir, markdown_export.export_file_name(username)), "wb") as markdown_file:
+            markdown_file.write(content)
+        exported += 1
+    print(f"{exported} of {len(usernames)} users exported to {args.output_dir}")
+
+async def migrate_storage(args):
+    db = get_db()
+    usernames = args.users or await storage_migration.find_per_user_collections(db)
+    for username in usernames:
+        workouts, plans = await storage_migration.migrate_user(db, username, args.batch_size, args.drop_source)
+        print(f"{username}: {workouts} workouts and {plans} plans copied")
+
+async def backfill_summaries(args):
+    db = get_db()
+    usernames = args.users or await summary_backfill.find_usernames_with_data(db)
+    for username in usernames:
+        dates = await summary_backfill.backfill_dates(db, username) # before the summary, it compares the dates
+        plans = await summary_backfill.backfill_plan_flags(db, username, args.batch_size)
+        await summary_backfill.backfill_summary(db, username)
+        versioned = await summary_backfill.backfill_seq(db, username)
+        print(f"{username}: {dates} string dates converted, {plans} plans flagged, summary updated, "
+              f"{versioned} documents versioned for the sync")
+
+async def rebuild_stats(args):
+    db = get_db()
+    usernames = args.users or await summary_backfill.find_usernames_with_data(db)
+    for username in usernames:
+        read = await stats_rebuild.rebuild_user_stats(db, username, args.batch_size)
+        print(f"{username}: statistics rebuilt from {read} workouts and plans")
+
+async def ensure_indexes(args):
+    failed = await indexes.ensure_all_indexes(get_db())
+    if failed:
+        raise SystemExit(f"Could not update the indexes of {len(failed)} collections: {', '.join(failed)}")
+    print("indexes of every collection updated, obsolete indexes dropped")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export-markdown", help="write the markdown of the users to a directory, rendered in parallel")
+    users = export_parser.add_mutually_exclusive_group(required=True)
+    users.add_argument("--users", nargs="+", help="usernames to export")
+    users.add_argument("--all", action="store_true", help="export every registered user")
+    export_parser.add_argument("--lang", choices=["es", "en"], default="es")
+    export_parser.add_argument("--output-dir", required=True)
+    export_parser.set_defaults(function=export_markdown)
+
+    migrate_parser = commands.add_parser("migrate-storage", help="copy the per-user collections to the shared workouts and plans collections")
+    users = migrate_parser.add_mutually_exclusive_group(required=True)
+    users.add_argument("--users", nargs="+", help="usernames to migrate")
+    users.add_argument("--all", action="store_true", help="migrate every per-user collection")
+    migrate_parser.add_argument("--batch-size", type=int, default=1000)
+    migrate_parser.add_argument("--drop-source", action="store_true", help="drop the collection of the user once it is copied")
+    migrate_parser.set_defaults(function=migrate_storage)
+
+    backfill_parser = commands.add_parser("backfill-summaries", help="convert old string dates, set the completion flags of old plans, the summaries of the users and the sync versions of old documents")
+    users = backfill_parser.add_mutually_exclusive_group(required=True)
+    users.add_argument("--users", nargs="+", help="usernames to backfill")
+    users.add_argument("--all", action="store_true", help="backfill every user with workouts or plans")
+    backfill_parser.add_argument("--batch-size", type=int, default=1000)
+    backfill_parser.set_defaults(function=backfill_summaries)
+
+    stats_parser = commands.add_parser("rebuild-stats", help="recompute the daily and weekly statistics of the users from their history")
+    users = stats_parser.add_mutually_exclusive_group(required=True)
+    users.add_argument("--users", nargs="+", help="usernames to rebuild")
+    users.add_argument("--all", action="store_true", help="rebuild every user with workouts or plans")
+    stats_parser.add_argument("--batch-size", type=int, default=1000)
+    stats_parser.set_defaults(function=rebuild_stats)
+
+    indexes_parser = commands.add_parser("ensure-indexes", help="create the indexes of every collection, the ones of every user included, and drop the obsolete ones")
+    indexes_parser.set_defaults(function=ensure_indexes)
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(args.function(args))
+    finally:
+        markdown_export.shutdown_executor()
+        close_db()
+
+if __name__ == "__main__":
+    main()
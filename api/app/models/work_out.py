@@ -1,8 +1,22 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, StringConstraints, TypeAdapter
 from typing import Union, Optional
+from typing_extensions import Annotated, TypedDict
 import datetime
 import pytz
 
+# repetitions can be an int or a string, int from 0 or higher, string with number followed by "m" or "s"
+# (a string that does not end with "m" or "s" is accepted as it is). The constraints are checked by
+# pydantic-core, without calling back into Python for every exercise.
+REPS_PATTERN = r"(?s)^(?:\d+[ms]|.*[^ms])$"
+Reps = Union[Annotated[int, Field(ge=0)], Annotated[str, StringConstraints(pattern=REPS_PATTERN)]]
+
+def today():
+    """
+    The current date in Chile, the default date of workouts and plans
+    """
+    now = datetime.datetime.now(tz=pytz.timezone('America/Santiago'))
+    return datetime.datetime(now.year, now.month, now.day)
+
 class Instrument(BaseModel):
     name: str
     weight: Optional[float] = None
@@ -11,28 +25,14 @@ class Instrument(BaseModel):
 class Exercise(BaseModel):
     name: str
     sets: int
-    # repetitions can be an int or a string, int from 0 or higher, string with number followed by "m" or "s"
-    reps: Union[int, str]
+    reps: Reps
     instruments: Optional[list[Instrument]] = None
     rest_minutes: str
     instruction: Optional[str] = None
     comments: Optional[str] = None
 
-    @field_validator('reps')
-    def validate_repetitions(cls, v):
-        if isinstance(v, int):
-            if v < 0:
-                raise ValueError('The number of reps must be 0 or greater.')
-        elif isinstance(v, str):
-            if not v[:-1].isdigit() and v[-1] in ['m', 's']:
-                raise ValueError('Reps must be a number followed by "m" or "s".')
-        else:
-            raise ValueError('Reps must be an integer or a valid string.')
-        return v
-
 class Workout(BaseModel):
-    date: datetime.datetime = datetime.datetime.now(
-        tz=pytz.timezone('America/Santiago')).strftime('%Y-%m-%d')
+    date: datetime.datetime = Field(default_factory=today)
     exercises: list[Exercise]
     completed: Optional[bool] = False
     post_workout_comments: Optional[str] = None
@@ -44,9 +44,45 @@ class WorkoutPlan(BaseModel):
     post_workout_comments: Optional[str] = None
 
 class Plan(BaseModel):
-    date: datetime.datetime = datetime.datetime.now(
-        tz=pytz.timezone('America/Santiago')).strftime('%Y-%m-%d')
+    date: datetime.datetime = Field(default_factory=today)
     plan: list[WorkoutPlan]
     general_instructions: Optional[str] = None
     post_plan_comments: Optional[str] = None
 
+# The same shapes as TypedDicts: validating with them gives the dict that is inserted in the database
+# (what model_dump() of the models returns) straight from the JSON, without building the models.
+
+class InstrumentDocument(TypedDict):
+    name: str
+    weight: Annotated[Optional[float], Field(default=None)]
+    detail: Annotated[Optional[str], Field(default=None)]
+
+class ExerciseDocument(TypedDict):
+    name: str
+    sets: int
+    reps: Reps
+    instruments: Annotated[Optional[list[InstrumentDocument]], Field(default=None)]
+    rest_minutes: str
+    instruction: Annotated[Optional[str], Field(default=None)]
+    comments: Annotated[Optional[str], Field(default=None)]
+
+class WorkoutDocument(TypedDict):
+    date: Annotated[datetime.datetime, Field(default_factory=today)]
+    exercises: list[ExerciseDocument]
+    completed: Annotated[Optional[bool], Field(default=False)]
+    post_workout_comments: Annotated[Optional[str], Field(default=None)]
+
+class WorkoutPlanDocument(TypedDict):
+    day: Annotated[int, Field(default=1)]
+    exercises: list[ExerciseDocument]
+    completed: Annotated[Optional[bool], Field(default=False)]
+    post_workout_comments: Annotated[Optional[str], Field(default=None)]
+
+class PlanDocument(TypedDict):
+    date: Annotated[datetime.datetime, Field(default_factory=today)]
+    plan: list[WorkoutPlanDocument]
+    general_instructions: Annotated[Optional[str], Field(default=None)]
+    post_plan_comments: Annotated[Optional[str], Field(default=None)]
+
+workout_adapter = TypeAdapter(WorkoutDocument)
+plan_adapter = TypeAdapter(PlanDocument)
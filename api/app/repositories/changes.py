@@ -0,0 +1,84 @@
+# Versions of the workouts and plans for the delta sync of the clients (GET /api/workouts/changes).
+# Every document written gets "seq", a number that grows with every write of the user, and "updated_at".
+# The documents written in the same request (a chunk of a bulk insert) share their "seq", the "_id" orders them.
+# The sync only returns the documents up to the first write still in flight, the ones after it could be inserted
+# before it and the client would skip it.
+import contextlib
+import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.repositories.data_versions import reserve_write, finish_write, get_complete_seq
+from app.repositories.storage import (is_shared_storage, get_workouts_collection, get_plans_collection,
+                                      workouts_filter, plans_filter, hide_owner)
+
+async def stamp_documents(db: AsyncIOMotorDatabase, username: str, documents: list):
+    """
+    Set "seq" and "updated_at" on the documents before inserting them, the version of the data of the user
+    is increased in the same update (see app/repositories/data_versions.py)
+    """
+    seq, _ = await reserve_write(db, username)
+    updated_at = datetime.datetime.now(datetime.timezone.utc)
+    for document in documents:
+        document["seq"] = seq
+        document["updated_at"] = updated_at
+    return seq
+
+@contextlib.asynccontextmanager
+async def writing_documents(db: AsyncIOMotorDatabase, username: str, documents: list):
+    """
+    Stamp the documents (see stamp_documents) and keep the write in flight while the block inserts them
+    """
+    seq = await stamp_documents(db, username, documents)
+    try:
+        yield seq
+    finally:
+        await finish_write(db, username, seq)
+
+def encode_token(document: dict):
+    return f"{document['seq']}.{document['_id']}"
+
+def decode_token(token: str):
+    """
+    (seq, _id) of the last change seen by the client, raises ValueError if the token is not valid
+    """
+    seq, _, last_id = token.partition(".")
+    try:
+        return int(seq), ObjectId(last_id)
+    except (InvalidId, TypeError) as error:
+        raise ValueError(f"Invalid token: {token}") from error
+
+def changes_query(since: str = None, until: int = None):
+    """
+    Filter of the documents after the token, every document with a "seq" when there is no token,
+    and up to the "seq" until if it is given
+    """
+    if since is None:
+        query = {"seq": {"$gte": 0}}
+    else:
+        seq, last_id = decode_token(since)
+        query = {"$or": [{"seq": {"$gt": seq}}, {"seq": seq, "_id": {"$gt": last_id}}]}
+    if until is not None:
+        query = {"$and": [query, {"seq": {"$lte": until}}]}
+    return query
+
+async def find_changes(db: AsyncIOMotorDatabase, username: str, since: str = None, limit: int = 100):
+    """
+    The workouts and plans written after the token, in the order they were written.
+    Returns (documents, token to continue from, if there may be more documents).
+    """
+    # read before the documents, the writes that start later get a higher "seq" and are left for the next call
+    query = changes_query(since, await get_complete_seq(db, username))
+    cursors = [get_workouts_collection(db, username).find(workouts_filter(username, query), hide_owner())]
+    if is_shared_storage():
+        cursors.append(get_plans_collection(db, username).find(plans_filter(username, query), hide_owner()))
+    documents = []
+    for cursor in cursors:
+        documents += await cursor.sort([("seq", 1), ("_id", 1)]).limit(limit).to_list(limit)
+    documents.sort(key=lambda document: (document["seq"], document["_id"]))
+    has_more = len(documents) >= limit
+    documents = documents[:limit]
+    token = encode_token(documents[-1]) if documents else since
+    return documents, token, has_more
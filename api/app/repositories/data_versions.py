@@ -0,0 +1,73 @@
+# Version of the data of every user, increased on each write. Used to know if a rendered export is still valid.
+# The same document keeps the last "seq" given to the documents of the user (see app/repositories/changes.py),
+# both are increased by the same update before the documents are written, and the "seq" of the writes that are
+# still inserting their documents ("writing"), so the sync does not return the documents written after them yet.
+import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from app.repositories.projections import DATA_VERSION, DATA_COUNTERS, DATA_WRITES
+from app.settings import SyncSettings
+
+def data_versions_collection(db: AsyncIOMotorDatabase):
+    return db["data_versions"]
+
+async def get_data_version(db: AsyncIOMotorDatabase, username: str):
+    document = await data_versions_collection(db).find_one({"_id": username}, DATA_VERSION)
+    if document is None:
+        return 0
+    return document["version"]
+
+async def get_data_versions(db: AsyncIOMotorDatabase, usernames: list):
+    """
+    Versions of several users in one query, as a dict by username
+    """
+    versions = {username: 0 for username in usernames}
+    async for document in data_versions_collection(db).find({"_id": {"$in": usernames}}, DATA_VERSION):
+        versions[document["_id"]] = document["version"]
+    return versions
+
+def abandoned_before():
+    # a write reserved before this did not finish in SyncSettings.WRITE_TIMEOUT_SECONDS, its process died
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - \
+        datetime.timedelta(seconds=SyncSettings.WRITE_TIMEOUT_SECONDS.value)
+
+async def reserve_write(db: AsyncIOMotorDatabase, username: str):
+    """
+    Increase the sequence of the documents and the version of the data of the user in a single update,
+    before writing the documents, and add the "seq" to the writes in flight (finish_write removes it).
+    Returns (seq, version), "seq" is given to the documents that are written.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    document = await data_versions_collection(db).find_one_and_update(
+        {"_id": username},
+        [
+            {"$set": {"seq": {"$add": [{"$ifNull": ["$seq", 0]}, 1]}, "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}},
+            # the abandoned writes are dropped here, so they do not pile up
+            {"$set": {"writing": {"$concatArrays": [
+                {"$filter": {"input": {"$ifNull": ["$writing", []]}, "cond": {"$gt": ["$$this.at", {"$literal": abandoned_before()}]}}},
+                [{"seq": "$seq", "at": {"$literal": now}}],
+            ]}}},
+        ],
+        DATA_COUNTERS,
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return document["seq"], document["version"]
+
+async def finish_write(db: AsyncIOMotorDatabase, username: str, seq: int):
+    """
+    Remove the write from the ones in flight, once its documents are inserted (or failed)
+    """
+    await data_versions_collection(db).update_one({"_id": username}, {"$pull": {"writing": {"seq": seq}}})
+
+async def get_complete_seq(db: AsyncIOMotorDatabase, username: str):
+    """
+    The highest "seq" whose documents, and the ones of every "seq" before it, are all inserted:
+    one less than the first write in flight, or the last "seq" given when there is none
+    """
+    document = await data_versions_collection(db).find_one({"_id": username}, DATA_WRITES)
+    if document is None:
+        return 0 # only documents from before the versions (see app/services/summary_backfill.py)
+    abandoned = abandoned_before()
+    writing = [write["seq"] for write in document.get("writing", []) if write["at"].replace(tzinfo=None) > abandoned]
+    return min(writing) - 1 if writing else document.get("seq", 0)
@@ -0,0 +1,138 @@
+# Indexes of the collections: the ones of the collections shared by every user are created at startup, the ones of the
+# collection of a user when it gets its first document. "python -m app.manage ensure-indexes" goes through every collection
+# (after a change of the indexes). create_indexes does nothing for the indexes that already exist, so this is safe to run many times.
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+from app.repositories.storage import is_shared_storage, get_user_collection, is_reserved_username, SHARED_WORKOUTS, SHARED_PLANS
+
+logger = logging.getLogger("uvicorn.error")
+
+USERS_INDEXES = [
+    IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+]
+
+# the "_id" is the hash of the token, MongoDB deletes the expired ones
+REFRESH_TOKENS_INDEXES = [
+    IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    # revoke a session (logout, reused token) or every session of a user
+    IndexModel([("family", ASCENDING)], name="family"),
+    IndexModel([("username", ASCENDING)], name="username"),
+]
+
+# rollups of the statistics, read by period for a user and an exercise (None for the totals)
+STATS_ROLLUPS_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("exercise", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)],
+               unique=True, name="user_id_exercise_period_start"),
+]
+
+# every user has its own collection for the workouts and plans
+WORKOUTS_INDEXES = [
+    # last completed workout, pending workouts and pages of completed or pending workouts, the "_id" keeps the pages in order
+    IndexModel([("completed", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="completed_date_id"),
+    # plans of the user, and pages of the workouts (their "type" is null)
+    IndexModel([("type", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="type_date_id"),
+    # last completed plan, plans with pending days and their pages
+    IndexModel([("type", ASCENDING), ("all_completed", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="type_all_completed_date_id"),
+    # full history (markdown export), includes the id and "seq" so the versions are read from the index only
+    IndexModel([("date", DESCENDING), ("_id", DESCENDING), ("seq", ASCENDING)], name="date_id_seq"),
+    # changes since a sync token
+    IndexModel([("seq", ASCENDING), ("_id", ASCENDING)], name="seq_id"),
+]
+
+# storage mode "shared": the workouts and plans of every user, the hashed "user_id" is ready to be the shard key
+SHARED_WORKOUTS_INDEXES = [
+    IndexModel([("user_id", "hashed")], name="user_id_hashed"),
+    IndexModel([("user_id", ASCENDING), ("completed", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="user_id_completed_date_id"),
+    IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING), ("seq", ASCENDING)], name="user_id_date_id_seq"),
+    IndexModel([("user_id", ASCENDING), ("seq", ASCENDING), ("_id", ASCENDING)], name="user_id_seq_id"),
+]
+SHARED_PLANS_INDEXES = [
+    IndexModel([("user_id", "hashed")], name="user_id_hashed"),
+    IndexModel([("user_id", ASCENDING), ("all_completed", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="user_id_all_completed_date_id"),
+    IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING), ("seq", ASCENDING)], name="user_id_date_id_seq"),
+    IndexModel([("user_id", ASCENDING), ("seq", ASCENDING), ("_id", ASCENDING)], name="user_id_seq_id"),
+]
+
+# replaced by the indexes above (a prefix of them), dropped by ensure_all_indexes
+OBSOLETE_INDEXES = {"completed_date", "type_date", "type_all_completed_date", "date_id",
+                    "user_id_completed_date", "user_id_all_completed_date"}
+
+# collections of users already indexed by this process
+_indexed_collections = set()
+
+async def ensure_users_indexes(db: AsyncIOMotorDatabase):
+    await db["users"].create_indexes(USERS_INDEXES)
+    await db["refresh_tokens"].create_indexes(REFRESH_TOKENS_INDEXES)
+
+async def ensure_shared_indexes(db: AsyncIOMotorDatabase):
+    if SHARED_WORKOUTS in _indexed_collections:
+        return
+    await db[SHARED_WORKOUTS].create_indexes(SHARED_WORKOUTS_INDEXES)
+    await db[SHARED_PLANS].create_indexes(SHARED_PLANS_INDEXES)
+    _indexed_collections.add(SHARED_WORKOUTS)
+
+async def ensure_workouts_indexes(db: AsyncIOMotorDatabase, username: str):
+    """
+    Create the indexes of the collection of the user, only the first time it is called for the user
+    """
+    if is_shared_storage():
+        return await ensure_shared_indexes(db)
+    if username in _indexed_collections:
+        return
+    await get_user_collection(db, username).create_indexes(WORKOUTS_INDEXES)
+    _indexed_collections.add(username)
+
+async def drop_obsolete_indexes(collection):
+    """
+    Drop the indexes that were replaced, the queries use the new ones (created before calling it)
+    """
+    async for index in collection.list_indexes():
+        if index["name"] in OBSOLETE_INDEXES:
+            await collection.drop_index(index["name"])
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """
+    Create the indexes of the collections shared by every user, called on startup. It does not read the collections
+    of the users, so it takes the same time with any number of users (see ensure_all_indexes).
+    """
+    try:
+        await ensure_users_indexes(db)
+    except PyMongoError as error: # for example duplicated usernames
+        logger.error(f"Could not create the indexes of the users: {error}")
+
+    try:
+        await db["stats_rollups"].create_indexes(STATS_ROLLUPS_INDEXES)
+    except PyMongoError as error:
+        logger.error(f"Could not create the indexes of the statistics: {error}")
+
+    if is_shared_storage():
+        try:
+            await ensure_shared_indexes(db)
+        except PyMongoError as error:
+            logger.error(f"Could not create the indexes of the shared collections: {error}")
+
+async def ensure_all_indexes(db: AsyncIOMotorDatabase):
+    """
+    Create the indexes of every collection, the one of every user included, and drop the obsolete ones.
+    It goes through every collection, so it is a maintenance command and not part of the startup.
+    Returns the names of the collections whose indexes could not be updated.
+    """
+    await ensure_indexes(db)
+    failed = []
+    if is_shared_storage():
+        names = [SHARED_WORKOUTS, SHARED_PLANS]
+    else:
+        names = [name for name in await db.list_collection_names() if not is_reserved_username(name)]
+    for name in names:
+        try:
+            if not is_shared_storage():
+                await ensure_workouts_indexes(db, name)
+            await drop_obsolete_indexes(db[name]) # after creating the ones that replace them
+        except PyMongoError as error:
+            logger.error(f"Could not create the indexes of the collection {name}: {error}")
+            failed.append(name)
+    return failed
@@ -0,0 +1,52 @@
+# Keyset pagination of the history, the most recent first. The cursor is the ("date", "_id") of the last document of a page,
+# the next page starts right after it with a range over the indexes that end in (date, _id), so a deep page costs the same as the first.
+import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+PAGE_SORT = [("date", -1), ("_id", -1)]
+EPOCH = datetime.datetime(1970, 1, 1)
+
+def encode_cursor(document: dict):
+    # the dates are stored with millisecond precision, so they are kept exactly
+    milliseconds = (document["date"] - EPOCH) // datetime.timedelta(milliseconds=1)
+    return f"{milliseconds}.{document['_id']}"
+
+def decode_cursor(cursor: str):
+    """
+    (date, _id) of the last document of the previous page, raises ValueError if the cursor is not valid
+    """
+    milliseconds, _, last_id = cursor.partition(".")
+    try:
+        return EPOCH + datetime.timedelta(milliseconds=int(milliseconds)), ObjectId(last_id)
+    except (InvalidId, TypeError, OverflowError) as error:
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+
+def page_query(query: dict, cursor: str = None, from_date: datetime.datetime = None, to_date: datetime.datetime = None):
+    """
+    Add the date range ("to_date" is exclusive) and the position of the cursor to the query. The documents whose date
+    is a string (written by old versions, "python -m app.manage backfill-summaries" converts them) are left out,
+    they are not ordered with the others and could not be a cursor.
+    """
+    query = dict(query)
+    date_range = {"$type": "date"}
+    if from_date is not None:
+        date_range["$gte"] = from_date
+    if to_date is not None:
+        date_range["$lt"] = to_date
+    query["date"] = date_range
+    if cursor is not None:
+        last_date, last_id = decode_cursor(cursor)
+        query["$or"] = [{"date": {"$lt": last_date}}, {"date": last_date, "_id": {"$lt": last_id}}]
+    return query
+
+async def read_page(cursor, limit: int):
+    """
+    The documents of a page and the cursor of the next one, None on the last page. The cursor must read limit + 1 documents.
+    """
+    documents = await cursor.to_list(limit + 1)
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(documents[-1])
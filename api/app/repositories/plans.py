@@ -0,0 +1,82 @@
+# Async data access for the plans, they have "type": "plan" and where they are stored depends on the storage mode
+import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.repositories.changes import writing_documents
+from app.repositories.summaries import get_summary, record_completed, LAST_COMPLETED_PLAN
+from app.repositories.indexes import ensure_workouts_indexes
+from app.repositories.workouts import insert_many_unordered
+from app.repositories.pagination import PAGE_SORT, page_query, read_page
+from app.repositories.stats import record_documents
+from app.repositories.storage import get_plans_collection, plans_filter, add_owner, hide_owner
+
+def plans_collection(db: AsyncIOMotorDatabase, username: str):
+    return get_plans_collection(db, username)
+
+def set_completion(plan: dict):
+    """
+    Keep in the plan how many days are completed and if all of them are, so completed plans are found by index
+    """
+    plan["completed_days"] = sum(1 for plan_workout in plan["plan"] if plan_workout["completed"])
+    plan["all_completed"] = plan["completed_days"] == len(plan["plan"])
+    return plan
+
+async def insert_plan(db: AsyncIOMotorDatabase, username: str, plan: dict):
+    plan["type"] = "plan"
+    set_completion(plan)
+    await ensure_workouts_indexes(db, username)
+    async with writing_documents(db, username, [plan]):
+        response = await plans_collection(db, username).insert_one(add_owner(username, plan))
+    if plan["all_completed"]:
+        await record_completed(db, username, LAST_COMPLETED_PLAN, response.inserted_id, plan["date"])
+    await record_documents(db, username, [plan])
+    return response.inserted_id
+
+async def insert_plans(db: AsyncIOMotorDatabase, username: str, plans: list):
+    """
+    Insert many plans with a single bulk write, returns (ids by position, errors by position)
+    """
+    await ensure_workouts_indexes(db, username)
+    for plan in plans:
+        plan["type"] = "plan"
+        set_completion(plan)
+        add_owner(username, plan)
+    async with writing_documents(db, username, plans):
+        ids, errors = await insert_many_unordered(plans_collection(db, username), plans)
+    completed = [plan for position, plan in enumerate(plans) if plan["all_completed"] and position in ids]
+    if completed:
+        newest = max(completed, key=lambda plan: plan["date"])
+        await record_completed(db, username, LAST_COMPLETED_PLAN, newest["_id"], newest["date"])
+    await record_documents(db, username, [plan for position, plan in enumerate(plans) if position in ids])
+    return ids, errors
+
+async def find_last_completed_plan(db: AsyncIOMotorDatabase, username: str, projection: dict = None):
+    """
+    Get the completed plan with the most recent date, None if there is no one
+    """
+    last_completed = (await get_summary(db, username)).get(LAST_COMPLETED_PLAN)
+    if last_completed is not None:
+        plan = await plans_collection(db, username).find_one(plans_filter(username, {"_id": last_completed["id"]}), hide_owner(projection))
+        if plan is not None:
+            return plan
+    # no summary yet (or the plan was deleted), use the flag of the plans
+    plans = await plans_collection(db, username).find(plans_filter(username, {"all_completed": True}), hide_owner(projection)).sort("date", -1).limit(1).to_list(1)
+    if len(plans) == 0:
+        return None
+    return plans[0]
+
+def find_plans(db: AsyncIOMotorDatabase, username: str, projection: dict = None, limit: int = 0):
+    """
+    Cursor over the plans of the user, the most recent first
+    """
+    return plans_collection(db, username).find(plans_filter(username), hide_owner(projection)).sort("date", -1).limit(limit)
+
+async def find_plans_page(db: AsyncIOMotorDatabase, username: str, completed: bool = None, from_date: datetime.datetime = None,
+                          to_date: datetime.datetime = None, cursor: str = None, limit: int = 20, projection: dict = None):
+    """
+    A page of the plans of the user, the most recent first, "completed" filters by all_completed (see app/repositories/pagination.py).
+    Returns (plans, cursor of the next page). Raises ValueError if the cursor is not valid.
+    """
+    query = {} if completed is None else {"all_completed": completed}
+    query = page_query(plans_filter(username, query), cursor, from_date, to_date)
+    plans = plans_collection(db, username).find(query, hide_owner(projection)).sort(PAGE_SORT).limit(limit + 1)
+    return await read_page(plans, limit)
@@ -0,0 +1,53 @@
+# The fields that every endpoint reads, as MongoDB projections, so the database only sends those.
+# The repositories take them as the "projection" argument; declare here the fields of a new read.
+
+def fields(*names: str, with_id: bool = True):
+    """
+    Projection that includes only the given fields (and "_id" if with_id)
+    """
+    projection = {name: 1 for name in names}
+    if not with_id:
+        projection["_id"] = 0
+    return projection
+
+# existence checks only need the "_id", the login only the hash
+EXISTS = {"_id": 1} # an empty projection would return the whole document
+USER_CREDENTIALS = fields("hashed_password", with_id=False)
+
+# fields kept by the api for its own queries (index flags, delta sync), not part of the workouts of the clients
+INTERNAL_FIELDS = {"seq": 0, "updated_at": 0, "completed_days": 0, "all_completed": 0}
+
+# last completed workout and plan, as they were stored by the client
+LAST_COMPLETED_DOCUMENT = INTERNAL_FIELDS
+
+# pages of the history: the fields a client can ask for, "date" and "_id" are always there (they are the cursor)
+WORKOUT_PAGE_FIELDS = ("exercises", "completed", "post_workout_comments")
+PLAN_PAGE_FIELDS = ("plan", "general_instructions", "post_plan_comments", "completed_days", "all_completed")
+
+def page_projection(names: list = None):
+    """
+    Only the requested fields, or the whole documents without the internal fields
+    """
+    return fields("date", *names) if names else INTERNAL_FIELDS
+
+# schedule again: only what is copied to the new document
+SCHEDULE_WORKOUT = fields("exercises", with_id=False)
+SCHEDULE_PLAN = fields("plan", with_id=False)
+
+# pending workouts: what a workout and a day of a plan have in common
+PENDING_PLAN = fields("date", "plan")
+PENDING_WORKOUT = fields("date", "exercises", "completed", "post_workout_comments", with_id=False)
+
+# markdown: the ids and versions of the history (for the fragment cache), and what the renderer reads
+MARKDOWN_IDS = fields("seq")
+MARKDOWN_DOCUMENT = fields("type", "date", "completed", "exercises", "post_workout_comments",
+                           "plan", "general_instructions", "post_plan_comments")
+
+# statistics: the counters of a period, and how much of every plan is completed
+ROLLUP = fields("start", "sessions", "completed", "sets", "reps", "volume", with_id=False)
+PLAN_COMPLETION = {"date": 1, "completed_days": 1, "days": {"$size": "$plan"}}
+
+# versions of the data of the users
+DATA_VERSION = fields("version")
+DATA_COUNTERS = fields("seq", "version")
+DATA_WRITES = fields("seq", "writing")
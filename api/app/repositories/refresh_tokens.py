@@ -0,0 +1,31 @@
+# Async data access for the "refresh_tokens" collection. The "_id" is the HMAC of the token, the token itself is not stored.
+# The tokens of a login and the ones given when refreshing it share the "family", revoked together.
+import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+def refresh_tokens_collection(db: AsyncIOMotorDatabase):
+    return db["refresh_tokens"]
+
+async def insert_token(db: AsyncIOMotorDatabase, token_hash: str, username: str, family: str, expires_at: datetime.datetime):
+    await refresh_tokens_collection(db).insert_one(
+        {"_id": token_hash, "username": username, "family": family, "used": False, "expires_at": expires_at})
+
+async def use_token(db: AsyncIOMotorDatabase, token_hash: str, now: datetime.datetime):
+    """
+    Mark the token as used if it is not used nor expired, and return it. None otherwise.
+    It is a single update, so two refreshes with the same token can not both succeed.
+    """
+    return await refresh_tokens_collection(db).find_one_and_update(
+        {"_id": token_hash, "used": False, "expires_at": {"$gt": now}},
+        {"$set": {"used": True}},
+        {"username": 1, "family": 1},
+    )
+
+async def find_token(db: AsyncIOMotorDatabase, token_hash: str):
+    return await refresh_tokens_collection(db).find_one({"_id": token_hash}, {"username": 1, "family": 1, "used": 1})
+
+async def delete_family(db: AsyncIOMotorDatabase, family: str):
+    await refresh_tokens_collection(db).delete_many({"family": family})
+
+async def delete_user_tokens(db: AsyncIOMotorDatabase, username: str):
+    await refresh_tokens_collection(db).delete_many({"username": username})
@@ -0,0 +1,47 @@
+# Async data access for the "stats_rollups" collection, a document per user, period ("day" or "week"), start of the period
+# and exercise (None for the totals of the session), see app/services/rollups.py
+import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from app.repositories.projections import ROLLUP
+from app.services.rollups import rollup_increments
+
+def stats_collection(db: AsyncIOMotorDatabase):
+    return db["stats_rollups"]
+
+async def apply_increments(db: AsyncIOMotorDatabase, username: str, increments: dict):
+    """
+    Add the counters to the rollups, in a single bulk write of upserts ($inc, so concurrent writes add up)
+    """
+    if not increments:
+        return
+    updates = [UpdateOne({"user_id": username, "period": period, "start": start, "exercise": exercise},
+                         {"$inc": counters}, upsert=True)
+               for (period, start, exercise), counters in increments.items()]
+    await stats_collection(db).bulk_write(updates, ordered=False)
+
+async def record_documents(db: AsyncIOMotorDatabase, username: str, documents: list):
+    """
+    Add the workouts or plans that were just written to the rollups of the user
+    """
+    await apply_increments(db, username, rollup_increments(documents))
+
+async def find_rollups(db: AsyncIOMotorDatabase, username: str, period: str, exercise: str = None,
+                       from_date: datetime.datetime = None, to_date: datetime.datetime = None, limit: int = 0):
+    """
+    The rollups of the period, the most recent "limit" between the dates ("to_date" is exclusive), the oldest first
+    """
+    query = {"user_id": username, "exercise": exercise, "period": period}
+    date_range = {}
+    if from_date is not None:
+        date_range["$gte"] = from_date
+    if to_date is not None:
+        date_range["$lt"] = to_date
+    if date_range:
+        query["start"] = date_range
+    rollups = await stats_collection(db).find(query, ROLLUP).sort("start", -1).limit(limit).to_list(None)
+    rollups.reverse()
+    return rollups
+
+async def delete_rollups(db: AsyncIOMotorDatabase, username: str):
+    await stats_collection(db).delete_many({"user_id": username})
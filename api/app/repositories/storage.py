@@ -0,0 +1,68 @@
+# Where the workouts and plans of a user are stored, see DatabaseSettings.STORAGE_MODE
+#   per_user: the collection named as the username, the plans have "type": "plan"
+#   shared: the "workouts" and "plans" collections of every user, the username is in "user_id"
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.settings import DatabaseSettings
+
+PER_USER = "per_user"
+SHARED = "shared"
+SHARED_WORKOUTS = "workouts"
+SHARED_PLANS = "plans"
+
+# collections that are not the workouts of a user, their names are valid usernames so they can not be registered
+SHARED_COLLECTIONS = {"users", "refresh_tokens", "data_versions", "user_summaries", "stats_rollups", SHARED_WORKOUTS, SHARED_PLANS}
+
+class ReservedUsernameError(Exception):
+    """
+    The username is the name of a collection of the api, in per_user mode it would read and write that collection
+    """
+
+def is_reserved_username(username: str):
+    return username in SHARED_COLLECTIONS or username.startswith("system.")
+
+def is_shared_storage():
+    return DatabaseSettings.STORAGE_MODE.value == SHARED
+
+def get_user_collection(db: AsyncIOMotorDatabase, username: str):
+    if is_reserved_username(username):
+        raise ReservedUsernameError(f"{username} is not the collection of a user")
+    return db[username]
+
+def get_workouts_collection(db: AsyncIOMotorDatabase, username: str):
+    return db[SHARED_WORKOUTS] if is_shared_storage() else get_user_collection(db, username)
+
+def get_plans_collection(db: AsyncIOMotorDatabase, username: str):
+    return db[SHARED_PLANS] if is_shared_storage() else get_user_collection(db, username)
+
+def workouts_filter(username: str, query: dict = None):
+    """
+    Filter of the workouts of the user (in per_user mode the plans have no "completed" so the usual filters skip them)
+    """
+    query = {} if query is None else query
+    if is_shared_storage():
+        return {"user_id": username, **query}
+    return query
+
+def plans_filter(username: str, query: dict = None):
+    query = {} if query is None else query
+    if is_shared_storage():
+        return {"user_id": username, **query}
+    return {"type": "plan", **query}
+
+def add_owner(username: str, document: dict):
+    # in shared mode the documents carry the username
+    if is_shared_storage():
+        document["user_id"] = username
+    return document
+
+def hide_owner(projection: dict = None):
+    """
+    Projection that leaves "user_id" out of the documents returned to the clients
+    """
+    if not is_shared_storage():
+        return projection
+    if projection is None:
+        return {"user_id": 0}
+    if all(not value for value in projection.values()): # only exclusions, "user_id" can be excluded too
+        return {**projection, "user_id": 0}
+    return projection
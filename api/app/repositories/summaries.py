@@ -0,0 +1,32 @@
+# Summary of every user ("user_summaries" collection): ids and dates of the last completed workout and plan,
+# so they are found with a single read instead of scanning the history
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+LAST_COMPLETED_WORKOUT = "last_completed_workout"
+LAST_COMPLETED_PLAN = "last_completed_plan"
+
+def summaries_collection(db: AsyncIOMotorDatabase):
+    return db["user_summaries"]
+
+async def get_summary(db: AsyncIOMotorDatabase, username: str):
+    summary = await summaries_collection(db).find_one({"_id": username})
+    return {} if summary is None else summary
+
+async def record_completed(db: AsyncIOMotorDatabase, username: str, field: str, document_id, date):
+    """
+    Point the summary field to the document if it is more recent than the current one.
+    It is a single update with the comparison done by the database, so concurrent writes can not go back in time.
+    """
+    completed = {"id": document_id, "date": date}
+    await summaries_collection(db).update_one(
+        {"_id": username},
+        [{"$set": {field: {"$cond": [
+            {"$or": [
+                {"$eq": [{"$type": f"${field}"}, "missing"]},
+                {"$gte": [{"$literal": date}, f"${field}.date"]},
+            ]},
+            {"$literal": completed},
+            f"${field}",
+        ]}}}],
+        upsert=True,
+    )
@@ -0,0 +1,29 @@
+# Async data access for the "users" collection
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.repositories.refresh_tokens import delete_user_tokens
+from app.services.user_cache import invalidate_user
+
+def users_collection(db: AsyncIOMotorDatabase):
+    return db["users"]
+
+async def find_user(db: AsyncIOMotorDatabase, username: str, projection: dict = None):
+    """
+    Get the user document, None if the username does not exist
+    """
+    return await users_collection(db).find_one({"username": username}, projection)
+
+async def insert_user(db: AsyncIOMotorDatabase, user: dict):
+    response = await users_collection(db).insert_one(user)
+    return response.inserted_id
+
+async def update_user(db: AsyncIOMotorDatabase, username: str, fields: dict):
+    await users_collection(db).update_one({"username": username}, {"$set": fields})
+    invalidate_user(username)
+
+async def delete_user(db: AsyncIOMotorDatabase, username: str):
+    await users_collection(db).delete_one({"username": username})
+    await delete_user_tokens(db, username)
+    invalidate_user(username)
+
+async def find_usernames(db: AsyncIOMotorDatabase):
+    return [user["username"] async for user in users_collection(db).find({}, {"_id": 0, "username": 1}).sort("username", 1)]
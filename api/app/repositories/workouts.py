@@ -0,0 +1,177 @@
+# Async data access for the workouts, where they are stored depends on the storage mode (see app/repositories/storage.py)
+import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+from app.repositories.changes import writing_documents
+from app.repositories.indexes import ensure_workouts_indexes
+from app.repositories.pagination import PAGE_SORT, page_query, read_page
+from app.repositories.projections import PENDING_PLAN, PENDING_WORKOUT
+from app.repositories.stats import record_documents
+from app.repositories.summaries import get_summary, record_completed, LAST_COMPLETED_WORKOUT
+from app.repositories.storage import (is_shared_storage, get_workouts_collection, get_plans_collection,
+                                      workouts_filter, plans_filter, add_owner, hide_owner)
+
+def workouts_collection(db: AsyncIOMotorDatabase, username: str):
+    return get_workouts_collection(db, username)
+
+async def insert_workout(db: AsyncIOMotorDatabase, username: str, workout: dict):
+    await ensure_workouts_indexes(db, username)
+    async with writing_documents(db, username, [workout]):
+        response = await workouts_collection(db, username).insert_one(add_owner(username, workout))
+    if workout.get("completed"):
+        await record_completed(db, username, LAST_COMPLETED_WORKOUT, response.inserted_id, workout["date"])
+    await record_documents(db, username, [workout])
+    return response.inserted_id
+
+async def insert_many_unordered(collection, documents: list):
+    """
+    Insert the documents in a single unordered bulk write, a failed document does not stop the others.
+    Returns (ids by position, errors by position).
+    """
+    errors = {}
+    try:
+        await collection.insert_many(documents, ordered=False)
+    except BulkWriteError as error:
+        errors = {write_error["index"]: {"msg": write_error["errmsg"]} for write_error in error.details["writeErrors"]}
+    ids = {position: document["_id"] for position, document in enumerate(documents) if position not in errors}
+    return ids, errors
+
+async def insert_workouts(db: AsyncIOMotorDatabase, username: str, workouts: list):
+    """
+    Insert many workouts with a single bulk write, returns (ids by position, errors by position)
+    """
+    await ensure_workouts_indexes(db, username)
+    for workout in workouts:
+        add_owner(username, workout)
+    async with writing_documents(db, username, workouts):
+        ids, errors = await insert_many_unordered(workouts_collection(db, username), workouts)
+    completed = [workout for position, workout in enumerate(workouts) if workout.get("completed") and position in ids]
+    if completed:
+        newest = max(completed, key=lambda workout: workout["date"])
+        await record_completed(db, username, LAST_COMPLETED_WORKOUT, newest["_id"], newest["date"])
+    await record_documents(db, username, [workout for position, workout in enumerate(workouts) if position in ids])
+    return ids, errors
+
+async def find_last_completed_workout(db: AsyncIOMotorDatabase, username: str, projection: dict = None):
+    """
+    Get the completed workout with the most recent date, None if there is no one
+    """
+    last_completed = (await get_summary(db, username)).get(LAST_COMPLETED_WORKOUT)
+    if last_completed is not None:
+        workout = await workouts_collection(db, username).find_one(workouts_filter(username, {"_id": last_completed["id"]}), hide_owner(projection))
+        if workout is not None:
+            return workout
+    # no summary yet (or the workout was deleted), use the index
+    workouts = await workouts_collection(db, username).find(workouts_filter(username, {"completed": True}), hide_owner(projection)).sort("date", -1).limit(1).to_list(1)
+    if len(workouts) == 0:
+        return None
+    return workouts[0]
+
+async def find_workouts_page(db: AsyncIOMotorDatabase, username: str, completed: bool = None, from_date: datetime.datetime = None,
+                             to_date: datetime.datetime = None, cursor: str = None, limit: int = 20, projection: dict = None):
+    """
+    A page of the workouts of the user, the most recent first (see app/repositories/pagination.py).
+    Returns (workouts, cursor of the next page). Raises ValueError if the cursor is not valid.
+    """
+    # in per_user mode the collection has the plans too, a workout is a document with exercises and no type
+    query = {} if is_shared_storage() else {"type": None, "exercises": {"$exists": True}}
+    if completed is not None:
+        query["completed"] = completed
+    query = page_query(workouts_filter(username, query), cursor, from_date, to_date)
+    workouts = workouts_collection(db, username).find(query, hide_owner(projection)).sort(PAGE_SORT).limit(limit + 1)
+    return await read_page(workouts, limit)
+
+def pending_workouts_pipeline(db: AsyncIOMotorDatabase, username: str, from_date: datetime.datetime = None,
+                              to_date: datetime.datetime = None, skip: int = 0, limit: int = None):
+    """
+    Aggregation over the plans of the user that returns the days of the plans that are not completed, with their date,
+    plus the pending workouts, sorted by date (the oldest first). "to_date" is exclusive.
+    """
+    date_range = {}
+    if from_date is not None:
+        date_range["$gte"] = from_date
+    if to_date is not None:
+        date_range["$lt"] = to_date
+
+    plans_match = plans_filter(username, {"all_completed": {"$ne": True}})
+    if to_date is not None:
+        plans_match["date"] = {"$lt": to_date} # a plan that starts later has no day in the range
+    workouts_match = workouts_filter(username, {"completed": False})
+    if date_range:
+        workouts_match["date"] = date_range
+
+    pipeline = [
+        {"$match": plans_match},
+        {"$project": PENDING_PLAN},
+        {"$unwind": "$plan"},
+        {"$match": {"plan.completed": False}},
+        # the day 1 is the date of the plan, the day 2 the next one, and so on
+        {"$replaceWith": {"$mergeObjects": [
+            "$plan",
+            {"date": {"$dateAdd": {"startDate": "$date", "unit": "day", "amount": {"$subtract": ["$plan.day", 1]}}}},
+        ]}},
+        {"$project": {"day": 0}},
+        {"$unionWith": {
+            "coll": workouts_collection(db, username).name,
+            "pipeline": [{"$match": workouts_match}, {"$project": PENDING_WORKOUT}],
+        }},
+    ]
+    if date_range:
+        pipeline.append({"$match": {"date": date_range}})
+    pipeline.append({"$sort": {"date": 1}})
+    if skip:
+        pipeline.append({"$skip": skip})
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    return pipeline
+
+async def find_pending_workouts(db: AsyncIOMotorDatabase, username: str, from_date: datetime.datetime = None,
+                                to_date: datetime.datetime = None, skip: int = 0, limit: int = None):
+    """
+    Pending workouts and days of plans of the user, computed by the database (see pending_workouts_pipeline)
+    """
+    pipeline = pending_workouts_pipeline(db, username, from_date, to_date, skip, limit)
+    return await get_plans_collection(db, username).aggregate(pipeline).to_list(None)
+
+async def merge_by_date(first, second):
+    """
+    Merge two cursors sorted by date (the most recent first) into one
+    """
+    first_document = await anext(first, None)
+    second_document = await anext(second, None)
+    while first_document is not None or second_document is not None:
+        if second_document is None or (first_document is not None and first_document["date"] >= second_document["date"]):
+            yield first_document
+            first_document = await anext(first, None)
+        else:
+            yield second_document
+            second_document = await anext(second, None)
+
+def find_history(db: AsyncIOMotorDatabase, username: str, projection: dict = None, batch_size: int = 0):
+    """
+    Every workout and plan of the user, the most recent first. Use it with "async for".
+    """
+    if not is_shared_storage():
+        # the workouts and the plans are in the same collection
+        return workouts_collection(db, username).find({}, projection).sort("date", -1).batch_size(batch_size)
+
+    if projection is not None:
+        projection = {**projection, "date": 1} # needed for merging
+    workouts = workouts_collection(db, username).find(workouts_filter(username), projection).sort("date", -1).batch_size(batch_size)
+    plans = get_plans_collection(db, username).find(plans_filter(username), projection).sort("date", -1).batch_size(batch_size)
+    return merge_by_date(workouts, plans)
+
+async def find_by_ids(db: AsyncIOMotorDatabase, username: str, ids: list, projection: dict = None):
+    """
+    Workouts and plans of the user with the given ids, as a dict by id ("_id" is always included)
+    """
+    if projection is not None:
+        projection = {**projection, "_id": 1}
+    collections = [workouts_collection(db, username)]
+    if is_shared_storage():
+        collections.append(get_plans_collection(db, username))
+    documents = {}
+    for collection in collections:
+        async for document in collection.find(workouts_filter(username, {"_id": {"$in": ids}}), projection):
+            documents[document["_id"]] = document
+    return documents
@@ -4,40 +4,50 @@ from typing import Annotated
 from fastapi import HTTPException, APIRouter, Request, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-import bcrypt # for hashing passwords, see argon2-cffi for a better alternative
+from app.services import passwords # bcrypt runs in a bounded thread pool
+from app.services import refresh_tokens
 
 #import models
 from app.models.users import UserRegistration
-from app.models.basic_auth_models import Token, TokenData, User
+from app.models.basic_auth_models import Token, TokenData, User, RefreshRequest
 
 #Constants for JWT
 from app.dependencies.db_dependencies import get_db
+from app.repositories import users as users_repository
+from app.repositories.projections import EXISTS, USER_CREDENTIALS
+from app.repositories.storage import ReservedUsernameError, is_reserved_username
 from app.settings import Oauth2Settings
 ALGORITHM = Oauth2Settings.ALGORITHM.value
 SECRET_KEY = Oauth2Settings.SECRET_KEY.value
 ACCESS_TOKEN_EXPIRE_MINUTES = Oauth2Settings.ACCESS_TOKEN_EXPIRE_MINUTES.value
 
 #database dependency
-from pymongo.mongo_client import MongoClient
-db_dependency = Annotated[MongoClient, Depends(get_db)] # for use: db: db_dependency
+from motor.motor_asyncio import AsyncIOMotorDatabase
+db_dependency = Annotated[AsyncIOMotorDatabase, Depends(get_db)] # for use: db: db_dependency
 
 router = APIRouter(prefix="/api/auth", tags=["Basic Auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token") # if there is a prefix in the router, it should be added here
 
 # Verify if the username and password are correct and return the username if it is correct
-def authenticate_user(username: str, password: str, db: MongoClient):
+async def authenticate_user(username: str, password: str, db: AsyncIOMotorDatabase):
     #get user from database
     finded_user = None
-    users_collection = db["users"]
 
     # validate user if exists
-    user = users_collection.find_one({ "username": username })
+    user = await users_repository.find_user(db, username, USER_CREDENTIALS)
     if user is None:
         return False # user not found
-    finded_user = { "username":user["username"], "hashed_password":user["hashed_password"] }
+    finded_user = { "username":username, "hashed_password":user["hashed_password"] }
 
     # check password
-    if bcrypt.checkpw(password.encode('utf-8'), finded_user["hashed_password"].encode('utf-8')):
+    if await passwords.verify_password(password, finded_user["hashed_password"]):
+        # upgrade the hash if the work factor changed since it was created
+        if passwords.needs_rehash(finded_user["hashed_password"]):
+            try:
+                hashed_password = await passwords.hash_password(password)
+                await users_repository.update_user(db, username, {"hashed_password": hashed_password})
+            except HTTPException: # the pool is saturated, it will be done in another login
+                pass
         return username
     else: # password incorrect
         return False
@@ -53,39 +63,64 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# The access token and the refresh token for the response of the login and the refresh
+def create_tokens(username: str, refresh_token: str):
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": username}, expires_delta=access_token_expires
+    )
+    return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token,
+                 expires_in=int(access_token_expires.total_seconds()))
+
 @router.post("/token")
 async def login(db: db_dependency, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]) -> Token:
-	user = authenticate_user(form_data.username, form_data.password, db)
+	user = await authenticate_user(form_data.username, form_data.password, db)
 	if not user:
 		raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-	access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-	access_token = create_access_token(
-        data={"sub": user}, expires_delta=access_token_expires
-    )
-	return Token(access_token=access_token, token_type="bearer")
+	refresh_token = await refresh_tokens.issue_refresh_token(db, user)
+	return create_tokens(user, refresh_token)
+
+@router.post("/refresh")
+async def refresh(db: db_dependency, body: RefreshRequest) -> Token:
+    """
+    Get a new access token with the refresh token of the login, without the password. The refresh token can be used
+    only once, use the new one of the response for the next refresh.
+    """
+    username, refresh_token = await refresh_tokens.rotate_refresh_token(db, body.refresh_token)
+    return create_tokens(username, refresh_token)
+
+@router.post("/logout")
+async def logout(db: db_dependency, body: RefreshRequest):
+    """
+    Revoke the refresh token and the ones given when refreshing it. The access token is valid until it expires.
+    """
+    await refresh_tokens.revoke_refresh_token(db, body.refresh_token)
+    return {"message": "Logged out"}
 
 # to do: validate that the user does not exist before creating it
 @router.post("/register")
 async def register(db: db_dependency, user: UserRegistration):
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt())
-
-    users_collection = db["users"]
+    # the names of the collections of the api, in per_user mode the workouts of the user would be stored in them
+    if is_reserved_username(user.username):
+        raise ReservedUsernameError(f"{user.username} is the name of a collection of the api")
 
-    # validate user if exists
-    finded_user = users_collection.find_one({ "username": user.username })
+    # validate user if exists, before spending time on the hash
+    finded_user = await users_repository.find_user(db, user.username, EXISTS)
     if finded_user:
         raise HTTPException(status_code=409, detail="User already exists")
-    users_collection.insert_one(
+
+    hashed_password = await passwords.hash_password(user.password)
+    await users_repository.insert_user(db,
             {"username": user.username,
-             "hashed_password": hashed_password.decode('utf-8'),
+             "hashed_password": hashed_password,
              "fecha_registro": user.fecha_registro
              })
 
-    usuario_check = users_collection.find_one({"username": user.username})
+    usuario_check = await users_repository.find_user(db, user.username, EXISTS)
     if usuario_check:
         return str(usuario_check["_id"])
     else:
@@ -1,173 +1,182 @@
+import collections
+
 from fastapi import HTTPException, APIRouter
-from fastapi.responses import Response
-from datetime import datetime, timedelta
+from fastapi import Header, Query
+from fastapi.responses import Response, StreamingResponse
 
-#import models
-from app.models.work_out import Workout
+from app.repositories import workouts as workouts_repository
+from app.repositories import data_versions as data_versions_repository
+from app.repositories.projections import MARKDOWN_IDS, MARKDOWN_DOCUMENT
+from app.services import markdown_export
+from app.services.cache import TTLCache
+from app.services.singleflight import requests_group
+from app.services.markdown_render import transform_string_to_markdown_bytes, get_markdown_title
 
 # import the dependencies for validating the token
 from fastapi import Depends
 from app.dependencies.auth_dependencies import get_current_user
 from app.dependencies.db_dependencies import get_db
-from pymongo.mongo_client import MongoClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Annotated
 from app.models.basic_auth_models import User
+from app.settings import MarkdownSettings, SingleflightSettings
 
 auth_dependency = Annotated[User, Depends(get_current_user)] # for use: current_user: auth_dependency
-db_dependency = Annotated[MongoClient, Depends(get_db)] # for use: db: db_dependency
+db_dependency = Annotated[AsyncIOMotorDatabase, Depends(get_db)] # for use: db: db_dependency
 
 router = APIRouter(prefix="/api/markdown", tags=["MarkDown"])
 
-def transform_string_to_markdown_bytes(string_markdown: str):
-    return string_markdown.encode("utf-8")
-
-def get_normal_workout(workout, lang, current_user, type:str = "normal"):
-    readme_workout_content = ""
-
-    # get only the date dd/mm/yyyy
-    workout['date'] = workout['date'].strftime("%d/%m/%Y")
-
-    if workout["completed"]:
-        if lang == "es":
-            if type == "plan":
-                readme_workout_content += f"### Dia #{workout['day']} {workout['date']} :heavy_check_mark: \n\n"
-            elif type == "normal":
-                readme_workout_content += f"## {workout['date']} :heavy_check_mark: \n\n"
-        elif lang == "en":
-            if type == "plan":
-                readme_workout_content += f"### Day #{workout['day']} {workout['date']} :heavy_check_mark: \n\n"
-            elif type == "normal":
-                readme_workout_content += f"## {workout['date']} :heavy_check_mark: \n\n"
-    else:
-        if lang == "es":
-            if type == "plan":
-                readme_workout_content += f"### Dia #{workout['day']} {workout['date']} :clock1: \n\n"
-            elif type == "normal":
-                readme_workout_content += f"## {workout['date']} :clock1: \n\n"
-        elif lang == "en":
-            if type == "plan":
-                readme_workout_content += f"### Day #{workout['day']} {workout['date']} :clock1: \n\n"
-            elif type == "normal":
-                readme_workout_content += f"## {workout['date']} :clock1: \n\n"
-    if lang == "es":
-        readme_workout_content += "| Ejercicio | Instrumentos | Series | Repeticiones | Descanso | Instrucción | Comentarios |\n"
-        readme_workout_content += "|-----------|-------------|--------|--------------|----------|----------|-------------|\n"
-    elif lang == "en":
-        readme_workout_content += "| Exercise | Instruments | Sets | Reps | Rest | Instruction | Comments |\n"
-        readme_workout_content += "|----------|-------------|------|------|------|----------|----------|\n"
-
-    # add the exercises to the file
-    for exercise in workout['exercises']:
-        # crear dato de instrumentos a partir de la lista de diccionarios
-        instruments = ""
-        if "comments" not in exercise or exercise['comments'] is None or exercise['comments'] == "":
-            exercise['comments'] = "N/A"
-        if "instruction" not in exercise or exercise['instruction'] is None:
-            exercise['instruction'] = "N/A"
-        if "instruments" not in exercise or exercise['instruments'] is None:
-            instruments = "N/A"
-        else:
-            for instrument in exercise['instruments']:
-                name = instrument.get('name', '')
-                weight = instrument.get('weight')
-                detail = instrument.get('detail')
-
-                description = ""
-
-                if weight is not None and detail:
-                    description = f"{name} ({weight} kg, {detail})"
-                elif weight is not None:
-                    description = f"{name} ({weight} kg)"
-                elif detail:
-                    description = f"{name} ({detail})"
-                else:
-                    description = name
-
-                # add a comma if there are more instruments
-                if instrument != exercise['instruments'][-1]:
-                    description += ", "
-
-                instruments += description
-
-        readme_workout_content += f"| {exercise['name']} | {instruments} | {exercise['sets']} | {exercise['reps']} | {exercise['rest_minutes']}m | {exercise['instruction']} | {exercise['comments']} |\n"
-    if "post_workout_comments" in workout and workout["post_workout_comments"] is not None:
-            if lang == "es":
-                readme_workout_content += f"\n**Comentarios post-entrenamiento:** {workout['post_workout_comments']}\n\n"
-            elif lang == "en":
-                readme_workout_content += f"\n**Post-workout comments:** {workout['post_workout_comments']}\n\n"
-
-    return readme_workout_content
+# rendered workouts and plans, by id and "seq" so a document that is written again is rendered again
+rendered_fragments = TTLCache(maxsize=MarkdownSettings.FRAGMENT_CACHE_SIZE.value,
+                              ttl=MarkdownSettings.FRAGMENT_CACHE_TTL_SECONDS.value)
+
+# change it when the format of the markdown changes, so the clients do not keep an old export
+MARKDOWN_FORMAT_VERSION = 2
+
+def get_title(lang: str, current_user: str):
+    try:
+        return get_markdown_title(lang, current_user)
+    except ValueError as error: # a language without catalog
+        raise HTTPException(status_code=400, detail=str(error))
+
+def get_markdown_etag(data_version: int, lang: str):
+    return f'"{data_version}-{lang}-{MARKDOWN_FORMAT_VERSION}"'
+
+def etag_matches(if_none_match: str, etag: str):
+    if if_none_match is None:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+def fragment_key(current_user, lang, document):
+    # "seq" changes when the document is written (see app/repositories/changes.py)
+    return (current_user, lang, document["_id"], document.get("seq"))
+
+async def read_id_batches(first, ids):
+    """
+    The documents of the cursor of ids in lists of MarkdownSettings.CURSOR_BATCH_SIZE, "ids" is already advanced past "first"
+    """
+    batch_size = MarkdownSettings.CURSOR_BATCH_SIZE.value
+    batch = [first]
+    async for document in ids:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def render_cached_workouts(db, first, ids, lang, current_user):
+    """
+    Render the workouts of a cursor of ids (and versions), "ids" is already advanced past "first": the rendered fragments
+    are taken from the cache and only the workouts missing from it are read and rendered (see markdown_export.render_batches).
+    """
+    pending = collections.deque() # (documents of the batch, fragments from the cache, ids read) waiting for the render
+
+    async def missing_workouts():
+        async for batch in read_id_batches(first, ids):
+            fragments = [rendered_fragments.get(fragment_key(current_user, lang, document)) for document in batch]
+            missing = [document["_id"] for document, fragment in zip(batch, fragments) if fragment is None]
+            workouts = await workouts_repository.find_by_ids(db, current_user, missing, MARKDOWN_DOCUMENT) if missing else {}
+            pending.append((batch, fragments, workouts.keys()))
+            yield [workouts[workout_id] for workout_id in missing if workout_id in workouts]
+
+    async for rendered in markdown_export.render_batches(missing_workouts(), lang, current_user):
+        batch, fragments, found = pending.popleft()
+        rendered = iter(rendered)
+        for document, fragment in zip(batch, fragments):
+            if fragment is None:
+                if document["_id"] not in found: # deleted while the export was running
+                    continue
+                fragment = next(rendered)
+                rendered_fragments.set(fragment_key(current_user, lang, document), fragment)
+            yield fragment
+
+async def stream_markdown(title, fragments):
+    """
+    Join the rendered fragments and yield the markdown in utf-8 chunks of about MarkdownSettings.STREAM_CHUNK_BYTES,
+    so the whole history is never in memory.
+    """
+    chunk_size = MarkdownSettings.STREAM_CHUNK_BYTES.value
+    buffer = [title]
+    buffered = len(title)
+
+    async for content in fragments:
+        buffer.append(content)
+        buffered += len(content)
+        if buffered >= chunk_size:
+            yield transform_string_to_markdown_bytes("".join(buffer))
+            buffer = []
+            buffered = 0
+
+    if buffer:
+        yield transform_string_to_markdown_bytes("".join(buffer))
 
 @router.get("/get/workouts",
             responses = {
                 200: {
                 "content": {"text/markdown": {}}
-                }
+                },
+                304: {"description": "The markdown did not change since the ETag sent in If-None-Match"}
             },
-            response_class=Response
+            response_class=StreamingResponse
             )
-async def get_workouts_markdown(db: db_dependency, current_user: str, lang: str = "es"):
+async def get_workouts_markdown(db: db_dependency, current_user: str, lang: str = "es",
+                                if_none_match: Annotated[str | None, Header()] = None):
     """
     Get all the workouts for the current user in markdown format.
+    The document is streamed while the workouts are read from the database, the ETag changes with every write of the user.
     """
-    users_collection = db[current_user]
-    workouts = list(users_collection.find().sort("date", -1))
-    if len(workouts) == 0:
+    title = get_title(lang, current_user) # validate the language before reading the workouts
+
+    # read the version before the workouts, a write that starts in between only makes the ETag older than the content
+    # (a write increases the version just before inserting, a read in that moment can miss it until the next write)
+    etag = get_markdown_etag(await data_versions_repository.get_data_version(db, current_user), lang)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # the same markdown is being prepared for another request (another device, the export cron) and none of it
+    # was dropped yet, it is read from there
+    flight = ("markdown", current_user, lang, etag)
+    if SingleflightSettings.ENABLED.value:
+        shared = requests_group.join(flight)
+        if shared is not None:
+            return StreamingResponse(shared, media_type="text/markdown", headers={"ETag": etag})
+
+    ids = workouts_repository.find_history(db, current_user, MARKDOWN_IDS, MarkdownSettings.CURSOR_BATCH_SIZE.value)
+    first = await anext(ids, None)
+    if first is None:
         raise HTTPException(status_code=404, detail="No workouts found for this user")
 
-    readme_content = ""
-
-    if lang == "es":
-        readme_content = f"# Entrenamientos de {current_user}\n\n"
-    elif lang == "en":
-        readme_content = f"# Workouts for {current_user}\n\n"
-    else:
-        raise HTTPException(status_code=400, detail="Invalid language. Use 'es' or 'en'")
-
-    for workout in workouts:
-        if "type" in workout:
-            if workout["type"] == "plan":
-
-                processed_workouts = []
-
-                if lang == "es":
-                    readme_content += f"## Plan\n\n"
-                    readme_content += f"**Fecha inicial:** {workout['date'].strftime('%d/%m/%y')}\n\n"
-                elif lang == "en":
-                    readme_content += f"## Plan\n\n"
-                    readme_content += f"**Initial date:** {workout['date'].strftime('%y/%m/%d')}\n\n"
-
-
-                if "general_instructions" in workout and workout["general_instructions"] is not None:
-                    if lang == "es":
-                        readme_content += f"**Instrucciones generales:** {workout['general_instructions']}\n\n"
-                    elif lang == "en":
-                        readme_content += f"**General instructions:** {workout['general_instructions']}\n\n"
-                if "post_plan_comments" in workout and workout["post_plan_comments"] is not None:
-                    if lang == "es":
-                        readme_content += f"**Comentarios post-plan:** {workout['post_plan_comments']}\n\n"
-                    elif lang == "en":
-                        readme_content += f"**Post-plan comments:** {workout['post_plan_comments']}\n\n"
-
-                for plan_workout in workout["plan"]:
-                    if plan_workout["day"] == 1:
-                        plan_workout["date"] = workout["date"]
-                    elif plan_workout["day"] > 1:
-                        plan_workout["date"] = workout["date"] + timedelta(days=plan_workout["day"] - 1)
-
-                    processed_workouts.append(plan_workout)
-
-                # order workout["plan"] by "date", major to minor
-                processed_workouts.sort(key=lambda x: x["date"], reverse=True)
-
-                for plan_workout in processed_workouts:
-                    readme_content += get_normal_workout(plan_workout, lang, current_user, "plan")
-                    readme_content += "\n"
-        else:
-            readme_content += get_normal_workout(workout, lang, current_user)
-            readme_content += "\n"
-
-    # Replace all the "None" values with "N/A"
-    readme_content = readme_content.replace("None", "N/A").replace("N/Am", "N/A")
-
-    return Response(content=transform_string_to_markdown_bytes(readme_content), media_type="text/markdown")
+    content = stream_markdown(title, render_cached_workouts(db, first, ids, lang, current_user))
+    if SingleflightSettings.ENABLED.value:
+        content = requests_group.stream(flight, content)
+    return StreamingResponse(content, media_type="text/markdown", headers={"ETag": etag})
+
+@router.get("/get/workouts/bulk",
+            responses = {
+                200: {
+                "content": {"application/x-tar": {}}
+                },
+                304: {"description": "None of the users wrote since the ETag sent in If-None-Match"}
+            },
+            response_class=StreamingResponse
+            )
+async def get_workouts_markdown_bulk(db: db_dependency, users: Annotated[list[str], Query(min_length=1)], lang: str = "es",
+                                     if_none_match: Annotated[str | None, Header()] = None):
+    """
+    Get the markdown of the given users as a tar archive with a file <user>.md per user.
+    The users must be listed, the export of all the registered users is only "python -m app.manage export-markdown --all".
+    The users are rendered in parallel, the users without workouts are not included.
+    """
+    get_title(lang, "") # validate the language before reading the workouts
+
+    etag = markdown_export.get_bulk_etag(await data_versions_repository.get_data_versions(db, users), lang, MARKDOWN_FORMAT_VERSION)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    markdowns = markdown_export.export_markdowns(db, users, lang)
+    return StreamingResponse(markdown_export.stream_tar(markdowns), media_type="application/x-tar", headers={"ETag": etag})
@@ -1,24 +1,27 @@
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Query, Request
+from functools import partial
 
 # import utilities for the mongo database
-from bson.json_util import dumps
-import json
+from app.services.responses import BSONJSONResponse
 import datetime
-import pytz
 
 #import models
-from app.models.work_out import Plan
+from app.models.work_out import Plan, plan_adapter, today
+from app.repositories import plans as plans_repository
+from app.repositories.projections import LAST_COMPLETED_DOCUMENT, SCHEDULE_PLAN, EXISTS, PLAN_PAGE_FIELDS, page_projection
+from app.services import bulk_import
 
 # import the dependencies for validating the token
 from fastapi import Depends
 from app.dependencies.auth_dependencies import get_current_user
 from app.dependencies.db_dependencies import get_db
-from pymongo.mongo_client import MongoClient
-from typing import Annotated
+from app.dependencies.body_dependencies import plan_body, openapi_body
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Annotated, Literal
 from app.models.basic_auth_models import User
 
 auth_dependency = Annotated[User, Depends(get_current_user)] # for use: current_user: auth_dependency
-db_dependency = Annotated[MongoClient, Depends(get_db)] # for use: db: db_dependency
+db_dependency = Annotated[AsyncIOMotorDatabase, Depends(get_db)] # for use: db: db_dependency
 
 import os
 import logging
@@ -31,14 +34,21 @@ else:
 
 router = APIRouter(prefix="/api/plans", tags=["Plans"])
 
-@router.post("/insert/plan", status_code=200)
-async def insert_plan(db: db_dependency, current_user: str, plan: Plan):
-    users_collection = db[current_user] # get access to the "user" collection
-    plan = plan.model_dump() # convert the plan to a dictionary
-    plan["type"] = "plan" # add the type of the plan
-    response = users_collection.insert_one(plan) # insert the new plan
+@router.post("/insert/plan", status_code=200, openapi_extra=openapi_body(Plan))
+async def insert_plan(db: db_dependency, current_user: str, plan: Annotated[dict, Depends(plan_body)]):
+    plan_id = await plans_repository.insert_plan(db, current_user, plan) # insert the new plan, the repository adds the type
     return {"message": "Plan inserted successfully.",
-            "plan_id": str(response.inserted_id)}
+            "plan_id": str(plan_id)}
+
+
+@router.post("/insert/plans/bulk", status_code=200,
+             openapi_extra=openapi_body(Plan, bulk=True))
+async def insert_plans_bulk(db: db_dependency, current_user: str, request: Request):
+    """
+    Insert many plans at once. The body is a JSON array of plans, or one per line with the content type application/x-ndjson.
+    It is read, validated and written in chunks, so it can be as large as needed. Returns the id or the errors of every item, by its position.
+    """
+    return await bulk_import.import_documents(request, plan_adapter, partial(plans_repository.insert_plans, db, current_user))
 
 
 @router.get("/get/last/completed/plan", status_code=200)
@@ -46,54 +56,49 @@ async def get_last_completed_plan(db: db_dependency, current_user: str):
     """
     Get the last completed plan for the current user
     """
-    users_collection = db[current_user]
-    plans = users_collection.find({"type": "plan"}).sort("date", -1)
-    completed_plans = []
-    for plan in plans:
-        completed = True
-        for plan_workout in plan["plan"]:
-            if plan_workout["completed"] == False:
-                completed = False
-                break
-        if completed:
-            return {"last_plan": json.loads(dumps(plan))}
+    plan = await plans_repository.find_last_completed_plan(db, current_user, LAST_COMPLETED_DOCUMENT)
+    if plan is not None:
+        return BSONJSONResponse({"last_plan": plan})
 
     return {"message": "There are no completed plans."}
 
 
+@router.get("/list", status_code=200)
+async def list_plans(db: db_dependency, current_user: str, cursor: str | None = None,
+                     limit: Annotated[int, Query(ge=1, le=100)] = 20, completed: bool | None = None,
+                     from_date: datetime.date | None = None, to_date: datetime.date | None = None,
+                     fields: Annotated[list[Literal[PLAN_PAGE_FIELDS]] | None, Query()] = None):
+    """
+    Get a page of the plans of the current user, the most recent first (by the date of their first day). Call it again
+    with the "next" cursor for the following page, it is null on the last one. Optionally only the plans with every day
+    completed (or not), starting between from_date and to_date (both included), and only some fields ("date" and "_id" are always returned).
+    """
+    from_datetime = None if from_date is None else datetime.datetime.combine(from_date, datetime.time())
+    to_datetime = None if to_date is None else datetime.datetime.combine(to_date + datetime.timedelta(days=1), datetime.time())
+    try:
+        plans, next_cursor = await plans_repository.find_plans_page(db, current_user, completed, from_datetime, to_datetime,
+                                                                   cursor, limit, page_projection(fields))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return BSONJSONResponse({"plans": plans, "next": next_cursor})
+
 @router.post("/schedule/again/last/completed/plan", status_code=200)
-async def schedule_again_last_completed_plan(db: db_dependency, current_user: str, date: datetime.datetime = datetime.datetime.now(tz=pytz.timezone('America/Santiago')).strftime('%Y-%m-%d')):
+async def schedule_again_last_completed_plan(db: db_dependency, current_user: str, date: datetime.datetime | None = None):
     """
     Schedule again the last completed plan for the current user. the date by default is the current date. Also, the comments are not included in the scheduled plan.
     """
-    users_collection = db[current_user]
-    plans = list(users_collection.find({"type": "plan"}).sort("date", -1).limit(10)) # limit the search for performance reasons
-
-    # validate if there are completed plans
-    if len(plans) == 0:
-        raise HTTPException(status_code=404, detail="The user has no plans.")
-
     # find the last completed plan
-    last_completed_plan = {}
-    has_completed_plan = False
-    for plan in plans:
-        completed = True
-        for plan_workout in plan["plan"]:
-            if plan_workout["completed"] == False:
-                completed = False
-                break
-        if completed:
-            last_completed_plan = plan
-            has_completed_plan = True
-            break
-    if not has_completed_plan:
+    last_completed_plan = await plans_repository.find_last_completed_plan(db, current_user, SCHEDULE_PLAN)
+    if last_completed_plan is None:
+        # validate if there are plans at all
+        if len(await plans_repository.find_plans(db, current_user, EXISTS, limit=1).to_list(1)) == 0:
+            raise HTTPException(status_code=404, detail="The user has no plans.")
         raise HTTPException(status_code=404, detail="There are no completed plans.")
 
     # build the scheduled plan
     scheduled_plan = {}
-    scheduled_plan["date"] = date
+    scheduled_plan["date"] = today() if date is None else date
     scheduled_plan["plan"] = last_completed_plan["plan"]
-    scheduled_plan["type"] = "plan"
 
     i = 0
     for exercise in scheduled_plan["plan"]:
@@ -109,6 +114,6 @@ async def schedule_again_last_completed_plan(db: db_dependency, current_user: st
         scheduled_plan["plan"][i] = exercise
         i+=1
 
-    response = users_collection.insert_one(scheduled_plan)
+    plan_id = await plans_repository.insert_plan(db, current_user, scheduled_plan)
     return {"message": "Plan scheduled successfully.",
-            "plan_id": str(response.inserted_id)}
+            "plan_id": str(plan_id)}
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Query
+import datetime
+from datetime import timedelta
+from typing import Literal
+
+from app.repositories import plans as plans_repository
+from app.repositories import stats as stats_repository
+from app.repositories.projections import PLAN_COMPLETION
+from app.services.rollups import period_start
+
+from fastapi import Depends
+from app.dependencies.db_dependencies import get_db
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Annotated
+
+db_dependency = Annotated[AsyncIOMotorDatabase, Depends(get_db)] # for use: db: db_dependency
+
+router = APIRouter(prefix="/api/stats", tags=["Stats"])
+
+period_query = Annotated[Literal["day", "week"], Query(description="length of every point of the series")]
+limit_query = Annotated[int, Query(ge=1, le=1000, description="most recent periods returned")]
+
+def date_range(from_date: datetime.date | None, to_date: datetime.date | None, period: str):
+    # the periods that start from the one of from_date to the one of to_date, both included
+    from_datetime = None if from_date is None else period_start(datetime.datetime.combine(from_date, datetime.time()), period)
+    to_datetime = None if to_date is None else datetime.datetime.combine(to_date + timedelta(days=1), datetime.time())
+    return from_datetime, to_datetime
+
+@router.get("/progress", status_code=200)
+async def get_progress(db: db_dependency, current_user: str, period: period_query = "week",
+                       from_date: datetime.date | None = None, to_date: datetime.date | None = None, limit: limit_query = 52):
+    """
+    Sessions (workouts and days of plans), completed sessions, sets, reps and volume (sets x reps x weight) of the
+    current user by day or by week, the oldest first. The sets, reps and volume are those of the completed sessions.
+    """
+    from_datetime, to_datetime = date_range(from_date, to_date, period)
+    rollups = await stats_repository.find_rollups(db, current_user, period, None, from_datetime, to_datetime, limit)
+    return {"period": period, "progress": rollups}
+
+@router.get("/progress/exercise", status_code=200)
+async def get_exercise_progress(db: db_dependency, current_user: str, name: str, period: period_query = "week",
+                                from_date: datetime.date | None = None, to_date: datetime.date | None = None, limit: limit_query = 52):
+    """
+    Like /progress, for a single exercise (by its name)
+    """
+    from_datetime, to_datetime = date_range(from_date, to_date, period)
+    rollups = await stats_repository.find_rollups(db, current_user, period, name.strip(), from_datetime, to_datetime, limit)
+    return {"period": period, "exercise": name.strip(), "progress": rollups}
+
+@router.get("/plans/completion", status_code=200)
+async def get_plans_completion(db: db_dependency, current_user: str, limit: Annotated[int, Query(ge=1, le=1000)] = 20):
+    """
+    Completed days of the most recent plans of the current user, and the fraction of the plan they are
+    """
+    plans = []
+    async for plan in plans_repository.find_plans(db, current_user, PLAN_COMPLETION, limit=limit):
+        completed_days = plan.get("completed_days")
+        rate = None if completed_days is None or plan["days"] == 0 else completed_days / plan["days"]
+        plans.append({"plan_id": str(plan["_id"]), "date": plan["date"], "days": plan["days"],
+                      "completed_days": completed_days, "completion_rate": rate})
+    return {"plans": plans}
@@ -1,35 +1,50 @@
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Query, Request
+from functools import partial
 
 import datetime
 from datetime import timedelta
-import pytz
 
 # import utilities for the mongo database
-from bson.json_util import dumps
-import json
+from app.services.responses import BSONJSONResponse
 
 #import models
-from app.models.work_out import Workout
+from app.models.work_out import Workout, workout_adapter, today
+from app.repositories import workouts as workouts_repository
+from app.repositories import changes as changes_repository
+from app.repositories.projections import LAST_COMPLETED_DOCUMENT, SCHEDULE_WORKOUT, WORKOUT_PAGE_FIELDS, page_projection
+from app.repositories import data_versions as data_versions_repository
+from app.services import bulk_import
+from app.services.singleflight import coalesce
 
 # import the dependencies for validating the token
 from fastapi import Depends
 from app.dependencies.auth_dependencies import get_current_user
 from app.dependencies.db_dependencies import get_db
-from pymongo.mongo_client import MongoClient
-from typing import Annotated
+from app.dependencies.body_dependencies import workout_body, openapi_body
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Annotated, Literal
 from app.models.basic_auth_models import User
 
 auth_dependency = Annotated[User, Depends(get_current_user)] # for use: current_user: auth_dependency
-db_dependency = Annotated[MongoClient, Depends(get_db)] # for use: db: db_dependency
+db_dependency = Annotated[AsyncIOMotorDatabase, Depends(get_db)] # for use: db: db_dependency
 
 router = APIRouter(prefix="/api/workouts", tags=["Workouts"])
 
-@router.post("/insert/workout", status_code=200)
-async def insert_workout(db: db_dependency, current_user: str, work_out: Workout):
-    users_collection = db[current_user] # get access to the "user" collection
-    response = users_collection.insert_one(work_out.model_dump()) # insert the new workout
+@router.post("/insert/workout", status_code=200, openapi_extra=openapi_body(Workout))
+async def insert_workout(db: db_dependency, current_user: str, work_out: Annotated[dict, Depends(workout_body)]):
+    workout_id = await workouts_repository.insert_workout(db, current_user, work_out) # insert the new workout
     return {"message": "Workout inserted successfully.",
-            "workout_id": str(response.inserted_id)}
+            "workout_id": str(workout_id)}
+
+
+@router.post("/insert/workouts/bulk", status_code=200,
+             openapi_extra=openapi_body(Workout, bulk=True))
+async def insert_workouts_bulk(db: db_dependency, current_user: str, request: Request):
+    """
+    Insert many workouts at once. The body is a JSON array of workouts, or one per line with the content type application/x-ndjson.
+    It is read, validated and written in chunks, so it can be as large as needed. Returns the id or the errors of every item, by its position.
+    """
+    return await bulk_import.import_documents(request, workout_adapter, partial(workouts_repository.insert_workouts, db, current_user))
 
 
 @router.get("/get/last/completed/workout", status_code=200)
@@ -37,52 +52,73 @@ async def get_last_completed_workout(db: db_dependency, current_user: str):
     """
     Get the last completed workout for the current user
     """
-    users_collection = db[current_user]
-    last_workout = users_collection.find({"completed": True}).sort("date", -1).limit(1)
-    return {"last_workout": json.loads(dumps(last_workout))}
+    last_workout = await workouts_repository.find_last_completed_workout(db, current_user, LAST_COMPLETED_DOCUMENT)
+    last_workout = [] if last_workout is None else [last_workout]
+    return BSONJSONResponse({"last_workout": last_workout})
+
 
+async def user_data_version(db, current_user, **_):
+    return await data_versions_repository.get_data_version(db, current_user)
 
 @router.get("/get/pending/workouts", status_code=200)
-async def get_pending_workouts(db: db_dependency, current_user: str):
+@coalesce("pending_workouts", "current_user", "from_date", "to_date", "skip", "limit", version=user_data_version)
+async def get_pending_workouts(db: db_dependency, current_user: str,
+                               from_date: datetime.date | None = None, to_date: datetime.date | None = None,
+                               skip: Annotated[int, Query(ge=0)] = 0, limit: Annotated[int | None, Query(ge=1, le=1000)] = None):
     """
-    Get all the pending workouts for the current user
+    Get the pending workouts for the current user, including the days of the plans that are not completed, the oldest first.
+    Optionally only between from_date and to_date (both included), and paginated with skip and limit.
     """
-    users_collection = db[current_user]
-    pending_workouts = list(users_collection.find({"completed": False}, {"_id": 0}))
-    pending_workouts_plan = list(users_collection.find({"type": "plan"}, {"_id": 0}))
-    workouts_list = []
-    for plan in pending_workouts_plan:
-        for plan_workout in plan["plan"]:
-            if plan_workout["completed"] == False:
-                if plan_workout["day"] == 1:
-                    plan_workout["date"] = plan["date"]
-                elif plan_workout["day"] > 1:
-                    plan_workout["date"] = plan["date"] + timedelta(days=plan_workout["day"] - 1)
-
-                # delete "day" key
-                del plan_workout["day"]
-
-                workouts_list.append(plan_workout)
-
-    workouts_list += pending_workouts
-    workouts_list = sorted(workouts_list, key=lambda x: x["date"], reverse=False)
+    from_datetime = None if from_date is None else datetime.datetime.combine(from_date, datetime.time())
+    to_datetime = None if to_date is None else datetime.datetime.combine(to_date + timedelta(days=1), datetime.time())
+    workouts_list = await workouts_repository.find_pending_workouts(db, current_user, from_datetime, to_datetime, skip, limit)
     return {"pending_workouts": workouts_list}
 
+@router.get("/list", status_code=200)
+async def list_workouts(db: db_dependency, current_user: str, cursor: str | None = None,
+                        limit: Annotated[int, Query(ge=1, le=100)] = 20, completed: bool | None = None,
+                        from_date: datetime.date | None = None, to_date: datetime.date | None = None,
+                        fields: Annotated[list[Literal[WORKOUT_PAGE_FIELDS]] | None, Query()] = None):
+    """
+    Get a page of the workouts of the current user, the most recent first. Call it again with the "next" cursor
+    for the following page, it is null on the last one. Optionally only the completed (or pending) ones, between
+    from_date and to_date (both included), and only some fields ("date" and "_id" are always returned).
+    """
+    from_datetime = None if from_date is None else datetime.datetime.combine(from_date, datetime.time())
+    to_datetime = None if to_date is None else datetime.datetime.combine(to_date + timedelta(days=1), datetime.time())
+    try:
+        workouts, next_cursor = await workouts_repository.find_workouts_page(db, current_user, completed, from_datetime, to_datetime,
+                                                                            cursor, limit, page_projection(fields))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return BSONJSONResponse({"workouts": workouts, "next": next_cursor})
+
+@router.get("/changes", status_code=200)
+async def get_changes(db: db_dependency, current_user: str, since: str | None = None,
+                      limit: Annotated[int, Query(ge=1, le=1000)] = 100):
+    """
+    Get the workouts and plans written after the "since" token, in the order they were written, for the delta sync of the clients.
+    Without "since" it starts from the first one. Call it again with the "next" token while "has_more" is true,
+    and keep the last "next" for the following sync. The writes after one still in progress are returned by a later call.
+    """
+    try:
+        documents, token, has_more = await changes_repository.find_changes(db, current_user, since, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since token")
+    return BSONJSONResponse({"changes": documents, "next": token, "has_more": has_more})
+
 @router.post("/schedule/again/last/completed/workout", status_code=200)
-async def schedule_again_last_completed_workout(db: db_dependency, current_user: str, date: datetime.datetime = datetime.datetime.now(tz=pytz.timezone('America/Santiago')).strftime('%Y-%m-%d')):
+async def schedule_again_last_completed_workout(db: db_dependency, current_user: str, date: datetime.datetime | None = None):
     """
     Schedule again the last completed workout for the current user. the date is optional and by default is the current date. Also, the comments are not included in the scheduled workout.
     """
-    users_collection = db[current_user]
-    last_workout = list(users_collection.find({"completed": True},{"date": 0, "completed": 0, "_id":0}).sort("date", -1).limit(1))
+    last_workout = await workouts_repository.find_last_completed_workout(db, current_user, SCHEDULE_WORKOUT)
 
-    if len(last_workout) == 0:
+    if last_workout is None:
         raise HTTPException(status_code=404, detail="There are no completed workouts")
 
-    last_workout = last_workout[0]
-
     scheduled_workout = {}
-    scheduled_workout["date"] = date
+    scheduled_workout["date"] = today() if date is None else date
     scheduled_workout["exercises"] = last_workout["exercises"]
     # delete "comments" from the exercises
     for exercise in scheduled_workout["exercises"]:
@@ -91,7 +127,7 @@ async def schedule_again_last_completed_workout(db: db_dependency, current_user:
             del exercise["comments"]
     scheduled_workout["completed"] = False
 
-    response = users_collection.insert_one(scheduled_workout)
+    workout_id = await workouts_repository.insert_workout(db, current_user, scheduled_workout)
     return {"message": "Workout scheduled successfully.",
-            "workout_id": str(response.inserted_id)}
+            "workout_id": str(workout_id)}
 
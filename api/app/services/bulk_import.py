@@ -0,0 +1,149 @@
+# Reading of large uploads of workouts or plans: the body is parsed while it arrives (a JSON array or NDJSON),
+# validated in chunks and inserted with unordered bulk writes, so the memory does not grow with the upload
+import codecs
+import json
+
+from fastapi import HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+
+from app.settings import BulkImportSettings
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines")
+
+def invalid_body(detail: str):
+    return HTTPException(status_code=400, detail=f"Invalid body: {detail}")
+
+def item_too_large():
+    return HTTPException(status_code=413, detail="An item of the body is too large")
+
+class JSONArrayReader:
+    """
+    Incremental parser of a JSON array: feed it text and it returns the items that are complete
+    """
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.started = False
+        self.finished = False
+
+    def feed(self, text: str, final: bool = False):
+        self.buffer += text
+        items = []
+        position = 0
+        while True:
+            # skip whitespace and the separators
+            while position < len(self.buffer) and (self.buffer[position].isspace() or (self.started and self.buffer[position] == ",")):
+                position += 1
+            if position == len(self.buffer):
+                break
+            if self.finished:
+                raise invalid_body("unexpected data after the end of the array")
+            if not self.started:
+                if self.buffer[position] != "[":
+                    raise invalid_body("expected a JSON array")
+                self.started = True
+                position += 1
+                continue
+            if self.buffer[position] == "]":
+                self.finished = True
+                position += 1
+                continue
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, position)
+            except json.JSONDecodeError as error:
+                if final:
+                    raise invalid_body(str(error))
+                break # incomplete item, wait for more data
+            if end == len(self.buffer) and not final:
+                break # a number could still go on, wait for the next character
+            if end - position > BulkImportSettings.MAX_ITEM_BYTES.value:
+                raise item_too_large()
+            items.append(item)
+            position = end
+
+        self.buffer = self.buffer[position:]
+        if len(self.buffer) > BulkImportSettings.MAX_ITEM_BYTES.value:
+            raise item_too_large()
+        if final and not self.finished:
+            raise invalid_body("the JSON array is not closed")
+        return items
+
+class NDJSONReader:
+    """
+    Incremental parser of newline delimited JSON: a JSON document per line
+    """
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text: str, final: bool = False):
+        self.buffer += text
+        lines = self.buffer.split("\n")
+        self.buffer = "" if final else lines.pop()
+        if len(self.buffer) > BulkImportSettings.MAX_ITEM_BYTES.value:
+            raise item_too_large()
+        items = []
+        for line in lines:
+            if line.strip() == "":
+                continue
+            if len(line) > BulkImportSettings.MAX_ITEM_BYTES.value:
+                raise item_too_large()
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as error:
+                raise invalid_body(f"line is not JSON ({error})")
+        return items
+
+async def read_items(request: Request):
+    """
+    Yield the items of the body as they arrive, NDJSON if the content type says so, otherwise a JSON array
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    reader = NDJSONReader() if content_type in NDJSON_MEDIA_TYPES else JSONArrayReader()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        async for chunk in request.stream():
+            for item in reader.feed(decoder.decode(chunk)):
+                yield item
+        for item in reader.feed(decoder.decode(b"", final=True), final=True):
+            yield item
+    except UnicodeDecodeError:
+        raise invalid_body("it is not utf-8")
+
+async def read_chunks(request: Request, adapter: TypeAdapter):
+    """
+    Yield lists of (index, document or validation errors) of BulkImportSettings.CHUNK_SIZE items,
+    the documents are validated with the adapter (see app/models/work_out.py) and ready to be inserted
+    """
+    chunk = []
+    index = 0
+    async for item in read_items(request):
+        try:
+            chunk.append((index, adapter.validate_python(item)))
+        except ValidationError as error:
+            chunk.append((index, error.errors(include_url=False, include_context=False, include_input=False)))
+        index += 1
+        if len(chunk) >= BulkImportSettings.CHUNK_SIZE.value:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def import_documents(request: Request, adapter: TypeAdapter, insert_many):
+    """
+    Validate and insert the items of the body, "insert_many" inserts a list of documents and returns
+    (ids by position, errors by position). Returns the result of every item.
+    """
+    inserted = []
+    failed = []
+    async for chunk in read_chunks(request, adapter):
+        documents = [(index, document) for index, document in chunk if isinstance(document, dict)]
+        failed += [{"index": index, "errors": errors} for index, errors in chunk if not isinstance(errors, dict)]
+        if len(documents) == 0:
+            continue
+        ids, errors = await insert_many([document for _, document in documents])
+        for position, (index, _) in enumerate(documents):
+            if position in errors:
+                failed.append({"index": index, "errors": [errors[position]]})
+            else:
+                inserted.append({"index": index, "id": str(ids[position])})
+    return {"inserted": len(inserted), "failed": len(failed), "results": sorted(inserted + failed, key=lambda result: result["index"])}
@@ -0,0 +1,60 @@
+# Small in-process cache with a maximum size (least recently used entries are dropped) and a time to live
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter
+
+CACHE_LOOKUPS = Counter("sportreg_cache_lookups", "Lookups of the named in-process caches, by outcome (hit or miss)",
+                        ["cache", "outcome"])
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float, name: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name # counted in /metrics when it is given
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (expires_at, value)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key] # expired
+            self.misses += 1
+            self.count("miss")
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.count("hit")
+        return entry[1]
+
+    def count(self, outcome: str):
+        if self.name is not None:
+            CACHE_LOOKUPS.labels(cache=self.name, outcome=outcome).inc()
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+        }
@@ -0,0 +1,121 @@
+# Compression of the responses (brotli or gzip, as the client prefers) for the JSON and markdown payloads.
+# The streamed responses are compressed chunk by chunk and flushed, so they keep streaming.
+import zlib
+
+from app.settings import CompressionSettings
+
+try:
+    import brotli # optional, pip install brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/markdown", "text/plain", "application/x-tar", "application/x-ndjson")
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def choose_encoding(accept_encoding: str):
+    """
+    The encoding to use for an Accept-Encoding header, brotli over gzip with the same weight. None for no compression.
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, parameters = part.strip().partition(";")
+        weight = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                weight = float(parameters[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    best = None
+    for encoding in supported_encodings():
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > 0 and (best is None or weight > best[1]):
+            best = (encoding, weight)
+    return None if best is None else best[0]
+
+class Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=CompressionSettings.BROTLI_QUALITY.value)
+            self.compress = self.compressor.process
+            self.flush = self.compressor.flush
+            self.finish = self.compressor.finish
+        else:
+            # wbits 31: gzip header and trailer
+            self.compressor = zlib.compressobj(CompressionSettings.GZIP_LEVEL.value, zlib.DEFLATED, 31)
+            self.compress = self.compressor.compress
+            self.flush = lambda: self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self.compressor.flush
+
+def is_compressible(headers: list):
+    content_type = ""
+    for name, value in headers:
+        if name.lower() == b"content-encoding":
+            return False # already compressed
+        if name.lower() == b"content-type":
+            content_type = value.decode("latin-1").split(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES
+
+def compressed_headers(headers: list, encoding: str):
+    result = [(b"content-encoding", encoding.encode("latin-1")), (b"vary", b"Accept-Encoding")]
+    for name, value in headers:
+        lowered = name.lower()
+        if lowered in (b"content-length", b"vary"):
+            continue
+        if lowered == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value # the bytes are not the same as without compression
+        result.append((name, value))
+    return result
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware that compresses the responses of the COMPRESSIBLE_TYPES. The bodies sent in one message
+    are compressed only from CompressionSettings.MIN_SIZE bytes, the streamed ones always.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                start_message = message # sent with the first part of the body, when it is known if it is compressed
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = start_message.get("headers", [])
+                small = not more_body and len(body) < CompressionSettings.MIN_SIZE.value
+                if small or not is_compressible(headers) or start_message["status"] in (204, 304):
+                    await send(start_message)
+                    start_message = None # the rest of the body goes as it is
+                    return await send(message)
+                compressor = Compressor(encoding)
+                await send({**start_message, "headers": compressed_headers(headers, encoding)})
+
+            if more_body:
+                data = compressor.compress(body) + compressor.flush()
+            else:
+                data = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
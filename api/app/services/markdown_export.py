@@ -0,0 +1,141 @@
+# Markdown export of many users at once: the histories are read concurrently and rendered in a process pool.
+# The same pool renders the long histories of a single user, see render_batches.
+import asyncio
+import collections
+import hashlib
+import logging
+import multiprocessing
+import sys
+import tarfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.repositories import workouts as workouts_repository
+from app.repositories.projections import MARKDOWN_DOCUMENT
+from app.services import markdown_render
+from app.services.markdown_render import render_markdown_document
+from app.services.metrics import timed, RENDER_DURATION
+from app.settings import MarkdownSettings
+
+logger = logging.getLogger("uvicorn.error")
+
+_executor = None
+
+def gil_enabled():
+    # False only on the free-threaded builds of Python (3.13t and later)
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if gil_enabled():
+            # "spawn" because forking a process with the threads of the database driver is not safe
+            _executor = ProcessPoolExecutor(max_workers=MarkdownSettings.EXPORT_WORKERS.value,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        else:
+            # without the GIL threads render in parallel, and the workouts do not have to be pickled
+            _executor = ThreadPoolExecutor(max_workers=MarkdownSettings.EXPORT_WORKERS.value,
+                                           thread_name_prefix="markdown-render")
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def export_file_name(username: str):
+    return f"{username.replace('/', '_')}.md"
+
+def get_bulk_etag(data_versions: dict, lang: str, format_version: int):
+    """
+    ETag of an export of several users, it changes when any of them writes
+    """
+    versions = ",".join(f"{username}:{version}" for username, version in sorted(data_versions.items()))
+    digest = hashlib.sha1(f"{versions}|{lang}|{format_version}".encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+def should_offload(workouts: int):
+    return MarkdownSettings.PARALLEL_RENDER.value and workouts >= MarkdownSettings.PARALLEL_RENDER_MIN_WORKOUTS.value
+
+async def render_fragments(workouts: list, lang: str, username: str):
+    """
+    Render the workouts in the pool if there are enough of them (see should_offload), otherwise in the event loop
+    """
+    if should_offload(len(workouts)):
+        loop = asyncio.get_running_loop()
+        with timed(RENDER_DURATION, "render", mode="pool"):
+            return await loop.run_in_executor(get_executor(), markdown_render.render_fragments, workouts, lang, username)
+    with timed(RENDER_DURATION, "render", mode="inline"):
+        return markdown_render.render_fragments(workouts, lang, username)
+
+async def render_batches(batches, lang: str, username: str):
+    """
+    Render the batches of workouts of an async iterator, the history split in date order, and yield the fragments
+    of every batch in the same order. With parallel rendering up to EXPORT_WORKERS batches are rendered at once.
+    """
+    in_flight = collections.deque()
+    max_in_flight = MarkdownSettings.EXPORT_WORKERS.value if MarkdownSettings.PARALLEL_RENDER.value else 1
+    try:
+        async for workouts in batches:
+            in_flight.append(asyncio.ensure_future(render_fragments(workouts, lang, username)))
+            if len(in_flight) >= max_in_flight:
+                yield await in_flight.popleft()
+        while in_flight:
+            yield await in_flight.popleft()
+    finally:
+        for task in in_flight: # the client went away or a render failed
+            task.cancel()
+
+async def render_user(db: AsyncIOMotorDatabase, username: str, lang: str, semaphore: asyncio.Semaphore):
+    """
+    (username, markdown as bytes), the markdown is None if the user has no workouts or could not be rendered
+    """
+    async with semaphore: # limits the histories that are in memory at the same time
+        try:
+            workouts = [workout async for workout in workouts_repository.find_history(db, username, MARKDOWN_DOCUMENT)]
+            if len(workouts) == 0:
+                return username, None
+            loop = asyncio.get_running_loop()
+            with timed(RENDER_DURATION, "render", mode="export"):
+                content = await loop.run_in_executor(get_executor(), render_markdown_document, username, lang, workouts)
+        except Exception:
+            # the archive is already being sent, one user must not cut it
+            logger.exception(f"The markdown of {username} could not be exported, it is left out of the archive")
+            return username, None
+        return username, content
+
+async def export_markdowns(db: AsyncIOMotorDatabase, usernames: list, lang: str):
+    """
+    Yield (username, markdown as bytes) as the users are rendered, the users without workouts
+    or whose render failed are skipped
+    """
+    semaphore = asyncio.Semaphore(MarkdownSettings.EXPORT_WORKERS.value * 2)
+    tasks = [asyncio.create_task(render_user(db, username, lang, semaphore)) for username in usernames]
+    try:
+        for task in asyncio.as_completed(tasks):
+            username, content = await task
+            if content is not None:
+                yield username, content
+    finally:
+        for task in tasks: # the client went away or a render failed
+            task.cancel()
+
+async def stream_tar(markdowns):
+    """
+    Write the exported markdowns as a tar archive, one member per user, without keeping the archive in memory
+    """
+    mtime = int(time.time())
+    async for username, content in markdowns:
+        member = tarfile.TarInfo(export_file_name(username))
+        member.size = len(content)
+        member.mtime = mtime
+        member.mode = 0o644
+        yield member.tobuf(format=tarfile.GNU_FORMAT)
+        yield content
+        yield b"\0" * (-len(content) % tarfile.BLOCKSIZE)
+    # end of archive
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
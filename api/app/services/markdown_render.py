@@ -0,0 +1,147 @@
+# Rendering of the workouts and plans in markdown, without database access so it can also run in worker processes
+from datetime import timedelta
+
+# The texts of every language, adding a language is adding a catalog.
+# "{date}", "{day}", "{user}" and "{}" are filled in when rendering.
+CATALOGS = {
+    "es": {
+        "title": "# Entrenamientos de {user}\n\n",
+        "workout_heading": "## {date} {status} \n\n",
+        "plan_day_heading": "### Dia #{day} {date} {status} \n\n",
+        "table_header": "| Ejercicio | Instrumentos | Series | Repeticiones | Descanso | Instrucción | Comentarios |\n"
+                        "|-----------|-------------|--------|--------------|----------|----------|-------------|\n",
+        "post_workout_comments": "\n**Comentarios post-entrenamiento:** {}\n\n",
+        "plan_heading": "## Plan\n\n**Fecha inicial:** {date}\n\n",
+        "plan_date_format": "%d/%m/%y",
+        "general_instructions": "**Instrucciones generales:** {}\n\n",
+        "post_plan_comments": "**Comentarios post-plan:** {}\n\n",
+    },
+    "en": {
+        "title": "# Workouts for {user}\n\n",
+        "workout_heading": "## {date} {status} \n\n",
+        "plan_day_heading": "### Day #{day} {date} {status} \n\n",
+        "table_header": "| Exercise | Instruments | Sets | Reps | Rest | Instruction | Comments |\n"
+                        "|----------|-------------|------|------|------|----------|----------|\n",
+        "post_workout_comments": "\n**Post-workout comments:** {}\n\n",
+        "plan_heading": "## Plan\n\n**Initial date:** {date}\n\n",
+        "plan_date_format": "%y/%m/%d",
+        "general_instructions": "**General instructions:** {}\n\n",
+        "post_plan_comments": "**Post-plan comments:** {}\n\n",
+    },
+}
+
+COMPLETED_STATUS = {True: ":heavy_check_mark:", False: ":clock1:"}
+WORKOUT_DATE_FORMAT = "%d/%m/%Y"
+
+def compile_catalog(catalog: dict):
+    """
+    The templates of a language ready to use: the headings with the status already in place and the bound "format" methods
+    """
+    headings = {}
+    for type, key in (("normal", "workout_heading"), ("plan", "plan_day_heading")):
+        for completed, status in COMPLETED_STATUS.items():
+            # keep the other fields for later, only the status is known now
+            headings[type, completed] = catalog[key].replace("{status}", status).format
+    return {
+        "title": catalog["title"].format,
+        "headings": headings,
+        "table_header": catalog["table_header"],
+        "post_workout_comments": catalog["post_workout_comments"].format,
+        "plan_heading": catalog["plan_heading"].format,
+        "plan_date_format": catalog["plan_date_format"],
+        "general_instructions": catalog["general_instructions"].format,
+        "post_plan_comments": catalog["post_plan_comments"].format,
+    }
+
+TEMPLATES = {lang: compile_catalog(catalog) for lang, catalog in CATALOGS.items()}
+
+def get_templates(lang):
+    templates = TEMPLATES.get(lang)
+    if templates is None:
+        raise ValueError(f"Invalid language. Use {' or '.join(repr(lang) for lang in TEMPLATES)}")
+    return templates
+
+def transform_string_to_markdown_bytes(string_markdown: str):
+    return string_markdown.encode("utf-8")
+
+def not_available_if_none(value):
+    # "N/A" for the fields without a value
+    return "N/A" if value is None else value
+
+def get_instrument(instrument):
+    name = not_available_if_none(instrument.get('name', ''))
+    weight = instrument.get('weight')
+    detail = instrument.get('detail')
+    if weight is not None:
+        return f"{name} ({weight} kg, {detail})" if detail else f"{name} ({weight} kg)"
+    return f"{name} ({detail})" if detail else name
+
+def get_exercise_row(exercise):
+    get = exercise.get
+    instruments = get('instruments')
+    if instruments is None:
+        instruments = "N/A"
+    elif len(instruments) == 1:
+        instruments = get_instrument(instruments[0])
+    else:
+        instruments = ", ".join([get_instrument(instrument) for instrument in instruments])
+    name, sets, reps, rest, instruction = get('name'), get('sets'), get('reps'), get('rest_minutes'), get('instruction')
+    return (f"| {'N/A' if name is None else name} | {instruments} | {'N/A' if sets is None else sets} "
+            f"| {'N/A' if reps is None else reps} | {'N/A' if rest is None else f'{rest}m'} "
+            f"| {'N/A' if instruction is None else instruction} | {get('comments') or 'N/A'} |\n")
+
+def get_normal_workout(workout, lang, current_user, type:str = "normal", templates=None):
+    templates = templates or get_templates(lang)
+    # the date as dd/mm/yyyy
+    heading = templates["headings"][type, bool(workout["completed"])]
+    content = [heading(date=workout['date'].strftime(WORKOUT_DATE_FORMAT), day=workout.get('day')),
+               templates["table_header"]]
+    content += [get_exercise_row(exercise) for exercise in workout['exercises']]
+    if workout.get("post_workout_comments") is not None:
+        content.append(templates["post_workout_comments"](workout["post_workout_comments"]))
+    return "".join(content)
+
+def get_plan(workout, lang, current_user, templates=None):
+    templates = templates or get_templates(lang)
+    content = [templates["plan_heading"](date=workout['date'].strftime(templates["plan_date_format"]))]
+    if workout.get("general_instructions") is not None:
+        content.append(templates["general_instructions"](workout["general_instructions"]))
+    if workout.get("post_plan_comments") is not None:
+        content.append(templates["post_plan_comments"](workout["post_plan_comments"]))
+
+    # the date of every day of the plan, the first day is the initial date
+    processed_workouts = [{**plan_workout, "date": workout["date"] + timedelta(days=plan_workout["day"] - 1)}
+                          for plan_workout in workout["plan"]]
+    # order the days by "date", major to minor
+    processed_workouts.sort(key=lambda x: x["date"], reverse=True)
+
+    for plan_workout in processed_workouts:
+        content.append(get_normal_workout(plan_workout, lang, current_user, "plan", templates))
+        content.append("\n")
+    return "".join(content)
+
+def get_workout_or_plan(workout, lang, current_user):
+    if workout.get("type") == "plan":
+        return get_plan(workout, lang, current_user)
+    return get_normal_workout(workout, lang, current_user) + "\n"
+
+def render_fragments(workouts, lang, current_user):
+    """
+    The markdown of every workout or plan of the list, in the same order
+    """
+    templates = get_templates(lang)
+    return [get_plan(workout, lang, current_user, templates) if workout.get("type") == "plan"
+            else get_normal_workout(workout, lang, current_user, "normal", templates) + "\n"
+            for workout in workouts]
+
+def get_markdown_title(lang, current_user):
+    return get_templates(lang)["title"](user=current_user)
+
+def render_markdown_document(username, lang, workouts):
+    """
+    The whole markdown of a user as utf-8 bytes, "workouts" is the history sorted by date, the most recent first
+    """
+    content = [get_markdown_title(lang, username)]
+    for workout in workouts:
+        content.append(get_workout_or_plan(workout, lang, username))
+    return transform_string_to_markdown_bytes("".join(content))
@@ -0,0 +1,184 @@
+# Prometheus metrics of the api: latency of every route, MongoDB commands, bcrypt and markdown rendering.
+# The durations of the current request are also kept in a context variable, for the Server-Timing header
+# and the slow request log (Motor runs the commands in threads with a copy of the context, so they see it too).
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from pymongo import monitoring
+
+from app.settings import MetricsSettings
+
+logger = logging.getLogger("uvicorn.error")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_DURATION = Histogram("sportreg_http_request_duration_seconds", "Time to answer a request, until the last byte of the body",
+                             ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge("sportreg_http_requests_in_flight", "Requests being answered", ["method"],
+                           multiprocess_mode="livesum")
+MONGO_COMMAND_DURATION = Histogram("sportreg_mongo_command_duration_seconds", "Duration of the MongoDB commands",
+                                   ["command", "outcome"], buckets=LATENCY_BUCKETS)
+BCRYPT_DURATION = Histogram("sportreg_bcrypt_duration_seconds", "Time to hash or verify a password, including the wait for a thread",
+                            ["operation"], buckets=LATENCY_BUCKETS)
+RENDER_DURATION = Histogram("sportreg_markdown_render_duration_seconds", "Time to render a batch of workouts or a whole export",
+                            ["mode"], buckets=LATENCY_BUCKETS)
+SLOW_REQUESTS = Counter("sportreg_http_slow_requests", "Requests slower than MetricsSettings.SLOW_REQUEST_MS", ["method", "route"])
+
+# commands of the driver that are not interesting in the shapes of a slow request
+IGNORED_COMMANDS = {"hello", "isMaster", "ismaster", "ping", "endSessions", "saslStart", "saslContinue"}
+MAX_QUERY_SHAPES = 20
+
+class RequestTimings:
+    """
+    Durations of the current request by name ("db", "bcrypt", "render") and the shapes of its MongoDB commands
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.counts = {}
+        self.query_shapes = []
+        self.lock = threading.Lock() # the MongoDB commands are reported from the threads of the driver
+
+    def add(self, name: str, seconds: float):
+        with self.lock:
+            self.durations[name] = self.durations.get(name, 0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def server_timing(self):
+        entries = [f"app;dur={(time.perf_counter() - self.started) * 1000:.1f}"]
+        for name, seconds in self.durations.items():
+            entries.append(f'{name};dur={seconds * 1000:.1f};desc="{self.counts[name]}x"')
+        return ", ".join(entries)
+
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+def record(name: str, seconds: float):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+@contextlib.contextmanager
+def timed(histogram: Histogram, name: str, **labels):
+    """
+    Observe the duration of the block in the histogram and add it to the timings of the request as "name"
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.labels(**labels).observe(elapsed)
+        record(name, elapsed)
+
+def mask_values(value):
+    # keep the operators and field names of a filter, not the values
+    if isinstance(value, dict):
+        return {key: mask_values(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [mask_values(item) for item in value]
+    return "?"
+
+def query_shape(command_name: str, command: dict):
+    """
+    What a command does without its values, for the slow request log
+    """
+    shape = {"command": command_name}
+    collection = command.get(command_name)
+    if isinstance(collection, str):
+        shape["collection"] = collection
+    if "filter" in command:
+        shape["filter"] = mask_values(command["filter"])
+    if "sort" in command:
+        shape["sort"] = dict(command["sort"])
+    if "pipeline" in command:
+        shape["pipeline"] = [next(iter(stage), None) for stage in command["pipeline"]]
+    if "updates" in command:
+        shape["updates"] = len(command["updates"])
+    if "documents" in command:
+        shape["documents"] = len(command["documents"])
+    return shape
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Duration of every MongoDB command, added to the timings of the request that sent it
+    """
+    def started(self, event):
+        if MetricsSettings.SLOW_REQUEST_MS.value <= 0 or event.command_name in IGNORED_COMMANDS:
+            return
+        timings = current_timings.get()
+        if timings is not None and len(timings.query_shapes) < MAX_QUERY_SHAPES:
+            timings.query_shapes.append(query_shape(event.command_name, event.command))
+
+    def succeeded(self, event):
+        self.observe(event, "succeeded")
+
+    def failed(self, event):
+        self.observe(event, "failed")
+
+    def observe(self, event, outcome: str):
+        seconds = event.duration_micros / 1_000_000
+        MONGO_COMMAND_DURATION.labels(command=event.command_name, outcome=outcome).observe(seconds)
+        if event.command_name not in IGNORED_COMMANDS:
+            record("db", seconds)
+
+def get_route(scope: dict):
+    # the template of the route ("/api/workouts/changes"), the paths could have any value
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (it does not buffer the streamed responses) that times every request, adds the
+    Server-Timing header if MetricsSettings.SERVER_TIMING and logs the requests slower than MetricsSettings.SLOW_REQUEST_MS
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if MetricsSettings.SERVER_TIMING.value:
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timings.server_timing().encode("latin-1"))]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.labels(method=method).inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUESTS_IN_FLIGHT.labels(method=method).dec()
+            current_timings.reset(token)
+            elapsed = time.perf_counter() - timings.started
+            route = get_route(scope)
+            REQUEST_DURATION.labels(method=method, route=route, status=status).observe(elapsed)
+            slow_request_ms = MetricsSettings.SLOW_REQUEST_MS.value
+            if slow_request_ms > 0 and elapsed * 1000 >= slow_request_ms:
+                SLOW_REQUESTS.labels(method=method, route=route).inc()
+                logger.warning(f"Slow request {method} {route} {status} in {elapsed * 1000:.0f} ms, "
+                               f"timings {({name: round(seconds * 1000, 1) for name, seconds in timings.durations.items()})}, "
+                               f"queries {timings.query_shapes}")
+
+def get_latest_metrics():
+    """
+    The metrics in the Prometheus text format, and its content type. With several worker processes
+    (PROMETHEUS_MULTIPROC_DIR is set) the metrics of all of them are added up.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,65 @@
+# bcrypt hashing and verification in a bounded thread pool, so a burst of logins does not freeze the event loop
+# (bcrypt releases the GIL while hashing, so the threads run in parallel)
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt # for hashing passwords, see argon2-cffi for a better alternative
+from fastapi import HTTPException
+
+from app.services.metrics import timed, BCRYPT_DURATION
+from app.settings import PasswordHashingSettings
+
+_executor = None
+# counts the hashes running or queued in the pool
+_pending = threading.BoundedSemaphore(PasswordHashingSettings.HASHING_MAX_PENDING.value)
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PasswordHashingSettings.HASHING_WORKERS.value,
+                                       thread_name_prefix="bcrypt")
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def run_in_pool(function, *args):
+    """
+    Run a bcrypt function in the pool, 503 if there are already too many waiting
+    """
+    if not _pending.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many authentication requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        with timed(BCRYPT_DURATION, "bcrypt", operation=function.__name__):
+            return await asyncio.get_running_loop().run_in_executor(get_executor(), function, *args)
+    finally:
+        _pending.release()
+
+async def hash_password(password: str, rounds: int = None):
+    if rounds is None:
+        rounds = PasswordHashingSettings.BCRYPT_ROUNDS.value
+    salt = bcrypt.gensalt(rounds)
+    hashed_password = await run_in_pool(bcrypt.hashpw, password.encode('utf-8'), salt)
+    return hashed_password.decode('utf-8')
+
+async def verify_password(password: str, hashed_password: str):
+    return await run_in_pool(bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def needs_rehash(hashed_password: str):
+    """
+    True if the hash was made with a work factor different from the configured one
+    """
+    # format of the hash: $2b$<rounds>$<salt and hash>
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != PasswordHashingSettings.BCRYPT_ROUNDS.value
@@ -0,0 +1,56 @@
+# Rotating refresh tokens: opaque random strings, checked with an HMAC and a lookup (no bcrypt), and a new one on every refresh.
+# A token that is used twice was stolen (or the client is broken), its whole family is revoked so the thief is logged out too.
+import datetime
+import hashlib
+import hmac
+import logging
+import secrets
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.repositories import refresh_tokens as refresh_tokens_repository
+from app.settings import Oauth2Settings
+
+logger = logging.getLogger("uvicorn.error")
+
+def hash_token(token: str):
+    """
+    What is stored of a token, with the secret of the JWTs as key so a copy of the database does not give valid tokens
+    """
+    return hmac.new(Oauth2Settings.SECRET_KEY.value.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+def invalid_refresh_token():
+    return HTTPException(status_code=401, detail="Invalid refresh token", headers={"WWW-Authenticate": "Bearer"})
+
+async def issue_refresh_token(db: AsyncIOMotorDatabase, username: str, family: str = None):
+    """
+    Create and store a refresh token for the user, in a new family (a login) or in the family of the token it replaces
+    """
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=Oauth2Settings.REFRESH_TOKEN_EXPIRE_DAYS.value)
+    await refresh_tokens_repository.insert_token(db, hash_token(token), username, family or secrets.token_hex(16), expires_at)
+    return token
+
+async def rotate_refresh_token(db: AsyncIOMotorDatabase, token: str):
+    """
+    Use a refresh token and return (username, the refresh token that replaces it). 401 if it is not valid.
+    """
+    token_hash = hash_token(token)
+    document = await refresh_tokens_repository.use_token(db, token_hash, datetime.datetime.now(datetime.timezone.utc))
+    if document is None:
+        used = await refresh_tokens_repository.find_token(db, token_hash)
+        if used is not None and used["used"]:
+            logger.warning(f"Refresh token used twice by {used['username']}, revoking the session")
+            await refresh_tokens_repository.delete_family(db, used["family"])
+        raise invalid_refresh_token()
+    new_token = await issue_refresh_token(db, document["username"], document["family"])
+    return document["username"], new_token
+
+async def revoke_refresh_token(db: AsyncIOMotorDatabase, token: str):
+    """
+    Revoke the session of a refresh token (logout), nothing happens if it does not exist
+    """
+    document = await refresh_tokens_repository.find_token(db, hash_token(token))
+    if document is not None:
+        await refresh_tokens_repository.delete_family(db, document["family"])
@@ -0,0 +1,21 @@
+# JSON responses with MongoDB documents, encoded in one pass with orjson. The output is the relaxed
+# extended JSON of bson.json_util.dumps ({"$oid": ...}, {"$date": ...}), what the clients already read.
+import orjson
+from bson import ObjectId, json_util
+from fastapi.responses import JSONResponse
+
+def encode_bson(value):
+    # called by orjson for the types it does not know, and for every datetime (OPT_PASSTHROUGH_DATETIME)
+    if type(value) is ObjectId:
+        return {"$oid": str(value)}
+    return json_util.default(value, json_options=json_util.RELAXED_JSON_OPTIONS)
+
+def dumps_bson(content):
+    return orjson.dumps(content, default=encode_bson, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+class BSONJSONResponse(JSONResponse):
+    """
+    Return it from a route to send documents as they come from the database, without json.loads(dumps(...))
+    """
+    def render(self, content) -> bytes:
+        return dumps_bson(content)
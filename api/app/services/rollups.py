@@ -0,0 +1,76 @@
+# Training statistics by day and by week ("stats_rollups" collection), added up as the workouts and plans are written,
+# so the progress charts read a document per period instead of the whole history.
+# Every workout and every day of a plan is a session, the volume of an exercise is sets x reps x weight.
+import datetime
+
+DAY = "day"
+WEEK = "week"
+PERIODS = (DAY, WEEK)
+TOTAL = None # the "exercise" of the rollups of every exercise together
+
+def period_start(date: datetime.datetime, period: str):
+    """
+    Start of the day or of the week (monday) of the date
+    """
+    start = datetime.datetime.combine(date.date(), datetime.time())
+    if period == WEEK:
+        start -= datetime.timedelta(days=start.weekday())
+    return start
+
+def count_reps(reps):
+    # "30s" or "1m" are durations, "8-10" or "AMRAP" can not be added up
+    if isinstance(reps, int):
+        return reps
+    if isinstance(reps, str) and reps.strip().isdigit():
+        return int(reps)
+    return 0
+
+def exercise_totals(exercise: dict):
+    """
+    (sets, reps, volume) of an exercise, the volume uses the weights of its instruments
+    """
+    sets = exercise.get("sets") or 0
+    reps = count_reps(exercise.get("reps"))
+    weight = sum(instrument.get("weight") or 0 for instrument in exercise.get("instruments") or [])
+    return sets, sets * reps, sets * reps * weight
+
+def get_sessions(document: dict):
+    """
+    (date, completed, exercises) of a workout, or of every day of a plan
+    """
+    date = document["date"]
+    if document.get("type") == "plan":
+        for plan_workout in document.get("plan", []):
+            day = date + datetime.timedelta(days=plan_workout.get("day", 1) - 1)
+            yield day, bool(plan_workout.get("completed")), plan_workout.get("exercises", [])
+    else:
+        yield date, bool(document.get("completed")), document.get("exercises", [])
+
+def add(totals: dict, key: tuple, sessions: int, completed: int, sets: int = 0, reps: int = 0, volume: float = 0):
+    counters = totals.setdefault(key, {"sessions": 0, "completed": 0, "sets": 0, "reps": 0, "volume": 0})
+    counters["sessions"] += sessions
+    counters["completed"] += completed
+    counters["sets"] += sets
+    counters["reps"] += reps
+    counters["volume"] += volume
+
+def rollup_increments(documents: list, totals: dict = None):
+    """
+    What the documents add to the rollups, as a dict by (period, start, exercise) of the counters.
+    The sets, reps and volume are only counted for the completed sessions. Pass "totals" to keep adding to it.
+    """
+    totals = {} if totals is None else totals
+    for document in documents:
+        for date, completed, exercises in get_sessions(document):
+            for period in PERIODS:
+                start = period_start(date, period)
+                session_totals = [0, 0, 0]
+                for exercise in exercises:
+                    name = (exercise.get("name") or "").strip()
+                    sets, reps, volume = exercise_totals(exercise) if completed else (0, 0, 0)
+                    add(totals, (period, start, name), 1, int(completed), sets, reps, volume)
+                    session_totals[0] += sets
+                    session_totals[1] += reps
+                    session_totals[2] += volume
+                add(totals, (period, start, TOTAL), 1, int(completed), *session_totals)
+    return totals
@@ -0,0 +1,193 @@
+# Coalescing of concurrent identical requests in the process: while a computation for a key is running, the requests
+# with the same key wait for it and get its result instead of running it again (the "singleflight" pattern).
+# It is opt-in per route, with the coalesce decorator for the handlers that return a value and Group.stream for the
+# streamed responses. The result is shared, the callers must not modify it.
+import asyncio
+import collections
+import functools
+import weakref
+
+from prometheus_client import Counter
+
+from app.settings import SingleflightSettings
+
+COALESCED_CALLS = Counter("sportreg_singleflight_calls", "Calls to a coalesced route, by whether they ran the computation "
+                          "(leader) or waited for another one (shared)", ["route", "outcome"])
+
+class Group:
+    """
+    The computations in flight by key, the first element of the key is the name of the route (for the metrics)
+    """
+    def __init__(self):
+        self._flights = {} # key -> task or SharedStream
+        self.leaders = {}
+        self.shared = {}
+
+    def count(self, key: tuple, outcome: str):
+        counters = self.leaders if outcome == "leader" else self.shared
+        counters[key[0]] = counters.get(key[0], 0) + 1
+        COALESCED_CALLS.labels(route=key[0], outcome=outcome).inc()
+
+    async def do(self, key: tuple, function, *args, **kwargs):
+        """
+        Await function(*args, **kwargs), or the call already running for the key
+        """
+        task = self._flights.get(key)
+        if task is None:
+            self.count(key, "leader")
+            # in its own task, so a caller that goes away does not cancel the others
+            task = asyncio.ensure_future(function(*args, **kwargs))
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self.forget(key, task))
+        else:
+            self.count(key, "shared")
+        return await asyncio.shield(task)
+
+    def join(self, key: tuple):
+        """
+        The stream running for the key, from its first chunk. None if there is no one, or if its first chunks
+        were already dropped (the request starts its own stream)
+        """
+        shared = self._flights.get(key)
+        if not isinstance(shared, SharedStream) or not shared.joinable():
+            return None
+        self.count(key, "shared")
+        return shared.subscribe()
+
+    def stream(self, key: tuple, source):
+        """
+        Share the async iterator with the requests that join the key before its first chunk is dropped. If another one
+        can be joined, that one is returned and the source is not used.
+        """
+        subscription = self.join(key)
+        if subscription is not None:
+            return subscription
+        self.count(key, "leader")
+        shared = SharedStream(source, lambda: self.forget(key, shared))
+        self._flights[key] = shared
+        return shared.subscribe()
+
+    def forget(self, key: tuple, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self):
+        routes = {}
+        for route in set(self.leaders) | set(self.shared):
+            leaders = self.leaders.get(route, 0)
+            shared = self.shared.get(route, 0)
+            routes[route] = {"leaders": leaders, "shared": shared, "coalescing_ratio": shared / (leaders + shared)}
+        return {"in_flight": len(self._flights), "routes": routes}
+
+class SharedStream:
+    """
+    An async iterator read by several consumers: a task reads it and keeps the chunks that some consumer did not read yet,
+    every consumer reads them from the start. The task waits while SingleflightSettings.STREAM_BUFFER_CHUNKS chunks are unread,
+    so the memory is bounded by the slowest consumer and not by the size of the stream. The consumers can only join before
+    the first chunk is dropped, and the task is cancelled if every consumer goes away.
+    """
+    def __init__(self, source, on_done):
+        self.source = source
+        self.on_done = on_done
+        self.chunks = collections.deque() # the chunks from the position "start" on
+        self.start = 0
+        self.positions = {} # consumer -> position of its next chunk
+        self.error = None
+        self.finished = False
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def joinable(self):
+        return self.start == 0
+
+    async def produce(self):
+        try:
+            async for chunk in self.source:
+                self.chunks.append(chunk)
+                self.notify()
+                while len(self.chunks) >= SingleflightSettings.STREAM_BUFFER_CHUNKS.value:
+                    await self.changed.wait() # a consumer read a chunk or went away
+        except asyncio.CancelledError:
+            self.error = RuntimeError("The shared stream was cancelled") # for a consumer that joined at the end
+            raise
+        except Exception as error:
+            self.error = error
+        finally:
+            self.finished = True
+            self.on_done() # the requests that come later start a new computation
+            self.notify()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def subscribe(self):
+        # registered before it is iterated, so the first chunks are kept for it and the stream is not cancelled in between
+        consumer = object()
+        self.positions[consumer] = self.start
+        reader = self.read(consumer)
+        weakref.finalize(reader, self.leave, consumer) # a response that is never iterated does not hold the stream
+        return reader
+
+    def release(self):
+        # drop the chunks that every consumer has read
+        lowest = min(self.positions.values(), default=self.start + len(self.chunks))
+        while self.start < lowest:
+            self.chunks.popleft()
+            self.start += 1
+        self.notify()
+
+    def leave(self, consumer):
+        if self.positions.pop(consumer, None) is None:
+            return
+        self.release()
+        if not self.positions and not self.finished:
+            self.on_done() # even if the task is cancelled before it starts
+            if self.task is not None:
+                self.task.cancel()
+
+    async def read(self, consumer):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.produce())
+        try:
+            while True:
+                changed = self.changed
+                position = self.positions[consumer]
+                if position < self.start + len(self.chunks):
+                    chunk = self.chunks[position - self.start]
+                    self.positions[consumer] = position + 1
+                    self.release()
+                    yield chunk
+                    continue
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await changed.wait()
+        finally:
+            self.leave(consumer)
+
+requests_group = Group()
+
+def coalesce(route: str, *key_parameters: str, version=None, group: Group = requests_group):
+    """
+    Decorator of an async route handler: the concurrent calls with the same values of the key_parameters share one call.
+    "version" is an async function called with the arguments of the handler, its result is part of the key so a request
+    that comes after a write does not get the result of a call that started before it.
+    """
+    def decorator(handler):
+        if not SingleflightSettings.ENABLED.value:
+            return handler
+
+        @functools.wraps(handler) # FastAPI reads the parameters of the handler
+        async def coalesced_handler(**kwargs):
+            key = (route, *(freeze(kwargs[name]) for name in key_parameters))
+            if version is not None:
+                key += (await version(**kwargs),)
+            return await group.do(key, handler, **kwargs)
+        return coalesced_handler
+    return decorator
+
+def freeze(value):
+    # lists (repeated query parameters) can not be keys
+    return tuple(value) if isinstance(value, list) else value
@@ -0,0 +1,26 @@
+# Recompute the statistics of a user from its whole history, for the data written before the rollups existed
+# or after changing how they are computed (see app/services/rollups.py)
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.repositories import stats as stats_repository
+from app.repositories import workouts as workouts_repository
+from app.repositories.projections import MARKDOWN_DOCUMENT
+from app.services.rollups import rollup_increments
+
+async def rebuild_user_stats(db: AsyncIOMotorDatabase, username: str, batch_size: int = 1000):
+    """
+    Replace the rollups of the user with the ones of its history, read in batches. Returns how many documents were read.
+    The writes of the user while it runs can be counted twice or lost, run it when the user is not active.
+    """
+    await stats_repository.delete_rollups(db, username)
+    increments = {}
+    read = 0
+    # the renderer and the rollups read the same fields
+    async for document in workouts_repository.find_history(db, username, MARKDOWN_DOCUMENT, batch_size):
+        rollup_increments([document], increments)
+        read += 1
+        if read % batch_size == 0:
+            await stats_repository.apply_increments(db, username, increments)
+            increments = {}
+    await stats_repository.apply_increments(db, username, increments)
+    return read
@@ -0,0 +1,59 @@
+# Copy of the per-user collections to the shared "workouts" and "plans" collections (storage mode "shared").
+# The documents keep their _id, so running it again only copies what is missing: run it, switch
+# STORAGE_MODE to "shared" and run it again to pick up the writes made in between.
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+
+from app.repositories.indexes import ensure_shared_indexes
+from app.repositories.storage import get_user_collection, is_reserved_username, SHARED_WORKOUTS, SHARED_PLANS
+
+DUPLICATE_KEY_ERROR = 11000
+
+async def find_per_user_collections(db: AsyncIOMotorDatabase):
+    names = await db.list_collection_names()
+    return sorted(name for name in names if not is_reserved_username(name))
+
+async def insert_batch(collection, documents: list):
+    """
+    Insert the documents, skipping the ones already copied. Returns how many were inserted.
+    """
+    if len(documents) == 0:
+        return 0
+    try:
+        response = await collection.insert_many(documents, ordered=False)
+        return len(response.inserted_ids)
+    except BulkWriteError as error:
+        if any(write_error["code"] != DUPLICATE_KEY_ERROR for write_error in error.details["writeErrors"]):
+            raise
+        return error.details["nInserted"]
+
+async def migrate_user(db: AsyncIOMotorDatabase, username: str, batch_size: int = 1000, drop_source: bool = False):
+    """
+    Copy the collection of the user in batches. Returns (workouts copied, plans copied).
+    The source is dropped only if asked and every document is in the shared collections.
+    """
+    await ensure_shared_indexes(db)
+    source = get_user_collection(db, username)
+    batches = {SHARED_WORKOUTS: [], SHARED_PLANS: []}
+    copied = {SHARED_WORKOUTS: 0, SHARED_PLANS: 0}
+
+    async for document in source.find().batch_size(batch_size):
+        document["user_id"] = username
+        target = SHARED_PLANS if document.get("type") == "plan" else SHARED_WORKOUTS
+        batches[target].append(document)
+        if len(batches[target]) >= batch_size:
+            copied[target] += await insert_batch(db[target], batches[target])
+            batches[target] = []
+    for target, documents in batches.items():
+        copied[target] += await insert_batch(db[target], documents)
+
+    if drop_source:
+        total = await source.count_documents({})
+        shared_total = (await db[SHARED_WORKOUTS].count_documents({"user_id": username})
+                        + await db[SHARED_PLANS].count_documents({"user_id": username}))
+        if shared_total >= total:
+            await source.drop()
+        else:
+            raise RuntimeError(f"The collection of {username} has {total} documents but only {shared_total} were copied, it was not dropped")
+
+    return copied[SHARED_WORKOUTS], copied[SHARED_PLANS]
@@ -0,0 +1,74 @@
+# Completion flags of the plans, user summaries and sync versions for the data written before they existed,
+# and dates stored as strings by old versions of the schedule again routes
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.repositories import plans as plans_repository
+from app.repositories import workouts as workouts_repository
+from app.repositories.storage import (is_shared_storage, get_workouts_collection, get_plans_collection, workouts_filter,
+                                      plans_filter, SHARED_WORKOUTS, SHARED_PLANS)
+from app.repositories.summaries import record_completed, LAST_COMPLETED_WORKOUT, LAST_COMPLETED_PLAN
+from app.services.storage_migration import find_per_user_collections
+
+async def find_usernames_with_data(db: AsyncIOMotorDatabase):
+    if is_shared_storage():
+        usernames = set(await db[SHARED_WORKOUTS].distinct("user_id")) | set(await db[SHARED_PLANS].distinct("user_id"))
+        return sorted(usernames)
+    return await find_per_user_collections(db)
+
+async def backfill_dates(db: AsyncIOMotorDatabase, username: str):
+    """
+    Convert the "YYYY-MM-DD" string dates to dates, so the queries by date and the rendering see them.
+    Returns how many were updated.
+    """
+    update = [{"$set": {"date": {"$dateFromString": {"dateString": "$date", "format": "%Y-%m-%d"}}}}]
+    query = {"date": {"$type": "string"}}
+    result = await get_workouts_collection(db, username).update_many(workouts_filter(username, query), update)
+    updated = result.modified_count
+    if is_shared_storage():
+        result = await get_plans_collection(db, username).update_many(plans_filter(username, query), update)
+        updated += result.modified_count
+    return updated
+
+async def backfill_plan_flags(db: AsyncIOMotorDatabase, username: str, batch_size: int = 1000):
+    """
+    Set completed_days and all_completed on the plans that do not have them. Returns how many were updated.
+    """
+    collection = get_plans_collection(db, username)
+    updates = []
+    updated = 0
+    async for plan in collection.find(plans_filter(username, {"all_completed": {"$exists": False}}), {"plan.completed": 1}).batch_size(batch_size):
+        plans_repository.set_completion(plan)
+        updates.append(UpdateOne({"_id": plan["_id"]}, {"$set": {"completed_days": plan["completed_days"],
+                                                                   "all_completed": plan["all_completed"]}}))
+        if len(updates) >= batch_size:
+            updated += (await collection.bulk_write(updates, ordered=False)).modified_count
+            updates = []
+    if updates:
+        updated += (await collection.bulk_write(updates, ordered=False)).modified_count
+    return updated
+
+async def backfill_summary(db: AsyncIOMotorDatabase, username: str):
+    """
+    Point the summary of the user to its last completed workout and plan
+    """
+    workout = await workouts_repository.find_last_completed_workout(db, username, {"date": 1})
+    if workout is not None:
+        await record_completed(db, username, LAST_COMPLETED_WORKOUT, workout["_id"], workout["date"])
+    plan = await plans_repository.find_last_completed_plan(db, username, {"date": 1})
+    if plan is not None:
+        await record_completed(db, username, LAST_COMPLETED_PLAN, plan["_id"], plan["date"])
+
+async def backfill_seq(db: AsyncIOMotorDatabase, username: str):
+    """
+    Give "seq" 0 and "updated_at" (the time of the id) to the documents written before the delta sync,
+    so the first sync of a client returns them (see app/repositories/changes.py). Returns how many were updated.
+    """
+    update = [{"$set": {"seq": 0, "updated_at": {"$toDate": "$_id"}}}]
+    query = {"seq": {"$exists": False}}
+    result = await get_workouts_collection(db, username).update_many(workouts_filter(username, query), update)
+    updated = result.modified_count
+    if is_shared_storage():
+        result = await get_plans_collection(db, username).update_many(plans_filter(username, query), update)
+        updated += result.modified_count
+    return updated
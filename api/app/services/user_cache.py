@@ -0,0 +1,12 @@
+# Usernames already verified against the database, so authenticated requests skip the "users" lookup
+from app.services.cache import TTLCache
+from app.settings import Oauth2Settings
+
+verified_users = TTLCache(maxsize=Oauth2Settings.VERIFIED_USERS_CACHE_SIZE.value,
+                          ttl=Oauth2Settings.VERIFIED_USERS_CACHE_TTL_SECONDS.value, name="verified_users")
+
+def invalidate_user(username: str):
+    """
+    Forget a verified user, must be called when the user is deleted or its password changes
+    """
+    verified_users.delete(username)
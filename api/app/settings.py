@@ -8,10 +8,26 @@ class Oauth2Settings(Enum):
     SECRET_KEY = "SUPER-SECRET-KEY-FOR-OAUTH2" if os.environ.get(
         "SECRET_KEY_OAUTH2") is None else os.environ.get("SECRET_KEY_OAUTH2")
     ALGORITHM = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES = 0 if os.environ.get(
-        "PRODUCTION") == "True" else 1
-    ACCESS_TOKEN_EXPIRE_DAYS = 7 if os.environ.get(
-        "PRODUCTION") == "True" else 0
+    # short lived, the clients get a new one with the refresh token instead of the password
+    ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES") or (15 if os.environ.get(
+        "PRODUCTION") == "True" else 1))
+    # refresh tokens, a new one is given on every refresh (the used one is revoked)
+    REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS") or (30 if os.environ.get(
+        "PRODUCTION") == "True" else 1))
+    # users that were found in the database for a valid token, kept in memory
+    VERIFIED_USERS_CACHE_SIZE = int(os.environ.get("VERIFIED_USERS_CACHE_SIZE") or 10000)
+    VERIFIED_USERS_CACHE_TTL_SECONDS = int(os.environ.get("VERIFIED_USERS_CACHE_TTL_SECONDS") or 300)
+
+# Password hashing settings
+
+
+class PasswordHashingSettings(Enum):
+    # bcrypt work factor, the stored hashes are upgraded on login when it changes
+    BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS") or 12)
+    # threads that run bcrypt outside of the event loop
+    HASHING_WORKERS = int(os.environ.get("HASHING_WORKERS") or os.cpu_count() or 2)
+    # hashes running or waiting for a thread, above this the api answers 503
+    HASHING_MAX_PENDING = int(os.environ.get("HASHING_MAX_PENDING") or 32)
 
 # Database settings
 
@@ -20,6 +36,109 @@ class DatabaseSettings(Enum):
     MONGO_USERNAME = os.environ.get("MONGO_USERNAME") or "admin"
     MONGO_PASSWORD = os.environ.get("MONGO_PASSWORD") or "myPassword123"
     MONGO_CLUSTER = os.environ.get("MONGO_CLUSTER") or None
+    # full connection string, overrides the production/development uri (e.g. a local mongod for benchmarks)
+    MONGO_URI = os.environ.get("MONGO_URI") or None
+    MONGO_DATABASE = os.environ.get("MONGO_DATABASE") or "sportreg"
+    # "per_user": a collection per user, named as the username (the original layout)
+    # "shared": the "workouts" and "plans" collections for every user, keyed by "user_id" (run "python -m app.manage migrate-storage" first)
+    STORAGE_MODE = os.environ.get("STORAGE_MODE") or "per_user"
+
+    # connection pool, one client is shared by every request of a worker
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE") or 50)
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE") or 2)
+    MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS") or 300000)
+
+    # timeouts in milliseconds
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS") or 5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS") or 5000)
+    MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS") or 20000)
+
+    # the SRV record is resolved once per client (and polled in the background), 0 uses every host of the record
+    MONGO_SRV_MAX_HOSTS = int(os.environ.get("MONGO_SRV_MAX_HOSTS") or 0)
+
+    # startup health check
+    MONGO_STARTUP_PING_ATTEMPTS = int(os.environ.get("MONGO_STARTUP_PING_ATTEMPTS") or 3)
+    MONGO_STARTUP_PING_DELAY_SECONDS = float(os.environ.get("MONGO_STARTUP_PING_DELAY_SECONDS") or 1)
+
+# Markdown export settings
+
+
+class MarkdownSettings(Enum):
+    # workouts fetched from the database per round-trip
+    CURSOR_BATCH_SIZE = int(os.environ.get("MARKDOWN_CURSOR_BATCH_SIZE") or 200)
+    # size of the chunks sent to the client while the markdown is rendered
+    STREAM_CHUNK_BYTES = int(os.environ.get("MARKDOWN_STREAM_CHUNK_BYTES") or 64 * 1024)
+    # rendered workouts and plans kept in memory, by (user, lang, id)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get("MARKDOWN_FRAGMENT_CACHE_SIZE") or 20000)
+    FRAGMENT_CACHE_TTL_SECONDS = int(os.environ.get("MARKDOWN_FRAGMENT_CACHE_TTL_SECONDS") or 24 * 60 * 60)
+    # processes that render the markdowns of the bulk export
+    EXPORT_WORKERS = int(os.environ.get("MARKDOWN_EXPORT_WORKERS") or os.cpu_count() or 2)
+    # render long histories of /api/markdown/get/workouts in the same workers, instead of the event loop
+    PARALLEL_RENDER = os.environ.get("MARKDOWN_PARALLEL_RENDER") == "True"
+    # batches with fewer workouts to render than this are rendered in the event loop, sending them costs more than it saves
+    PARALLEL_RENDER_MIN_WORKOUTS = int(os.environ.get("MARKDOWN_PARALLEL_RENDER_MIN_WORKOUTS") or 50)
+
+# Bulk insert settings
+
+
+class BulkImportSettings(Enum):
+    # items validated and written together
+    CHUNK_SIZE = int(os.environ.get("BULK_IMPORT_CHUNK_SIZE") or 500)
+    # largest item accepted, it bounds what is buffered while the body is read
+    MAX_ITEM_BYTES = int(os.environ.get("BULK_IMPORT_MAX_ITEM_BYTES") or 1024 * 1024)
+
+# Delta sync settings
+
+
+class SyncSettings(Enum):
+    # a write that reserved its "seq" and did not finish in this time is considered dead (its process stopped),
+    # the sync stops waiting for it and returns the changes written after it
+    WRITE_TIMEOUT_SECONDS = float(os.environ.get("SYNC_WRITE_TIMEOUT_SECONDS") or 300)
+
+# Metrics settings
+
+
+class MetricsSettings(Enum):
+    # latency histograms of the routes, MongoDB, bcrypt and rendering, exposed in /metrics
+    ENABLED = (os.environ.get("METRICS_ENABLED") or "True") == "True"
+    # add the Server-Timing header (durations of the request by step) to the responses
+    SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING") == "True"
+    # log the requests slower than this with the shapes of their queries, 0 disables it
+    SLOW_REQUEST_MS = float(os.environ.get("METRICS_SLOW_REQUEST_MS") or 1000)
+
+# Compression settings
+
+
+class CompressionSettings(Enum):
+    # gzip, or brotli if the "brotli" package is installed, for the JSON and markdown responses
+    ENABLED = (os.environ.get("COMPRESSION_ENABLED") or "True") == "True"
+    # smaller bodies are sent as they are, the streamed ones are always compressed
+    MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE") or 1024)
+    GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL") or 6)
+    BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY") or 4)
+
+# Request coalescing settings
+
+
+class SingleflightSettings(Enum):
+    # concurrent identical requests of the coalesced routes (pending workouts, markdown) share one computation
+    ENABLED = (os.environ.get("SINGLEFLIGHT_ENABLED") or "True") == "True"
+    # chunks of a shared stream kept for the slowest request, the stream waits for it when they are all unread
+    STREAM_BUFFER_CHUNKS = int(os.environ.get("SINGLEFLIGHT_STREAM_BUFFER_CHUNKS") or 4)
+
+# Production server settings (gunicorn, see app/gunicorn_conf.py)
+
+
+class ServingSettings(Enum):
+    BIND = os.environ.get("BIND") or "0.0.0.0:80"
+    # a worker is replaced after this many requests, plus a random jitter so they are not replaced at the same time, 0 never
+    MAX_REQUESTS = int(os.environ.get("MAX_REQUESTS") or 10000)
+    MAX_REQUESTS_JITTER = int(os.environ.get("MAX_REQUESTS_JITTER") or 1000)
+    # seconds for the requests in flight to finish when a worker is replaced or the server stops
+    GRACEFUL_TIMEOUT = int(os.environ.get("GRACEFUL_TIMEOUT") or 30)
+    # a worker that does not answer the arbiter for this long is killed and replaced
+    TIMEOUT = int(os.environ.get("WORKER_TIMEOUT") or 60)
+    KEEPALIVE = int(os.environ.get("KEEPALIVE") or 5)
 
 # Model constraints
 
@@ -0,0 +1,24 @@
+# Access to the development database for the tests that need one, they are skipped when it is not reachable
+import pytest
+from pymongo.mongo_client import MongoClient
+from pymongo.errors import PyMongoError
+
+from app.dependencies.db_dependencies import get_mongo_uri, get_mongo_client_options
+from app.settings import DatabaseSettings
+
+
+def get_test_db():
+    return MongoClient(get_mongo_uri(), **get_mongo_client_options())[DatabaseSettings.MONGO_DATABASE.value]
+
+
+def mongo_is_available():
+    options = get_mongo_client_options()
+    options["serverSelectionTimeoutMS"] = 1000
+    try:
+        MongoClient(get_mongo_uri(), **options).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+requires_mongo = pytest.mark.skipif(not mongo_is_available(), reason="the development database is not reachable")
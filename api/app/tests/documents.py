@@ -0,0 +1,29 @@
+# Workouts and plans as they are stored, for the tests of the repositories, the routers and the services
+import datetime
+
+FIRST_DAY = datetime.datetime(2024, 5, 1)
+
+
+def build_exercise(name: str = "Squat", sets: int = 5, reps=5, *weights: float, **fields):
+    # an instrument for every weight
+    exercise = {"name": name, "sets": sets, "reps": reps, "rest_minutes": "3",
+                "instruments": [{"name": "Barbell", "weight": weight} for weight in weights]}
+    exercise.update(fields)
+    return exercise
+
+
+def build_workout(day: int, completed: bool = True, exercises: list = None, **fields):
+    # the day 1 is the 1st of May of 2024, by default a squat 5x5 with 60 kg
+    workout = {"date": FIRST_DAY + datetime.timedelta(days=day - 1), "completed": completed,
+               "exercises": [build_exercise("Squat", 5, 5, 60.0)] if exercises is None else exercises}
+    workout.update(fields)
+    return workout
+
+
+def build_plan(day: int, *completed: bool, exercises: list = None, **fields):
+    # a day of the plan for every value of "completed"
+    plan = {"type": "plan", "date": FIRST_DAY + datetime.timedelta(days=day - 1),
+            "plan": [{"day": i + 1, "completed": value, "exercises": [] if exercises is None else exercises}
+                     for i, value in enumerate(completed)]}
+    plan.update(fields)
+    return plan
@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 
+from app import main
 from app.main import app
 
 client = TestClient(app)
@@ -8,3 +9,20 @@ def test_get_state_prod_or_develop():
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"State": "Development"} # when running pytest, the environment variable PRODUCTION is not set to True, so the app is running in development mode
+
+def test_ready_depends_on_the_database(monkeypatch):
+    async def ping_db(answers):
+        return answers
+    monkeypatch.setattr(main, "ping_db", lambda: ping_db(False))
+    assert client.get("/ready").status_code == 503
+    monkeypatch.setattr(main, "ping_db", lambda: ping_db(True))
+    assert client.get("/ready").json() == {"State": "Ready"}
+
+def test_reserved_usernames_can_not_be_registered():
+    response = client.post("/api/auth/register", json={"username": "refresh_tokens", "password": "Spotless9454pass"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid username"}
+
+def test_bulk_markdown_needs_the_users():
+    # the export of every registered user is only in the manage cli
+    assert client.get("/api/markdown/get/workouts/bulk", params={"lang": "en"}).status_code == 422
@@ -0,0 +1,38 @@
+import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from app.models.work_out import Exercise, Plan, Workout, plan_adapter, workout_adapter
+
+def exercise(reps):
+    return {"name": "Squat", "sets": 4, "reps": reps, "rest_minutes": "2",
+            "instruments": [{"name": "Barbell", "weight": 60}]}
+
+
+@pytest.mark.parametrize("reps", [0, 12, "12m", "30s", "10", "to failure", "12x"])
+def test_valid_reps(reps):
+    assert Exercise(**exercise(reps)).reps == reps
+    assert workout_adapter.validate_python({"exercises": [exercise(reps)]})["exercises"][0]["reps"] == reps
+
+
+@pytest.mark.parametrize("reps", [-1, "m", "s", "x s", "", 1.5, None])
+def test_invalid_reps(reps):
+    with pytest.raises(ValidationError):
+        Exercise(**exercise(reps))
+    with pytest.raises(ValidationError):
+        workout_adapter.validate_python({"exercises": [exercise(reps)]})
+
+
+def test_documents_are_the_dump_of_the_models():
+    workout = {"date": "2024-05-01", "exercises": [exercise("12m"), exercise(8)], "completed": True}
+    plan = {"date": "2024-05-01", "plan": [{"day": 1, "exercises": [exercise(5)]}, {"day": 2, "exercises": [exercise("45s")]}],
+            "general_instructions": "Warm up"}
+    assert workout_adapter.validate_python(workout) == Workout.model_validate(workout).model_dump()
+    assert plan_adapter.validate_python(plan) == Plan.model_validate(plan).model_dump()
+
+
+def test_date_defaults_to_today():
+    document = workout_adapter.validate_python({"exercises": []})
+    assert isinstance(document["date"], datetime.datetime)
+    assert Workout(exercises=[]).date == document["date"]
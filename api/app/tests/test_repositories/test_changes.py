@@ -0,0 +1,82 @@
+import asyncio
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.dependencies.db_dependencies import get_db
+from app.repositories import changes
+from app.repositories import data_versions
+from app.repositories import workouts as workouts_repository
+from app.tests.database import get_test_db, requires_mongo
+
+TEST_USER = "ChangesTester01"
+
+
+def test_token_round_trip():
+    document = {"seq": 12, "_id": ObjectId()}
+    assert changes.decode_token(changes.encode_token(document)) == (12, document["_id"])
+    assert changes.changes_query(changes.encode_token(document)) == \
+        {"$or": [{"seq": {"$gt": 12}}, {"seq": 12, "_id": {"$gt": document["_id"]}}]}
+    assert changes.changes_query(None, 7) == {"$and": [{"seq": {"$gte": 0}}, {"seq": {"$lte": 7}}]}
+    for token in ("", "12", "x.5f0c", "12.not-an-id"):
+        with pytest.raises(ValueError):
+            changes.decode_token(token)
+
+
+@requires_mongo
+def test_changes_are_returned_in_pages():
+    db = get_test_db()
+    db[TEST_USER].drop()
+    db["data_versions"].delete_one({"_id": TEST_USER})
+
+    async def run():
+        for day in range(1, 4):
+            await workouts_repository.insert_workout(get_db(), TEST_USER, {"date": datetime.datetime(2024, 5, day),
+                                                                           "exercises": [], "completed": False})
+        return await changes.find_changes(get_db(), TEST_USER, None, 2)
+
+    try:
+        documents, token, has_more = asyncio.run(run())
+        assert [document["seq"] for document in documents] == [1, 2] and has_more
+        # the sequence and the version are increased by the same update, no write is in flight
+        assert db["data_versions"].find_one({"_id": TEST_USER}) == {"_id": TEST_USER, "seq": 3, "version": 3, "writing": []}
+        documents, token, has_more = asyncio.run(changes.find_changes(get_db(), TEST_USER, token, 2))
+        assert [document["date"].day for document in documents] == [3] and not has_more
+        assert asyncio.run(changes.find_changes(get_db(), TEST_USER, token, 2)) == ([], token, False)
+    finally:
+        db[TEST_USER].drop()
+        db["data_versions"].delete_one({"_id": TEST_USER})
+
+
+@requires_mongo
+def test_changes_stop_before_a_write_in_flight():
+    db = get_test_db()
+    db[TEST_USER].drop()
+    db["data_versions"].delete_one({"_id": TEST_USER})
+
+    def build_workout(day: int):
+        return {"date": datetime.datetime(2024, 5, day), "exercises": [], "completed": False}
+
+    async def run():
+        async_db = get_db()
+        slow = build_workout(1)
+        async with changes.writing_documents(async_db, TEST_USER, [slow]):
+            # a later write is inserted while the first one is still inserting its documents
+            await workouts_repository.insert_workout(async_db, TEST_USER, build_workout(2))
+            during = await changes.find_changes(async_db, TEST_USER, None, 10)
+            await workouts_repository.workouts_collection(async_db, TEST_USER).insert_one(slow)
+        after = await changes.find_changes(async_db, TEST_USER, during[1], 10)
+        return during, after
+
+    try:
+        (during, token, _), (after, _, _) = asyncio.run(run())
+        assert during == [] and token is None
+        assert [(document["seq"], document["date"].day) for document in after] == [(1, 1), (2, 2)]
+
+        # a write whose process died is not waited for after SyncSettings.WRITE_TIMEOUT_SECONDS
+        db["data_versions"].update_one({"_id": TEST_USER}, {"$push": {"writing": {"seq": 1, "at": datetime.datetime(2024, 1, 1)}}})
+        assert asyncio.run(data_versions.get_complete_seq(get_db(), TEST_USER)) == 2
+    finally:
+        db[TEST_USER].drop()
+        db["data_versions"].delete_one({"_id": TEST_USER})
@@ -0,0 +1,101 @@
+import asyncio
+import datetime
+
+from bson import ObjectId
+
+from app.dependencies.db_dependencies import get_db
+from app.repositories import indexes
+from app.tests.database import get_test_db, requires_mongo
+
+pytestmark = requires_mongo
+
+TEST_USER = "IndexTester01"
+
+
+def get_stages(plan: dict):
+    """
+    Names of every stage of a query plan
+    """
+    stages = [plan["stage"]] if "stage" in plan else []
+    for child in plan.get("inputStages", []) + [plan[key] for key in ("inputStage", "queryPlan") if key in plan]:
+        stages += get_stages(child)
+    return stages
+
+
+def get_winning_stages(explain: dict):
+    return get_stages(explain["queryPlanner"]["winningPlan"])
+
+
+def setup_module():
+    db = get_test_db()
+    db[TEST_USER].drop()
+    asyncio.run(indexes.ensure_users_indexes(get_db()))
+    indexes._indexed_collections.discard(TEST_USER)
+    asyncio.run(indexes.ensure_workouts_indexes(get_db(), TEST_USER))
+
+    start = datetime.datetime(2024, 1, 1)
+    workouts = [{"date": start + datetime.timedelta(days=i), "completed": i % 2 == 0, "exercises": []} for i in range(50)]
+    plans = [{"date": start + datetime.timedelta(days=i), "type": "plan", "plan": []} for i in range(10)]
+    db[TEST_USER].insert_many(workouts + plans)
+
+
+def teardown_module():
+    get_test_db()[TEST_USER].drop()
+
+
+def test_last_completed_workout_uses_an_index():
+    explain = get_test_db()[TEST_USER].find({"completed": True}).sort("date", -1).limit(1).explain()
+    stages = get_winning_stages(explain)
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages # the index gives the order
+
+
+def test_pending_workouts_use_an_index():
+    explain = get_test_db()[TEST_USER].find({"completed": False}).explain()
+    assert "COLLSCAN" not in get_winning_stages(explain)
+
+
+def test_plans_use_an_index():
+    explain = get_test_db()[TEST_USER].find({"type": "plan"}).sort("date", -1).explain()
+    stages = get_winning_stages(explain)
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages
+
+
+def test_history_ids_are_read_from_the_index():
+    explain = get_test_db()[TEST_USER].find({}, {"_id": 1, "seq": 1}).sort("date", -1).explain()
+    stages = get_winning_stages(explain)
+    assert "COLLSCAN" not in stages
+    assert "FETCH" not in stages # covered by the index
+
+
+def test_changes_use_an_index():
+    explain = get_test_db()[TEST_USER].find({"seq": {"$gt": 3}}).sort([("seq", 1), ("_id", 1)]).explain()
+    stages = get_winning_stages(explain)
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages
+
+
+def test_users_are_found_by_index():
+    explain = get_test_db()["users"].find({"username": TEST_USER}).explain()
+    assert "COLLSCAN" not in get_winning_stages(explain)
+
+
+def test_pages_are_a_range_of_an_index():
+    last_date = datetime.datetime(2024, 1, 20)
+    query = {"type": None, "exercises": {"$exists": True}, "date": {"$type": "date"}, "$or": [{"date": {"$lt": last_date}}, {"date": last_date, "_id": {"$lt": ObjectId()}}]}
+    explain = get_test_db()[TEST_USER].find(query).sort([("date", -1), ("_id", -1)]).limit(21).explain()
+    stages = get_winning_stages(explain)
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages
+
+
+def test_maintenance_drops_the_obsolete_indexes():
+    db = get_test_db()
+    db[TEST_USER].create_index([("completed", 1), ("date", -1)], name="completed_date")
+    asyncio.run(indexes.ensure_indexes(get_db())) # the startup does not read the collections of the users
+    assert "completed_date" in db[TEST_USER].index_information()
+
+    assert asyncio.run(indexes.ensure_all_indexes(get_db())) == []
+    names = db[TEST_USER].index_information()
+    assert "completed_date" not in names and "completed_date_id" in names
@@ -0,0 +1,58 @@
+import asyncio
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.dependencies.db_dependencies import get_db
+from app.repositories import pagination
+from app.repositories import workouts as workouts_repository
+from app.tests.database import get_test_db, requires_mongo
+
+TEST_USER = "PageTester01"
+
+
+def test_cursor_keeps_the_date_and_id():
+    document = {"date": datetime.datetime(2024, 5, 1, 7, 30, 15, 123000), "_id": ObjectId()}
+    assert pagination.decode_cursor(pagination.encode_cursor(document)) == (document["date"], document["_id"])
+
+    with pytest.raises(ValueError):
+        pagination.decode_cursor("1714548615123.not-an-id")
+    with pytest.raises(ValueError):
+        pagination.decode_cursor("yesterday")
+
+
+def test_next_page_starts_after_the_cursor():
+    last = {"date": datetime.datetime(2024, 5, 1), "_id": ObjectId()}
+    query = pagination.page_query({"completed": True}, pagination.encode_cursor(last), to_date=datetime.datetime(2024, 6, 1))
+    assert query == {"completed": True, "date": {"$type": "date", "$lt": datetime.datetime(2024, 6, 1)},
+                     "$or": [{"date": {"$lt": last["date"]}}, {"date": last["date"], "_id": {"$lt": last["_id"]}}]}
+
+
+@requires_mongo
+def test_pages_cover_the_history_once():
+    db = get_test_db()
+    db[TEST_USER].drop()
+    # several workouts share their date, the "_id" orders them
+    db[TEST_USER].insert_many([{"date": datetime.datetime(2024, 5, 1 + i // 3), "completed": i % 2 == 0, "exercises": []} for i in range(20)])
+    db[TEST_USER].insert_one({"date": datetime.datetime(2024, 5, 2), "type": "plan", "plan": []})
+    db[TEST_USER].insert_one({"date": "2024-05-03", "exercises": [], "completed": True}) # written by an old version
+
+    async def read_pages(completed):
+        pages, cursor = [], None
+        while True:
+            workouts, cursor = await workouts_repository.find_workouts_page(get_db(), TEST_USER, completed, cursor=cursor, limit=3,
+                                                                            projection={"date": 1})
+            pages.append(workouts)
+            if cursor is None:
+                return pages
+
+    try:
+        pages = asyncio.run(read_pages(None))
+        workouts = [workout for page in pages for workout in page]
+        assert len(pages) == 7 and len(workouts) == 20 # the plan and the string date are not listed
+        assert [(workout["date"], workout["_id"]) for workout in workouts] == \
+            sorted([(workout["date"], workout["_id"]) for workout in workouts], reverse=True)
+        assert sum(len(page) for page in asyncio.run(read_pages(True))) == 10
+    finally:
+        db[TEST_USER].drop()
@@ -0,0 +1,49 @@
+import asyncio
+import datetime
+
+from app.dependencies.db_dependencies import get_db
+from app.repositories import workouts as workouts_repository
+from app.tests.database import get_test_db, requires_mongo
+
+TEST_USER = "PendingTester01"
+
+
+def test_pipeline_filters_the_date_range():
+    pipeline = workouts_repository.pending_workouts_pipeline(get_db(), TEST_USER, datetime.datetime(2024, 5, 1),
+                                                             datetime.datetime(2024, 6, 1), skip=10, limit=5)
+    # the completed plans and the ones that start after the range are skipped before the unwind
+    assert pipeline[0] == {"$match": {"type": "plan", "all_completed": {"$ne": True}, "date": {"$lt": datetime.datetime(2024, 6, 1)}}}
+    # only the fields of a pending workout leave the plans and the workouts
+    assert pipeline[1] == {"$project": {"date": 1, "plan": 1}}
+    union = pipeline[6]["$unionWith"]
+    assert union["coll"] == TEST_USER
+    assert union["pipeline"][0] == {"$match": {"completed": False, "date": {"$gte": datetime.datetime(2024, 5, 1),
+                                                                             "$lt": datetime.datetime(2024, 6, 1)}}}
+    assert union["pipeline"][1] == {"$project": {"date": 1, "exercises": 1, "completed": 1, "post_workout_comments": 1, "_id": 0}}
+    assert pipeline[-3:] == [{"$sort": {"date": 1}}, {"$skip": 10}, {"$limit": 5}]
+
+
+@requires_mongo
+def test_pending_workouts_include_the_days_of_the_plans():
+    db = get_test_db()
+    db[TEST_USER].drop()
+    db[TEST_USER].insert_many([
+        {"date": datetime.datetime(2024, 5, 3), "completed": False, "exercises": []},
+        {"date": datetime.datetime(2024, 5, 1), "completed": True, "exercises": []},
+        {"date": datetime.datetime(2024, 5, 1), "type": "plan", "plan": [
+            {"day": 1, "completed": True, "exercises": []},
+            {"day": 2, "completed": False, "exercises": []},
+            {"day": 5, "completed": False, "exercises": []},
+        ]},
+    ])
+    try:
+        pending = asyncio.run(workouts_repository.find_pending_workouts(get_db(), TEST_USER))
+        assert [workout["date"] for workout in pending] == [datetime.datetime(2024, 5, 2), datetime.datetime(2024, 5, 3),
+                                                            datetime.datetime(2024, 5, 5)]
+        assert all("day" not in workout and "_id" not in workout for workout in pending)
+
+        page = asyncio.run(workouts_repository.find_pending_workouts(get_db(), TEST_USER, datetime.datetime(2024, 5, 3),
+                                                                     None, skip=1, limit=1))
+        assert [workout["date"] for workout in page] == [datetime.datetime(2024, 5, 5)]
+    finally:
+        db[TEST_USER].drop()
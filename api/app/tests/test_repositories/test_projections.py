@@ -0,0 +1,72 @@
+import asyncio
+import datetime
+
+import bson
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from app.dependencies.db_dependencies import get_mongo_uri, get_mongo_client_options
+from app.repositories import projections
+from app.repositories import users as users_repository
+from app.repositories import workouts as workouts_repository
+from app.settings import DatabaseSettings
+from app.tests.database import get_test_db, requires_mongo
+from app.tests.documents import build_exercise, build_workout
+
+TEST_USER = "ProjectionTester01"
+
+
+class ReplyBytes(monitoring.CommandListener):
+    """
+    Size of the replies of the database, what it sent to the api
+    """
+    def __init__(self):
+        self.total = 0
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.total += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+def test_existence_checks_do_not_read_the_document():
+    assert projections.EXISTS == {"_id": 1} # {} would be the whole document
+    assert projections.USER_CREDENTIALS == {"hashed_password": 1, "_id": 0}
+
+
+@requires_mongo
+def test_projections_reduce_the_bytes_read():
+    db = get_test_db()
+    db[TEST_USER].drop()
+    db["users"].delete_many({"username": TEST_USER})
+    db["users"].insert_one({"username": TEST_USER, "hashed_password": "$2b$12$" + "x" * 53, "fecha_registro": "2024-01-01"})
+    exercises = [build_exercise(f"Exercise {i}", 4, 10, 60.0, comments="felt heavy " * 5) for i in range(8)]
+    db[TEST_USER].insert_many([build_workout(day, exercises=exercises, post_workout_comments="good session", seq=day,
+                                             updated_at=datetime.datetime(2024, 1, 1)) for day in range(200)])
+
+    async def reads(lean: bool):
+        listener = ReplyBytes()
+        options = {**get_mongo_client_options(), "event_listeners": [listener]}
+        client = AsyncIOMotorClient(get_mongo_uri(), **options)
+        async_db = client[DatabaseSettings.MONGO_DATABASE.value]
+        try:
+            await users_repository.find_user(async_db, TEST_USER, projections.EXISTS if lean else None)
+            await workouts_repository.find_last_completed_workout(async_db, TEST_USER, projections.SCHEDULE_WORKOUT if lean else None)
+            history = workouts_repository.find_history(async_db, TEST_USER, projections.MARKDOWN_IDS if lean else None)
+            documents = [document async for document in history]
+        finally:
+            client.close()
+        return listener.total, documents
+
+    try:
+        full_bytes, full_documents = asyncio.run(reads(False))
+        lean_bytes, lean_documents = asyncio.run(reads(True))
+        assert [document["_id"] for document in lean_documents] == [document["_id"] for document in full_documents]
+        assert lean_bytes * 10 < full_bytes
+    finally:
+        db[TEST_USER].drop()
+        db["users"].delete_many({"username": TEST_USER})
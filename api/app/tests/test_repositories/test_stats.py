@@ -0,0 +1,43 @@
+import asyncio
+import datetime
+
+from app.dependencies.db_dependencies import get_db
+from app.repositories import stats as stats_repository
+from app.repositories import workouts as workouts_repository
+from app.services import rollups
+from app.services.stats_rebuild import rebuild_user_stats
+from app.tests.database import get_test_db, requires_mongo
+from app.tests.documents import build_exercise, build_workout
+
+TEST_USER = "StatsTester01"
+
+
+def squat_workout(day: int, completed: bool):
+    return build_workout(day, completed, [build_exercise("Squat", 5, 5, 80)])
+
+
+@requires_mongo
+def test_rebuild_gives_the_incremental_rollups():
+    db = get_test_db()
+    db[TEST_USER].drop()
+    db["stats_rollups"].delete_many({"user_id": TEST_USER})
+
+    async def insert_and_rebuild():
+        async_db = get_db()
+        await workouts_repository.insert_workout(async_db, TEST_USER, squat_workout(6, True))
+        await workouts_repository.insert_workouts(async_db, TEST_USER, [squat_workout(day, day % 2 == 0) for day in range(7, 20)])
+        incremental = await stats_repository.find_rollups(async_db, TEST_USER, rollups.WEEK)
+        squat = await stats_repository.find_rollups(async_db, TEST_USER, rollups.DAY, "Squat", limit=3)
+        await rebuild_user_stats(async_db, TEST_USER, batch_size=4)
+        return incremental, squat, await stats_repository.find_rollups(async_db, TEST_USER, rollups.WEEK)
+
+    try:
+        incremental, squat, rebuilt = asyncio.run(insert_and_rebuild())
+        assert [week["start"] for week in incremental] == [datetime.datetime(2024, 5, 6), datetime.datetime(2024, 5, 13)]
+        assert incremental[0] == {"start": datetime.datetime(2024, 5, 6), "sessions": 7, "completed": 4,
+                                  "sets": 20, "reps": 100, "volume": 8000}
+        assert [day["start"] for day in squat] == [datetime.datetime(2024, 5, day) for day in (17, 18, 19)]
+        assert rebuilt == incremental
+    finally:
+        db[TEST_USER].drop()
+        db["stats_rollups"].delete_many({"user_id": TEST_USER})
@@ -0,0 +1,44 @@
+import asyncio
+import datetime
+
+import pytest
+
+from app.repositories import storage
+from app.repositories.workouts import merge_by_date
+
+
+def test_filters_of_the_per_user_storage():
+    assert storage.workouts_filter("Spotless9454", {"completed": True}) == {"completed": True}
+    assert storage.plans_filter("Spotless9454") == {"type": "plan"}
+    assert storage.hide_owner({"_id": 0}) == {"_id": 0}
+
+
+def test_filters_of_the_shared_storage(monkeypatch):
+    monkeypatch.setattr(storage, "is_shared_storage", lambda: True)
+    assert storage.workouts_filter("Spotless9454", {"completed": True}) == {"user_id": "Spotless9454", "completed": True}
+    assert storage.plans_filter("Spotless9454") == {"user_id": "Spotless9454"}
+    assert storage.add_owner("Spotless9454", {"date": None}) == {"date": None, "user_id": "Spotless9454"}
+    assert storage.hide_owner({"_id": 0}) == {"_id": 0, "user_id": 0}
+    assert storage.hide_owner({"date": 1}) == {"date": 1}
+
+
+def test_merge_by_date_keeps_the_most_recent_first():
+    async def cursor(days):
+        for day in days:
+            yield {"date": datetime.datetime(2024, 5, day)}
+
+    async def merge():
+        return [document["date"].day async for document in merge_by_date(cursor([9, 5, 2]), cursor([8, 7, 1]))]
+
+    assert asyncio.run(merge()) == [9, 8, 7, 5, 2, 1]
+
+
+def test_collections_of_the_api_are_not_users(monkeypatch):
+    db = {"Spotless9454": "user collection", "workouts": "shared workouts", "users": "users"}
+    assert storage.get_workouts_collection(db, "Spotless9454") == "user collection"
+    for username in ("users", "workouts", "refresh_tokens", "stats_rollups"):
+        with pytest.raises(storage.ReservedUsernameError):
+            storage.get_workouts_collection(db, username)
+
+    monkeypatch.setattr(storage, "is_shared_storage", lambda: True)
+    assert storage.get_workouts_collection(db, "users") == "shared workouts" # the username is only a filter
@@ -0,0 +1,38 @@
+import asyncio
+
+from app.dependencies.db_dependencies import get_db
+from app.repositories import plans as plans_repository
+from app.repositories import summaries
+from app.tests.database import get_test_db, requires_mongo
+from app.tests.documents import build_plan
+
+TEST_USER = "SummaryTester01"
+
+
+def test_completion_of_the_plan():
+    assert plans_repository.set_completion(build_plan(1, True, False))["completed_days"] == 1
+    assert not plans_repository.set_completion(build_plan(1, True, False))["all_completed"]
+    assert plans_repository.set_completion(build_plan(1, True, True))["all_completed"]
+
+
+@requires_mongo
+def test_last_completed_plan_is_kept_in_the_summary():
+    db = get_test_db()
+    db[TEST_USER].drop()
+    db["user_summaries"].delete_one({"_id": TEST_USER})
+
+    async def insert_and_find():
+        async_db = get_db()
+        newest = await plans_repository.insert_plan(async_db, TEST_USER, build_plan(10, True, True))
+        await plans_repository.insert_plan(async_db, TEST_USER, build_plan(5, True, True)) # older, does not replace it
+        await plans_repository.insert_plan(async_db, TEST_USER, build_plan(20, True, False)) # not completed
+        return newest, await plans_repository.find_last_completed_plan(async_db, TEST_USER)
+
+    try:
+        newest, last_plan = asyncio.run(insert_and_find())
+        assert last_plan["_id"] == newest
+        assert db["user_summaries"].find_one({"_id": TEST_USER})[summaries.LAST_COMPLETED_PLAN]["id"] == newest
+    finally:
+        db[TEST_USER].drop()
+        db["user_summaries"].delete_one({"_id": TEST_USER})
+        db["data_versions"].delete_one({"_id": TEST_USER})
@@ -6,8 +6,8 @@ from app.main import app
 
 from pydantic import BaseModel
 
-# DB connection
-from app.dependencies.db_dependencies import get_db
+# DB connection, a synchronous client is enough for preparing the test data
+from app.tests.database import get_test_db, requires_mongo
 
 # import test data
 from app.tests.test_routers.data_parameterization import data_params_test_register_valid_user
@@ -22,7 +22,7 @@ def delete_user_if_exist(username: str):
     This function is used to delete a user if it exists
     Returns: True if user exists and was deleted, False if user does not exist
     """
-    db = get_db()
+    db = get_test_db()
     # validate if user exists
     user = db.users.find_one({"username": username})
     if user:
@@ -32,6 +32,7 @@ def delete_user_if_exist(username: str):
     return False
 
 
+@requires_mongo
 @pytest.mark.parametrize("username, password", data_params_test_register_valid_user)
 def test_register_valid_user(username, password):
     client = TestClient(app)
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers import markdown
+from app.routers.markdown import stream_markdown, get_markdown_title, get_markdown_etag, etag_matches
+from app.tests.documents import build_exercise, build_workout, build_plan
+
+
+def render(monkeypatch, workouts: list, lang: str = "es"):
+    # through the fragment cache and the reads by id of the route, from the ids of the history
+    documents = {i: {**workout, "_id": i} for i, workout in enumerate(workouts)}
+
+    async def find_by_ids(db, username, ids, projection=None):
+        return {workout_id: documents[workout_id] for workout_id in ids}
+
+    async def ids():
+        for i in range(1, len(workouts)):
+            yield {"_id": i}
+
+    async def collect():
+        fragments = markdown.render_cached_workouts(None, {"_id": 0}, ids(), lang, "Spotless9454")
+        return [chunk async for chunk in stream_markdown(get_markdown_title(lang, "Spotless9454"), fragments)]
+
+    monkeypatch.setattr(markdown.workouts_repository, "find_by_ids", find_by_ids)
+    markdown.rendered_fragments.clear()
+    try:
+        return b"".join(asyncio.run(collect())).decode("utf-8")
+    finally:
+        markdown.rendered_fragments.clear()
+
+
+def test_markdown_of_workouts_and_plans(monkeypatch):
+    squat = build_exercise("Squat", 5, 5, 60.0)
+    squat["instruments"].append({"name": "Belt", "weight": None, "detail": "tight"})
+    plan = build_plan(1, True, False, exercises=[squat], general_instructions="Warm up", post_plan_comments=None)
+    markdown = render(monkeypatch, [build_workout(3, exercises=[squat]), plan], lang="en")
+
+    assert markdown.startswith("# Workouts for Spotless9454\n\n## 03/05/2024 :heavy_check_mark: \n\n")
+    assert "| Squat | Barbell (60.0 kg), Belt (tight) | 5 | 5 | 3m | N/A | N/A |" in markdown
+    assert "**General instructions:** Warm up" in markdown
+    assert "Post-plan comments" not in markdown
+    # the days of the plan, the most recent first
+    assert markdown.index("### Day #2 02/05/2024 :clock1:") < markdown.index("### Day #1 01/05/2024 :heavy_check_mark:")
+
+
+def test_missing_fields_are_not_available(monkeypatch):
+    workout = build_workout(3, post_workout_comments="None of the sets failed")
+    workout["exercises"][0].update({"rest_minutes": None, "instruments": None, "comments": ""})
+    markdown = render(monkeypatch, [workout])
+
+    assert "| Squat | N/A | 5 | 5 | N/A | N/A | N/A |" in markdown
+    # the text written by the user is not changed
+    assert "**Comentarios post-entrenamiento:** None of the sets failed" in markdown
+
+
+def test_etag_changes_with_the_data_version():
+    etag = get_markdown_etag(3, "es")
+    assert etag != get_markdown_etag(4, "es")
+    assert etag != get_markdown_etag(3, "en")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert not etag_matches(get_markdown_etag(4, "es"), etag)
+    assert not etag_matches(None, etag)
+
+
+def test_cached_fragments_are_merged_in_order(monkeypatch):
+    workouts = {day: build_workout(day, _id=day) for day in range(1, 6)}
+    markdown.rendered_fragments.clear()
+    markdown.rendered_fragments.set(("Spotless9454", "es", 4, 7), "cached 4\n")
+    requested = []
+
+    async def find_by_ids(db, username, ids, projection=None):
+        requested.extend(ids)
+        return {workout_id: workouts[workout_id] for workout_id in ids if workout_id != 2} # 2 was deleted
+
+    async def ids():
+        for day in (4, 3, 2, 1):
+            yield {"_id": day, "seq": 7}
+
+    async def collect():
+        return [fragment async for fragment in markdown.render_cached_workouts(None, {"_id": 5, "seq": 7}, ids(), "es", "Spotless9454")]
+
+    monkeypatch.setattr(markdown.workouts_repository, "find_by_ids", find_by_ids)
+    fragments = asyncio.run(collect())
+    markdown.rendered_fragments.clear()
+
+    assert requested == [5, 3, 2, 1]
+    assert len(fragments) == 4
+    assert fragments[1] == "cached 4\n"
+    assert [fragment.split("\n")[0] for fragment in fragments[:1] + fragments[2:]] == \
+        ["## 05/05/2024 :heavy_check_mark: ", "## 03/05/2024 :heavy_check_mark: ", "## 01/05/2024 :heavy_check_mark: "]
+
+
+def test_unknown_language_is_a_bad_request():
+    with pytest.raises(HTTPException) as error:
+        markdown.get_title("fr", "Spotless9454")
+    assert error.value.status_code == 400
@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.models.work_out import today
+from app.routers import workouts
 
 client = TestClient(app)
 
@@ -8,3 +10,25 @@ def test_get_state_prod_or_develop():
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"State": "Development"} # when running pytest, the environment variable PRODUCTION is not set to True, so the app is running in development mode
+
+def test_collections_of_the_api_are_not_readable_as_users():
+    response = client.get("/api/workouts/list", params={"current_user": "users"})
+    assert response.status_code == 400 and response.json() == {"detail": "Invalid username"}
+
+def test_scheduled_workout_gets_a_date(monkeypatch):
+    inserted = []
+
+    async def find_last_completed_workout(db, username, projection=None):
+        return {"exercises": [{"name": "Squat", "sets": 5, "reps": 5, "comments": "heavy"}]}
+
+    async def insert_workout(db, username, workout):
+        inserted.append(workout)
+        return "id"
+
+    monkeypatch.setattr(workouts.workouts_repository, "find_last_completed_workout", find_last_completed_workout)
+    monkeypatch.setattr(workouts.workouts_repository, "insert_workout", insert_workout)
+    response = client.post("/api/workouts/schedule/again/last/completed/workout", params={"current_user": "Spotless9454"})
+    assert response.status_code == 200
+    # a date and not a string, the queries and the renders compare and format it
+    assert inserted[0]["date"] == today()
+    assert "comments" not in inserted[0]["exercises"][0]
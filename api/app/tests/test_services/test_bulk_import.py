@@ -0,0 +1,45 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.bulk_import import JSONArrayReader, NDJSONReader
+from app.settings import BulkImportSettings
+
+
+def feed_in_pieces(reader, text, size):
+    items = []
+    for start in range(0, len(text), size):
+        items += reader.feed(text[start:start + size])
+    return items + reader.feed("", final=True)
+
+
+def test_json_array_is_read_in_any_piece_size():
+    documents = [{"name": "run", "reps": [10, 12]}, {"name": "swim", "days": 3}, 42, "a, ]string"]
+    text = json.dumps(documents, indent=2)
+    for size in (1, 3, 7, len(text)):
+        assert feed_in_pieces(JSONArrayReader(), text, size) == documents
+
+
+def test_json_array_must_be_closed_and_alone():
+    with pytest.raises(HTTPException) as error:
+        feed_in_pieces(JSONArrayReader(), '[{"a": 1}', 4)
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException):
+        feed_in_pieces(JSONArrayReader(), '{"a": 1}', 4)
+    with pytest.raises(HTTPException):
+        feed_in_pieces(JSONArrayReader(), '[{"a": 1}] []', 4)
+
+
+def test_ndjson_lines():
+    text = '{"a": 1}\n\n{"b": 2}\r\n{"c": 3}'
+    assert feed_in_pieces(NDJSONReader(), text, 5) == [{"a": 1}, {"b": 2}, {"c": 3}]
+    with pytest.raises(HTTPException):
+        feed_in_pieces(NDJSONReader(), '{"a": 1}\nnot json\n', 5)
+
+
+def test_too_large_item_is_rejected():
+    text = json.dumps([{"notes": "x" * (BulkImportSettings.MAX_ITEM_BYTES.value + 1)}])
+    with pytest.raises(HTTPException) as error:
+        feed_in_pieces(JSONArrayReader(), text, 64 * 1024)
+    assert error.value.status_code == 413
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from jose import jwt
+from prometheus_client import REGISTRY
+
+from app.services.cache import TTLCache
+from app.services.user_cache import verified_users, invalidate_user
+from app.dependencies.auth_dependencies import get_current_user, SECRET_KEY, ALGORITHM
+from app.models.basic_auth_models import User
+
+
+def test_cache_drops_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_named_caches_count_their_lookups():
+    def lookups(outcome):
+        return REGISTRY.get_sample_value("sportreg_cache_lookups_total", {"cache": "test", "outcome": outcome}) or 0
+
+    cache = TTLCache(maxsize=2, ttl=60, name="test")
+    hits, misses = lookups("hit"), lookups("miss")
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    assert (lookups("hit"), lookups("miss")) == (hits + 1, misses + 1)
+
+
+def test_cache_entries_expire():
+    cache = TTLCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_get_current_user_uses_the_cache():
+    token = jwt.encode({"sub": "Spotless9454"}, SECRET_KEY, algorithm=ALGORITHM)
+    verified_users.set("Spotless9454", User(username="Spotless9454"))
+
+    # no database is given, a cache miss would fail
+    user = asyncio.run(get_current_user(db=None, token=token))
+    assert user.username == "Spotless9454"
+
+    invalidate_user("Spotless9454")
+    assert verified_users.get("Spotless9454") is None
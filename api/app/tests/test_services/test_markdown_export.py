@@ -0,0 +1,73 @@
+import asyncio
+import io
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import markdown_export
+from app.services.markdown_render import render_markdown_document
+from app.tests.documents import build_workout
+
+
+def test_tar_archive_has_a_markdown_per_user():
+    async def markdowns():
+        yield "Spotless9454", render_markdown_document("Spotless9454", "es", [build_workout(2), build_workout(1)])
+        yield "odd/name", b"# Entrenamientos\n"
+
+    async def collect():
+        return b"".join([chunk async for chunk in markdown_export.stream_tar(markdowns())])
+
+    archive = tarfile.open(fileobj=io.BytesIO(asyncio.run(collect())))
+    assert archive.getnames() == ["Spotless9454.md", "odd_name.md"]
+    content = archive.extractfile("Spotless9454.md").read().decode("utf-8")
+    assert content.startswith("# Entrenamientos de Spotless9454\n\n## 02/05/2024")
+
+
+def test_markdown_is_rendered_in_the_process_pool():
+    try:
+        future = markdown_export.get_executor().submit(render_markdown_document, "Spotless9454", "en", [build_workout(1)])
+        assert future.result(timeout=60).startswith(b"# Workouts for Spotless9454")
+    finally:
+        markdown_export.shutdown_executor()
+
+
+def test_bulk_etag_changes_when_a_user_writes():
+    etag = markdown_export.get_bulk_etag({"a": 1, "b": 2}, "es", 1)
+    assert etag == markdown_export.get_bulk_etag({"b": 2, "a": 1}, "es", 1)
+    assert etag != markdown_export.get_bulk_etag({"a": 1, "b": 3}, "es", 1)
+
+
+def test_batches_rendered_in_the_pool_keep_their_order(monkeypatch):
+    async def batches():
+        for start in (20, 10, 1):
+            yield [build_workout(day) for day in range(start + 5, start, -1)]
+
+    async def collect():
+        return [fragments async for fragments in markdown_export.render_batches(batches(), "en", "Spotless9454")]
+
+    monkeypatch.setattr(markdown_export, "should_offload", lambda workouts: True)
+    try:
+        rendered = asyncio.run(collect())
+    finally:
+        markdown_export.shutdown_executor()
+    days = [[fragment[3:5] for fragment in fragments] for fragments in rendered]
+    assert days == [["25", "24", "23", "22", "21"], ["15", "14", "13", "12", "11"], ["06", "05", "04", "03", "02"]]
+
+
+def test_a_user_that_fails_is_left_out_of_the_export(monkeypatch):
+    histories = {"Spotless9454": [build_workout(2)], "Broken01": [{**build_workout(1), "date": "2024-05-01"}], "Empty01": []}
+
+    async def find_history(db, username, projection=None):
+        if username not in histories:
+            raise KeyError(username)
+        for workout in histories[username]:
+            yield workout
+
+    async def collect():
+        markdowns = markdown_export.export_markdowns(None, ["Broken01", "Spotless9454", "Unknown01", "Empty01"], "en")
+        return b"".join([chunk async for chunk in markdown_export.stream_tar(markdowns)])
+
+    monkeypatch.setattr(markdown_export.workouts_repository, "find_history", find_history)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        monkeypatch.setattr(markdown_export, "get_executor", lambda: executor)
+        archive = tarfile.open(fileobj=io.BytesIO(asyncio.run(collect())))
+    assert archive.getnames() == ["Spotless9454.md"]
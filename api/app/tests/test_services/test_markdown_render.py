@@ -0,0 +1,37 @@
+import datetime
+
+import pytest
+
+from app.services.markdown_render import CATALOGS, get_markdown_title, get_workout_or_plan
+
+
+def build_plan():
+    exercise = {"name": "Row", "sets": 3, "reps": "30s", "rest_minutes": "1",
+                "instruments": [{"name": "Band"}, {"name": "Band"}, {"name": "Bar", "weight": 20.0, "detail": "EZ"}]}
+    return {"type": "plan", "date": datetime.datetime(2024, 5, 1), "general_instructions": "Warm up",
+            "plan": [{"day": 1, "exercises": [exercise], "completed": True},
+                     {"day": 3, "exercises": [exercise], "completed": False, "post_workout_comments": "Tired"}]}
+
+
+def test_every_catalog_has_the_same_texts():
+    keys = set(CATALOGS["en"])
+    assert all(set(catalog) == keys for catalog in CATALOGS.values())
+
+
+def test_plan_days_are_rendered_from_the_latest():
+    content = get_workout_or_plan(build_plan(), "en", "Spotless9454")
+    assert content.startswith("## Plan\n\n**Initial date:** 24/05/01\n\n**General instructions:** Warm up\n\n")
+    assert content.index("### Day #3 03/05/2024 :clock1: \n\n") < content.index("### Day #1 01/05/2024 :heavy_check_mark: \n\n")
+    assert "| Row | Band, Band, Bar (20.0 kg, EZ) | 3 | 30s | 1m | N/A | N/A |\n" in content
+    assert "\n**Post-workout comments:** Tired\n\n" in content
+
+
+def test_plan_document_is_not_modified():
+    plan = build_plan()
+    get_workout_or_plan(plan, "es", "Spotless9454")
+    assert plan == build_plan()
+
+
+def test_unknown_language():
+    with pytest.raises(ValueError, match="Invalid language"):
+        get_markdown_title("fr", "Spotless9454")
@@ -0,0 +1,49 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import metrics
+
+
+def test_requests_are_measured_by_route():
+    client = TestClient(app)
+    assert client.get("/").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'sportreg_http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert "sportreg_http_requests_in_flight" in response.text
+
+
+def test_timings_of_the_request_are_added_up():
+    async def request():
+        timings = metrics.RequestTimings()
+        token = metrics.current_timings.set(timings)
+        try:
+            with metrics.timed(metrics.RENDER_DURATION, "render", mode="inline"):
+                pass
+            # like the driver, that reports from its threads with a copy of the context
+            await asyncio.to_thread(metrics.record, "db", 0.002)
+            await asyncio.to_thread(metrics.record, "db", 0.003)
+        finally:
+            metrics.current_timings.reset(token)
+        return timings
+
+    timings = asyncio.run(request())
+    assert timings.counts == {"render": 1, "db": 2}
+    assert abs(timings.durations["db"] - 0.005) < 1e-9
+    assert 'db;dur=5.0;desc="2x"' in timings.server_timing()
+    metrics.record("db", 1) # without a request it is ignored
+
+
+def test_query_shape_hides_the_values():
+    command = {"find": "workouts", "filter": {"user_id": "Spotless9454", "date": {"$gte": 1, "$lt": 2},
+                                              "$or": [{"seq": {"$gt": 3}}, {"seq": 3}]},
+               "sort": {"date": -1}, "limit": 1}
+    assert metrics.query_shape("find", command) == {
+        "command": "find", "collection": "workouts",
+        "filter": {"user_id": "?", "date": {"$gte": "?", "$lt": "?"}, "$or": [{"seq": {"$gt": "?"}}, {"seq": "?"}]},
+        "sort": {"date": -1},
+    }
+    pipeline = {"aggregate": "plans", "pipeline": [{"$match": {"user_id": "x"}}, {"$unwind": "$plan"}]}
+    assert metrics.query_shape("aggregate", pipeline)["pipeline"] == ["$match", "$unwind"]
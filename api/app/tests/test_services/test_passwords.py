@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import passwords
+from app.settings import PasswordHashingSettings
+
+
+def test_hash_and_verify_password():
+    hashed_password = asyncio.run(passwords.hash_password("wgteacgo", rounds=4))
+    assert asyncio.run(passwords.verify_password("wgteacgo", hashed_password))
+    assert not asyncio.run(passwords.verify_password("abcDe8r8", hashed_password))
+
+
+def test_needs_rehash_when_the_rounds_change():
+    rounds = PasswordHashingSettings.BCRYPT_ROUNDS.value
+    assert not passwords.needs_rehash(f"$2b${rounds:02d}$" + "a" * 53)
+    assert passwords.needs_rehash("$2b$04$" + "a" * 53)
+    assert passwords.needs_rehash("not a bcrypt hash")
+
+
+def test_saturated_pool_returns_503(monkeypatch):
+    monkeypatch.setattr(passwords, "_pending", passwords.threading.BoundedSemaphore(1))
+    passwords._pending.acquire() # simulates a hash in progress
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(passwords.hash_password("wgteacgo", rounds=4))
+    assert error.value.status_code == 503
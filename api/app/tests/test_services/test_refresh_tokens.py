@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import refresh_tokens
+
+
+@pytest.fixture
+def stored_tokens(monkeypatch):
+    """
+    The "refresh_tokens" collection in memory, by hash
+    """
+    tokens = {}
+    repository = refresh_tokens.refresh_tokens_repository
+
+    async def insert_token(db, token_hash, username, family, expires_at):
+        tokens[token_hash] = {"_id": token_hash, "username": username, "family": family, "used": False, "expires_at": expires_at}
+
+    async def use_token(db, token_hash, now):
+        document = tokens.get(token_hash)
+        if document is None or document["used"] or document["expires_at"] <= now:
+            return None
+        document["used"] = True
+        return document
+
+    async def find_token(db, token_hash):
+        return tokens.get(token_hash)
+
+    async def delete_family(db, family):
+        for token_hash in [token_hash for token_hash, document in tokens.items() if document["family"] == family]:
+            del tokens[token_hash]
+
+    monkeypatch.setattr(repository, "insert_token", insert_token)
+    monkeypatch.setattr(repository, "use_token", use_token)
+    monkeypatch.setattr(repository, "find_token", find_token)
+    monkeypatch.setattr(repository, "delete_family", delete_family)
+    return tokens
+
+
+def test_only_the_hash_is_stored(stored_tokens):
+    token = asyncio.run(refresh_tokens.issue_refresh_token(None, "Spotless9454"))
+    assert list(stored_tokens) == [refresh_tokens.hash_token(token)]
+    assert token not in stored_tokens
+
+
+def test_refresh_rotates_the_token(stored_tokens):
+    token = asyncio.run(refresh_tokens.issue_refresh_token(None, "Spotless9454"))
+    username, new_token = asyncio.run(refresh_tokens.rotate_refresh_token(None, token))
+    assert username == "Spotless9454"
+    assert new_token != token
+    # the new token is in the same session, and can be used once too
+    assert stored_tokens[refresh_tokens.hash_token(new_token)]["family"] == stored_tokens[refresh_tokens.hash_token(token)]["family"]
+    assert asyncio.run(refresh_tokens.rotate_refresh_token(None, new_token))[0] == "Spotless9454"
+
+
+def test_reused_token_revokes_the_session(stored_tokens):
+    other_session = asyncio.run(refresh_tokens.issue_refresh_token(None, "Spotless9454"))
+    token = asyncio.run(refresh_tokens.issue_refresh_token(None, "Spotless9454"))
+    _, new_token = asyncio.run(refresh_tokens.rotate_refresh_token(None, token))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(refresh_tokens.rotate_refresh_token(None, token))
+    assert error.value.status_code == 401
+    # the token given to whoever refreshed first is revoked too, the other logins are not
+    assert refresh_tokens.hash_token(new_token) not in stored_tokens
+    assert refresh_tokens.hash_token(other_session) in stored_tokens
+
+
+def test_unknown_token_is_rejected(stored_tokens):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(refresh_tokens.rotate_refresh_token(None, "not-a-token"))
+    assert error.value.status_code == 401
+
+
+def test_logout_revokes_the_session(stored_tokens):
+    token = asyncio.run(refresh_tokens.issue_refresh_token(None, "Spotless9454"))
+    _, new_token = asyncio.run(refresh_tokens.rotate_refresh_token(None, token))
+    asyncio.run(refresh_tokens.revoke_refresh_token(None, new_token))
+    assert stored_tokens == {}
@@ -0,0 +1,61 @@
+import datetime
+import json
+
+from bson import ObjectId
+from bson.json_util import dumps
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.services.compression import CompressionMiddleware, choose_encoding
+from app.services.responses import BSONJSONResponse, dumps_bson
+
+
+def test_documents_are_encoded_like_json_util():
+    document = {"_id": ObjectId(), "date": datetime.datetime(2024, 5, 1), "updated_at": datetime.datetime(2024, 5, 1, 10, 30, 1, 250000),
+                "old": datetime.datetime(1960, 1, 1), "plan": [{"day": 1, "exercises": [{"reps": "30s", "weight": 12.5}]}], "none": None}
+    assert json.loads(dumps_bson({"last_plan": document})) == json.loads(dumps({"last_plan": document}))
+
+
+def test_encoding_negotiation():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") in ("br", "gzip")
+
+
+def build_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/document")
+    def get_document(size: int):
+        return BSONJSONResponse({"notes": "x" * size}, headers={"ETag": '"1"'})
+
+    @app.get("/markdown")
+    def get_markdown():
+        chunks = (f"## Workout {i}\n\n| Squat | 5 | 5 |\n".encode() for i in range(1000))
+        return StreamingResponse(chunks, media_type="text/markdown")
+
+    return TestClient(app)
+
+
+def test_large_and_streamed_responses_are_compressed():
+    client = build_app()
+    response = client.get("/document", params={"size": 5000}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"1"'
+    assert response.json() == {"notes": "x" * 5000}
+
+    response = client.get("/markdown", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text.count("## Workout") == 1000
+
+
+def test_small_responses_are_not_compressed():
+    client = build_app()
+    response = client.get("/document", params={"size": 10}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"1"'
+    response = client.get("/document", params={"size": 5000}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,38 @@
+import datetime
+
+from app.services import rollups
+from app.tests.documents import build_exercise, build_plan, build_workout
+
+
+def test_weeks_start_on_monday():
+    sunday = datetime.datetime(2024, 5, 12, 18, 30)
+    assert rollups.period_start(sunday, rollups.DAY) == datetime.datetime(2024, 5, 12)
+    assert rollups.period_start(sunday, rollups.WEEK) == datetime.datetime(2024, 5, 6)
+
+
+def test_volume_of_an_exercise():
+    assert rollups.exercise_totals(build_exercise("Curl", 3, 10, 12.5, 12.5)) == (3, 30, 750)
+    assert rollups.exercise_totals(build_exercise("Plank", 3, "45s")) == (3, 0, 0) # durations are not reps
+    assert rollups.exercise_totals(build_exercise("Push up", 4, "12")) == (4, 48, 0) # without weight
+
+
+def test_completed_sessions_add_volume():
+    workout = build_workout(6, exercises=[build_exercise("Squat", 5, 5, 100), build_exercise("Curl", 3, 10, 10)])
+    pending = build_workout(7, False, [build_exercise("Squat", 5, 5, 100)])
+    totals = rollups.rollup_increments([workout, pending])
+
+    week = datetime.datetime(2024, 5, 6)
+    assert totals[(rollups.WEEK, week, rollups.TOTAL)] == {"sessions": 2, "completed": 1, "sets": 8, "reps": 55, "volume": 2800}
+    assert totals[(rollups.WEEK, week, "Squat")] == {"sessions": 2, "completed": 1, "sets": 5, "reps": 25, "volume": 2500}
+    assert totals[(rollups.DAY, datetime.datetime(2024, 5, 7), rollups.TOTAL)]["completed"] == 0
+
+
+def test_every_day_of_a_plan_is_a_session():
+    plan = build_plan(11, True, False, False)
+    plan["plan"][0]["exercises"] = [build_exercise("Row", 3, 10, 40)]
+    del plan["plan"][1] # no day 2
+    totals = rollups.rollup_increments([plan])
+    # the days 1 and 3 fall in different weeks
+    assert totals[(rollups.WEEK, datetime.datetime(2024, 5, 6), rollups.TOTAL)]["volume"] == 1200
+    assert totals[(rollups.WEEK, datetime.datetime(2024, 5, 13), rollups.TOTAL)] == \
+        {"sessions": 1, "completed": 0, "sets": 0, "reps": 0, "volume": 0}
@@ -0,0 +1,133 @@
+import asyncio
+import inspect
+
+import pytest
+
+from app.services import singleflight
+
+
+def test_concurrent_calls_share_one_computation():
+    group = singleflight.Group()
+    calls = []
+
+    async def compute(user):
+        calls.append(user)
+        await asyncio.sleep(0.01)
+        return {"user": user}
+
+    async def requests():
+        return await asyncio.gather(group.do(("pending", "a"), compute, "a"), group.do(("pending", "a"), compute, "a"),
+                                    group.do(("pending", "b"), compute, "b"))
+
+    results = asyncio.run(requests())
+    assert calls == ["a", "b"]
+    assert results[0] is results[1]
+    assert group.stats() == {"in_flight": 0, "routes": {"pending": {"leaders": 2, "shared": 1, "coalescing_ratio": 1 / 3}}}
+
+
+def test_errors_are_shared_and_not_kept():
+    group = singleflight.Group()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def requests():
+        return await asyncio.gather(group.do(("route",), fail), group.do(("route",), fail), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(requests())] == [ValueError, ValueError]
+    assert asyncio.run(requests())[0].args == ("boom",) # a new call, the failed one was forgotten
+
+
+def test_requests_share_a_stream_until_its_first_chunk_is_dropped():
+    group = singleflight.Group()
+    produced = []
+
+    async def chunks():
+        for chunk in ("# title\n", "a\n", "b\n"):
+            produced.append(chunk)
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def requests():
+        first = group.stream(("markdown", "a"), chunks())
+        second = group.join(("markdown", "a")) # joins before the first chunk is read
+        received, received_second = [await anext(first)], [await anext(second)]
+        late = group.join(("markdown", "a")) # the first chunk was read by every request and dropped
+        received += [chunk async for chunk in first]
+        return received, received_second + [chunk async for chunk in second], late
+
+    first, second, late = asyncio.run(requests())
+    assert first == second == ["# title\n", "a\n", "b\n"]
+    assert len(produced) == 3
+    assert late is None
+    assert group.join(("markdown", "a")) is None # finished
+
+
+def test_stream_keeps_a_bounded_buffer_for_one_request():
+    group = singleflight.Group()
+    buffered = []
+
+    async def chunks():
+        for i in range(200):
+            flight = group._flights[("markdown", "a")]
+            buffered.append(sum(len(chunk) for chunk in flight.chunks))
+            yield b"x" * 1024
+
+    async def request():
+        size = 0
+        async for chunk in group.stream(("markdown", "a"), chunks()):
+            size += len(chunk)
+            await asyncio.sleep(0) # a slow client, the stream must wait for it
+        return size
+
+    assert asyncio.run(request()) == 200 * 1024
+    assert max(buffered) <= singleflight.SingleflightSettings.STREAM_BUFFER_CHUNKS.value * 1024
+
+
+def test_stream_stops_when_every_request_leaves():
+    group = singleflight.Group()
+    closed = []
+
+    async def chunks():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield "chunk"
+        finally:
+            closed.append(True)
+
+    async def request():
+        stream = group.stream(("markdown", "a"), chunks())
+        await anext(stream)
+        await stream.aclose() # the client went away
+        await asyncio.sleep(0.01)
+
+    asyncio.run(request())
+    assert closed == [True]
+    assert group.join(("markdown", "a")) is None
+
+
+def test_decorated_handler_keeps_its_parameters():
+    group = singleflight.Group()
+    versions = iter([1, 1, 2])
+    calls = []
+
+    async def version(**kwargs):
+        return next(versions)
+
+    async def handler(db, current_user: str, limit: int = 10):
+        calls.append(current_user)
+        await asyncio.sleep(0.01)
+        return [current_user] * limit
+
+    coalesced = singleflight.coalesce("pending", "current_user", "limit", version=version, group=group)(handler)
+    assert inspect.signature(coalesced) == inspect.signature(handler) # what FastAPI reads
+
+    async def requests():
+        return await asyncio.gather(*(coalesced(db=None, current_user="a", limit=2) for _ in range(3)))
+
+    if not singleflight.SingleflightSettings.ENABLED.value:
+        pytest.skip("coalescing is disabled")
+    assert asyncio.run(requests()) == [["a", "a"]] * 3
+    assert calls == ["a", "a"] # the third request came after a write (a new version)
@@ -0,0 +1,69 @@
+"""
+Throughput of the database routes under concurrent load.
+
+Needs a local mongod, for example:
+    docker run -d -p 27017:27017 mongo:7.0.14-jammy
+    MONGO_URI=mongodb://localhost:27017/ python -m benchmarks.bench_concurrency
+
+The requests go through the ASGI app in-process (no network between client and api),
+so the numbers show how well a single worker overlaps the database round-trips.
+"""
+import argparse
+import asyncio
+import datetime
+import time
+
+import httpx
+
+from app.main import app
+from app.dependencies.db_dependencies import get_db, close_db
+
+BENCH_USER = "bench_concurrency"
+
+async def seed(workouts: int):
+    db = get_db()
+    await db[BENCH_USER].drop()
+    start = datetime.datetime(2020, 1, 1)
+    await db[BENCH_USER].insert_many([
+        {"date": start + datetime.timedelta(days=i),
+         "exercises": [{"name": "Squat", "sets": 5, "reps": 5, "rest_minutes": "3"}],
+         "completed": i % 3 != 0}
+        for i in range(workouts)
+    ])
+
+async def run_level(client: httpx.AsyncClient, path: str, concurrency: int, requests: int):
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            response = await client.get(path, params={"current_user": BENCH_USER})
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workouts", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    await seed(args.workouts)
+    transport = httpx.ASGITransport(app=app)
+    paths = ["/api/workouts/get/last/completed/workout", "/api/workouts/get/pending/workouts"]
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in paths:
+            print(path)
+            for concurrency in args.concurrency:
+                throughput = await run_level(client, path, concurrency, args.requests)
+                print(f"  concurrency {concurrency:>3}: {throughput:8.1f} req/s")
+    await get_db()[BENCH_USER].drop()
+    close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,213 @@
+"""
+Latency, throughput and allocations of every endpoint, against a seeded database.
+
+Uses the mongod of MONGO_URI, or starts a throwaway one (see benchmarks/local_mongo.py),
+seeds the synthetic users of benchmarks/data.py in the database "sportreg_bench" (dropped first) and drives every route
+through the ASGI app with concurrent httpx clients. For every endpoint it reports the latency
+percentiles and the throughput of the timed run, then the memory allocated per request in a
+short sequential run under tracemalloc. The results are saved as JSON, so two commits can be compared:
+
+    python -m benchmarks.bench_endpoints --users 20 --workouts 500 --plans 20 --output before.json
+    python -m benchmarks.bench_endpoints --only markdown --output after.json
+    python -m benchmarks.bench_endpoints --compare before.json after.json
+
+bcrypt runs with BCRYPT_ROUNDS=4 unless it is set, so the login and register numbers show
+the api and not the work factor.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+from benchmarks.data import BENCH_DATABASE, PASSWORD, build_plan, build_workout, git_commit, seed
+from benchmarks.local_mongo import local_mongod
+
+def get_scenarios(usernames: list):
+    """
+    (name, request) for every route, "request(client, i)" sends the i-th request. The reads go first,
+    so they see the seeded volumes and not what the writes added.
+    """
+    def user(i):
+        return {"current_user": usernames[i % len(usernames)]}
+
+    def get(path, **params):
+        return lambda client, i: client.get(path, params={**user(i), **params})
+
+    def post_json(path, body):
+        return lambda client, i: client.post(path, params=user(i), json=body)
+
+    async def read_markdown(client, i):
+        response = await client.get("/api/markdown/get/workouts", params={**user(i), "lang": "es"})
+        await response.aread()
+        return response
+
+    async def read_bulk_markdown(client, i):
+        users = [usernames[(i + k) % len(usernames)] for k in range(min(5, len(usernames)))]
+        response = await client.get("/api/markdown/get/workouts/bulk", params={"users": users, "lang": "en"})
+        await response.aread()
+        return response
+
+    def login(client, i):
+        return client.post("/api/auth/token", data={"username": usernames[i % len(usernames)], "password": PASSWORD})
+
+    registered = iter(range(10 ** 9))
+
+    def register(client, i):
+        return client.post("/api/auth/register", json={"username": f"benchreg{next(registered):07d}", "password": PASSWORD})
+
+    return [
+        ("GET /", lambda client, i: client.get("/")),
+        ("POST /api/auth/token", login),
+        ("GET /api/workouts/get/last/completed/workout", get("/api/workouts/get/last/completed/workout")),
+        ("GET /api/workouts/get/pending/workouts", get("/api/workouts/get/pending/workouts", limit=100)),
+        ("GET /api/workouts/changes", get("/api/workouts/changes", limit=100)),
+        ("GET /api/plans/get/last/completed/plan", get("/api/plans/get/last/completed/plan")),
+        ("GET /api/markdown/get/workouts", read_markdown),
+        ("GET /api/markdown/get/workouts/bulk", read_bulk_markdown),
+        ("POST /api/auth/register", register),
+        ("POST /api/workouts/insert/workout", post_json("/api/workouts/insert/workout", build_workout(1))),
+        ("POST /api/workouts/insert/workouts/bulk", post_json("/api/workouts/insert/workouts/bulk",
+                                                               [build_workout(day) for day in range(50)])),
+        ("POST /api/workouts/schedule/again/last/completed/workout", post_json("/api/workouts/schedule/again/last/completed/workout", None)),
+        ("POST /api/plans/insert/plan", post_json("/api/plans/insert/plan", build_plan(0))),
+        ("POST /api/plans/insert/plans/bulk", post_json("/api/plans/insert/plans/bulk", [build_plan(day * 7) for day in range(10)])),
+        ("POST /api/plans/schedule/again/last/completed/plan", post_json("/api/plans/schedule/again/last/completed/plan", None)),
+    ]
+
+def percentile(quantiles: list, p: int):
+    return quantiles[p - 1] if quantiles else None
+
+async def timed_run(client: httpx.AsyncClient, request, requests: int, concurrency: int):
+    latencies = []
+    errors = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            response = await request(client, i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "latency_ms": {"mean": statistics.fmean(latencies), "p50": percentile(quantiles, 50), "p90": percentile(quantiles, 90),
+                       "p99": percentile(quantiles, 99), "max": max(latencies)},
+    }
+
+async def allocation_run(client: httpx.AsyncClient, request, requests: int):
+    """
+    Peak of the memory allocated while serving a request and what is still allocated after all of them, in KiB
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        await request(client, 0) # warm up, the first request fills the caches and imports
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(1, requests + 1):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await request(client, i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return {"peak_kib_per_request": statistics.fmean(peaks) / 1024, "retained_kib_per_request": retained / requests / 1024}
+
+async def run(args):
+    from app.main import app
+
+    results = {"meta": {"commit": git_commit(), "python": platform.python_version(), "machine": platform.machine(),
+                        "cpus": os.cpu_count(), "started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                        "users": args.users, "workouts": args.workouts, "plans": args.plans, "plan_days": args.plan_days,
+                        "requests": args.requests, "concurrency": args.concurrency},
+               "endpoints": {}}
+    # the lifespan creates the pool and the indexes, like in the server
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        usernames = await seed(args)
+        results["meta"]["seed_seconds"] = time.perf_counter() - started
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, request in get_scenarios(usernames):
+                if args.only and not re.search(args.only, name):
+                    continue
+                result = await timed_run(client, request, args.requests, args.concurrency)
+                result["allocations"] = await allocation_run(client, request, args.allocation_requests)
+                results["endpoints"][name] = result
+                latency = result["latency_ms"]
+                print(f"{name:<60} {result['throughput_rps']:8.1f} req/s | p50 {latency['p50']:7.1f} p99 {latency['p99']:7.1f} ms | "
+                      f"peak {result['allocations']['peak_kib_per_request']:8.1f} KiB/req"
+                      + (f" | errors {result['errors']}" if result["errors"] else ""))
+    return results
+
+def compare(base_path: str, new_path: str):
+    with open(base_path) as base_file, open(new_path) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    print(f"{base['meta'].get('commit')} -> {new['meta'].get('commit')}")
+
+    def change(old, value):
+        return f"{(value - old) / old * 100:+6.1f}%" if old else "   n/a"
+
+    for name, result in new["endpoints"].items():
+        old = base["endpoints"].get(name)
+        if old is None:
+            print(f"{name:<60} new")
+            continue
+        print(f"{name:<60} req/s {change(old['throughput_rps'], result['throughput_rps'])} | "
+              f"p50 {change(old['latency_ms']['p50'], result['latency_ms']['p50'])} | "
+              f"p99 {change(old['latency_ms']['p99'], result['latency_ms']['p99'])} | "
+              f"peak KiB {change(old['allocations']['peak_kib_per_request'], result['allocations']['peak_kib_per_request'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--workouts", type=int, default=500, help="workouts of every user")
+    parser.add_argument("--plans", type=int, default=20, help="plans of every user")
+    parser.add_argument("--plan-days", type=int, default=7)
+    parser.add_argument("--requests", type=int, default=200, help="requests of the timed run of every endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--allocation-requests", type=int, default=10)
+    parser.add_argument("--only", help="regular expression, only the endpoints that match")
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/endpoints-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # the settings are read when the app is imported
+    os.environ["MONGO_DATABASE"] = BENCH_DATABASE
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    with contextlib.ExitStack() as stack:
+        if not os.environ.get("MONGO_URI"):
+            os.environ["MONGO_URI"] = stack.enter_context(local_mongod())
+        results = asyncio.run(run(args))
+
+    output = args.output or os.path.join("benchmarks", "results", f"endpoints-{results['meta']['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"results saved to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Serialization time and payload size of /api/plans/get/last/completed/plan for large plans.
+
+    old:  JSONResponse(json.loads(bson.json_util.dumps(...))), the old code of the routes
+    new:  app.services.responses.BSONJSONResponse, orjson in one pass
+
+and the size of the body after the compression of app.services.compression.
+
+    python -m benchmarks.bench_json_response --days 30 365
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+import zlib
+
+from bson import ObjectId
+from bson.json_util import dumps
+from fastapi.responses import JSONResponse
+
+from app.services import compression
+from app.services.responses import BSONJSONResponse
+from app.settings import CompressionSettings
+from benchmarks.data import build_plan
+
+def build_plan_document(days: int):
+    plan = build_plan(0, days, exercises=8)
+    plan.update({"_id": ObjectId(), "type": "plan", "date": datetime.datetime(2024, 1, 1), "seq": 42,
+                 "updated_at": datetime.datetime(2024, 1, 1, 12, 30, 5, 123000), "completed_days": days, "all_completed": True})
+    return plan
+
+def old_response(plan):
+    return JSONResponse({"last_plan": json.loads(dumps(plan))}).body
+
+def new_response(plan):
+    return BSONJSONResponse({"last_plan": plan}).body
+
+def measure(function, plan, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function(plan)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), body
+
+def compressed_sizes(body: bytes):
+    sizes = {"gzip": len(zlib.compress(body, CompressionSettings.GZIP_LEVEL.value, 31))}
+    if compression.brotli is not None:
+        sizes["br"] = len(compression.brotli.compress(body, quality=CompressionSettings.BROTLI_QUALITY.value))
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30, 365])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for days in args.days:
+        plan = build_plan_document(days)
+        old_ms, old_body = measure(old_response, plan, args.repeat)
+        new_ms, new_body = measure(new_response, plan, args.repeat)
+        assert json.loads(old_body) == json.loads(new_body)
+        sizes = ", ".join(f"{encoding} {size / 1024:.1f} KiB" for encoding, size in compressed_sizes(new_body).items())
+        print(f"{days:4d} days: old {old_ms:7.2f} ms, {len(old_body) / 1024:7.1f} KiB | new {new_ms:7.2f} ms (x{old_ms / new_ms:.1f}), "
+              f"{len(new_body) / 1024:7.1f} KiB | compressed: {sizes}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Responsiveness of the api while a storm of logins is hashing passwords.
+
+A number of bcrypt verifications (what /api/auth/token does for every login) run
+concurrently while another client keeps calling "/", once with bcrypt on the
+event loop (the old behaviour) and once through app.services.passwords.
+
+    python -m benchmarks.bench_login_storm --logins 32
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import bcrypt
+import httpx
+from fastapi import HTTPException
+
+from app.main import app
+from app.services import passwords
+from app.settings import PasswordHashingSettings
+
+async def inline_verify(password: str, hashed_password: str):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list, gaps: list):
+    last_answer = time.perf_counter()
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/")
+        response.raise_for_status()
+        answered = time.perf_counter()
+        latencies.append((answered - started) * 1000)
+        gaps.append((answered - last_answer) * 1000)
+        last_answer = answered
+        await asyncio.sleep(0.005)
+
+async def storm(verify, logins: int, hashed_password: str):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    gaps = []
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        probe_task = asyncio.create_task(probe(client, stop, latencies, gaps))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(verify("wgteacgo", hashed_password) for _ in range(logins)),
+                                       return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.05) # let the probe answer once more, so a stall shows up in the gaps
+        stop.set()
+        await probe_task
+    rejected = sum(1 for result in results if isinstance(result, HTTPException))
+    return elapsed, rejected, latencies, gaps
+
+def report(name: str, elapsed: float, rejected: int, latencies: list, gaps: list):
+    p50 = statistics.median(latencies)
+    print(f"{name:>8}: logins done in {elapsed:6.2f}s ({rejected} rejected with 503) | "
+          f"'/' answered {len(latencies):4d} times, p50 {p50:6.1f} ms, longest stall {max(gaps):7.1f} ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=PasswordHashingSettings.BCRYPT_ROUNDS.value)
+    args = parser.parse_args()
+
+    hashed_password = bcrypt.hashpw(b"wgteacgo", bcrypt.gensalt(args.rounds)).decode('utf-8')
+    print(f"{args.logins} logins, bcrypt rounds {args.rounds}, {PasswordHashingSettings.HASHING_WORKERS.value} hashing threads")
+    report("inline", *await storm(inline_verify, args.logins, hashed_password))
+    report("pool", *await storm(passwords.verify_password, args.logins, hashed_password))
+    passwords.shutdown_executor()
+
+if __name__ == "__main__":
+    asyncio.run(main())
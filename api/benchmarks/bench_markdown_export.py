@@ -0,0 +1,93 @@
+"""
+Peak memory and time to first byte of the markdown export, buffered vs streamed.
+
+The workouts are generated in memory and handed out in batches like a database cursor.
+"buffered" reads the whole history and renders it into a single string (the old behaviour),
+"streaming" goes through the code of the route: app.routers.markdown.render_cached_workouts reads the workouts
+by id in batches (from memory here, with the fragment cache off) and stream_markdown joins them. Every mode runs in
+its own process so the peak RSS of one does not hide the other.
+
+    python -m benchmarks.bench_markdown_export --workouts 10000
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from app.routers import markdown
+from app.routers.markdown import stream_markdown, render_cached_workouts
+from app.services.markdown_render import get_markdown_title, get_workout_or_plan
+from benchmarks.data import build_stored_workout
+
+async def cursor(workouts: int, batch_size: int = 200):
+    for i in range(workouts - 1, -1, -1):
+        if i % batch_size == 0:
+            await asyncio.sleep(0) # a round-trip for the next batch
+        yield build_stored_workout(i)
+
+async def id_cursor(workouts: int, batch_size: int = 200):
+    for i in range(workouts - 1, -1, -1):
+        if i % batch_size == 0:
+            await asyncio.sleep(0) # a round-trip for the next batch
+        yield {"_id": i}
+
+async def find_by_ids(db, username, ids, projection=None):
+    await asyncio.sleep(0) # a round-trip
+    return {i: build_stored_workout(i) for i in ids}
+
+async def buffered(workouts: int):
+    started = time.perf_counter()
+    history = [workout async for workout in cursor(workouts)]
+    content = get_markdown_title("es", "bench")
+    for workout in history:
+        content += get_workout_or_plan(workout, "es", "bench")
+    body = content.encode("utf-8")
+    first_byte = time.perf_counter() - started
+    return first_byte, time.perf_counter() - started, len(body)
+
+async def streaming(workouts: int):
+    started = time.perf_counter()
+    markdown.workouts_repository.find_by_ids = find_by_ids
+    markdown.rendered_fragments.maxsize = 0 # every workout is rendered, as on the first export
+    ids = id_cursor(workouts)
+    first = await anext(ids)
+    first_byte = None
+    size = 0
+    fragments = render_cached_workouts(None, first, ids, "es", "bench")
+    async for chunk in stream_markdown(get_markdown_title("es", "bench"), fragments):
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    return first_byte, time.perf_counter() - started, size
+
+def run_mode(mode: str, workouts: int):
+    function = buffered if mode == "buffered" else streaming
+    first_byte, total, size = asyncio.run(function(workouts))
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # kilobytes on linux
+    print(json.dumps({"mode": mode, "ttfb_ms": first_byte * 1000, "total_ms": total * 1000,
+                      "bytes": size, "peak_rss_mb": peak_rss_mb}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workouts", type=int, default=10000)
+    parser.add_argument("--mode", choices=["buffered", "streaming"], help="run a single mode in this process")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.workouts)
+        return
+
+    print(f"{args.workouts} workouts")
+    for mode in ["buffered", "streaming"]:
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_markdown_export",
+                                 "--workouts", str(args.workouts), "--mode", mode],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output)
+        print(f"{mode:>10}: ttfb {result['ttfb_ms']:8.1f} ms | total {result['total_ms']:8.1f} ms | "
+              f"{result['bytes'] / 1024 / 1024:6.1f} MiB of markdown | peak rss {result['peak_rss_mb']:6.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Render throughput of the markdown templates, in table rows per second for every language.
+
+The history is generated in memory (benchmarks/data.py, a plan every tenth entry) and rendered
+with app.services.markdown_render.render_markdown_document.
+
+    python -m benchmarks.bench_markdown_render --workouts 5000
+"""
+import argparse
+import time
+
+from app.services.markdown_render import CATALOGS, render_markdown_document
+from benchmarks.data import build_history
+
+def count_rows(history: list):
+    rows = 0
+    for workout in history:
+        days = workout["plan"] if workout.get("type") == "plan" else [workout]
+        rows += sum(len(day["exercises"]) for day in days)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workouts", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    history = build_history(args.workouts)
+    rows = count_rows(history)
+    for lang in CATALOGS:
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            size = len(render_markdown_document("bench", lang, history))
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{lang}: {rows} rows in {best * 1000:8.1f} ms, {rows / best:10.0f} rows/s, {size / best / 1024 / 1024:6.1f} MiB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Scaling of the markdown rendering of a long history with the number of workers.
+
+The history is generated in memory, split in batches like the database cursor and rendered
+with app.services.markdown_export.render_batches: once in the event loop ("inline") and once
+in the pool for every number of workers. A probe task measures the longest stall of the
+event loop, what every other request of the worker would wait. Every run is a new process,
+since the settings are read on import.
+
+    python -m benchmarks.bench_parallel_render --workouts 20000 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.data import build_history
+
+async def batches(history: list, batch_size: int):
+    for start in range(0, len(history), batch_size):
+        await asyncio.sleep(0) # a round-trip for the next batch
+        yield history[start:start + batch_size]
+
+async def probe(stop: asyncio.Event, gaps: list):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        gaps.append((now - last) * 1000)
+        last = now
+
+async def run(workouts: int, batch_size: int):
+    from app.services import markdown_export
+    history = build_history(workouts)
+    # start the workers before measuring
+    await markdown_export.render_fragments(history[:1] * 100, "es", "bench")
+
+    gaps = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, gaps))
+    started = time.perf_counter()
+    size = 0
+    async for fragments in markdown_export.render_batches(batches(history, batch_size), "es", "bench"):
+        size += sum(len(fragment) for fragment in fragments)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    markdown_export.shutdown_executor()
+    return {"total_ms": elapsed * 1000, "chars": size, "longest_stall_ms": max(gaps)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workouts", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--single", action="store_true", help="run once with the settings of the environment")
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(asyncio.run(run(args.workouts, args.batch_size))))
+        return
+
+    print(f"{args.workouts} workouts in batches of {args.batch_size}, {os.cpu_count()} cpus")
+    runs = [("inline", {"MARKDOWN_PARALLEL_RENDER": "False"})]
+    runs += [(f"{workers} workers", {"MARKDOWN_PARALLEL_RENDER": "True", "MARKDOWN_EXPORT_WORKERS": str(workers)})
+             for workers in args.workers]
+    baseline = None
+    for name, environment in runs:
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_parallel_render", "--single",
+                                 "--workouts", str(args.workouts), "--batch-size", str(args.batch_size)],
+                                env={**os.environ, **environment}, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output)
+        baseline = baseline or result["total_ms"]
+        print(f"{name:>10}: total {result['total_ms']:8.1f} ms (x{baseline / result['total_ms']:4.2f}) | "
+              f"longest event loop stall {result['longest_stall_ms']:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Time to turn a plan request body into the document that is inserted, for plans of 1, 30 and 365 days.
+
+    legacy:  the models with the Python validator of reps, then model_dump() (the old behaviour)
+    models:  the models of app.models.work_out (reps checked by pydantic-core), then model_dump()
+    adapter: app.models.work_out.plan_adapter.validate_json, straight to the dict
+
+    python -m benchmarks.bench_validation --repeat 20
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+from typing import Optional, Union
+
+from pydantic import BaseModel, field_validator
+
+from app.models.work_out import Plan, Instrument, plan_adapter
+from benchmarks.data import build_plan
+
+class LegacyExercise(BaseModel):
+    name: str
+    sets: int
+    reps: Union[int, str]
+    instruments: Optional[list[Instrument]] = None
+    rest_minutes: str
+    instruction: Optional[str] = None
+    comments: Optional[str] = None
+
+    @field_validator('reps')
+    def validate_repetitions(cls, v):
+        if isinstance(v, int):
+            if v < 0:
+                raise ValueError('The number of reps must be 0 or greater.')
+        elif isinstance(v, str):
+            if not v[:-1].isdigit() and v[-1] in ['m', 's']:
+                raise ValueError('Reps must be a number followed by "m" or "s".')
+        return v
+
+class LegacyWorkoutPlan(BaseModel):
+    day: int = 1
+    exercises: list[LegacyExercise]
+    completed: Optional[bool] = False
+    post_workout_comments: Optional[str] = None
+
+class LegacyPlan(BaseModel):
+    date: datetime.datetime
+    plan: list[LegacyWorkoutPlan]
+    general_instructions: Optional[str] = None
+    post_plan_comments: Optional[str] = None
+
+def build_plan_body(days: int):
+    plan = build_plan(0, days, exercises=8)
+    for plan_day in plan["plan"]:
+        plan_day["post_workout_comments"] = "Felt good" if plan_day["day"] % 2 == 0 else None
+    return json.dumps(plan).encode("utf-8")
+
+PATHS = {
+    "legacy": lambda body: LegacyPlan.model_validate_json(body).model_dump(),
+    "models": lambda body: Plan.model_validate_json(body).model_dump(),
+    "adapter": plan_adapter.validate_json,
+}
+
+def measure(function, body: bytes, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(body)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 30, 365])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for days in args.days:
+        body = build_plan_body(days)
+        assert PATHS["legacy"](body) == PATHS["adapter"](body)
+        results = {name: measure(function, body, args.repeat) for name, function in PATHS.items()}
+        line = " | ".join(f"{name} {ms:8.3f} ms" for name, ms in results.items())
+        print(f"{days:4d} days ({len(body) / 1024:7.1f} KiB): {line} | adapter x{results['legacy'] / results['adapter']:.1f}")
+
+if __name__ == "__main__":
+    main()
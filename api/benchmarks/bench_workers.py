@@ -0,0 +1,161 @@
+"""
+Throughput of the production server (gunicorn, app/gunicorn_conf.py) with 1, 2, 4... workers, to check that
+the CPU bound routes scale with them.
+
+Uses the mongod of MONGO_URI, or starts a throwaway one (see benchmarks/local_mongo.py), seeds the users of
+benchmarks/data.py and, for every number of workers, starts gunicorn on a free port, waits for /ready
+and sends requests from several client processes for a fixed time:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --seconds 20
+    python -m benchmarks.bench_workers --only login --clients 4 --concurrency 32
+
+The scenarios are bound by the CPU of the api: the login (bcrypt, BCRYPT_ROUNDS=10 unless it is set) and the markdown
+of a user rendered without the fragment cache and without coalescing. The efficiency is the throughput with N workers
+divided by N times the one of a single worker. The clients use CPU too, the machine needs more cores than workers.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.data import BENCH_DATABASE, PASSWORD, bench_username, git_commit, seed
+from benchmarks.local_mongo import free_port, local_mongod
+
+def get_scenario(name: str, users: int):
+    def username(i):
+        return bench_username(i % users)
+
+    async def login(client, i):
+        return await client.post("/api/auth/token", data={"username": username(i), "password": PASSWORD})
+
+    async def markdown(client, i):
+        response = await client.get("/api/markdown/get/workouts", params={"current_user": username(i), "lang": "es"})
+        await response.aread()
+        return response
+
+    return {"login": login, "markdown": markdown}[name]
+
+async def drive(url: str, scenario: str, users: int, concurrency: int, seconds: float, offset: int):
+    request = get_scenario(scenario, users)
+    counts = {"requests": 0, "errors": 0}
+    deadline = time.monotonic() + seconds
+    requests = iter(range(offset, 10 ** 9))
+
+    async def worker(client):
+        while time.monotonic() < deadline:
+            response = await request(client, next(requests))
+            counts["requests"] += 1
+            if response.status_code >= 400:
+                counts["errors"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return counts
+
+def run_client(arguments):
+    return asyncio.run(drive(*arguments))
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"gunicorn was not ready in {timeout} seconds")
+
+@contextlib.contextmanager
+def gunicorn(workers: int):
+    """
+    Start the production server with the given number of workers and yield its url
+    """
+    port = free_port()
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "BIND": f"127.0.0.1:{port}",
+           "MARKDOWN_FRAGMENT_CACHE_SIZE": "0", "SINGLEFLIGHT_ENABLED": "False"}
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "app.main:app", "-c", "app/gunicorn_conf.py",
+                                "--access-logfile", "/dev/null"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_until_ready(url, process)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def measure(url: str, scenario: str, args):
+    # a warm up, so the pools and the caches of the workers are ready
+    run_client((url, scenario, args.users, args.concurrency, 1, 0))
+    arguments = [(url, scenario, args.users, args.concurrency, args.seconds, client * 10 ** 6) for client in range(args.clients)]
+    with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+        counts = pool.map(run_client, arguments)
+    requests = sum(count["requests"] for count in counts)
+    return {"requests": requests, "errors": sum(count["errors"] for count in counts), "throughput_rps": requests / args.seconds}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--only", choices=["login", "markdown"], help="a single scenario")
+    parser.add_argument("--seconds", type=float, default=15, help="duration of every measure")
+    parser.add_argument("--clients", type=int, default=2, help="processes sending requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight of every client")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--workouts", type=int, default=300, help="workouts of every user")
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/workers-<commit>.json)")
+    args = parser.parse_args()
+    args.plans, args.plan_days = 10, 7
+
+    # read by the seeding here and by the workers of gunicorn
+    os.environ["MONGO_DATABASE"] = BENCH_DATABASE
+    os.environ.setdefault("BCRYPT_ROUNDS", "10")
+    scenarios = [args.only] if args.only else ["login", "markdown"]
+    results = {"meta": {"commit": git_commit(), "cpus": os.cpu_count(), "seconds": args.seconds, "clients": args.clients,
+                        "concurrency": args.concurrency, "bcrypt_rounds": int(os.environ["BCRYPT_ROUNDS"]),
+                        "started": datetime.datetime.now(datetime.timezone.utc).isoformat()},
+               "scenarios": {scenario: {} for scenario in scenarios}}
+
+    with contextlib.ExitStack() as stack:
+        if not os.environ.get("MONGO_URI"):
+            os.environ["MONGO_URI"] = stack.enter_context(local_mongod())
+
+        async def seed_and_close():
+            from app.dependencies.db_dependencies import close_db
+            await seed(args)
+            close_db()
+        asyncio.run(seed_and_close())
+
+        for workers in args.workers:
+            with gunicorn(workers) as url:
+                for scenario in scenarios:
+                    result = measure(url, scenario, args)
+                    single = results["scenarios"][scenario].get("1")
+                    if single:
+                        result["efficiency"] = result["throughput_rps"] / (workers * single["throughput_rps"])
+                    results["scenarios"][scenario][str(workers)] = result
+                    print(f"{scenario:<10} {workers:>3} workers {result['throughput_rps']:9.1f} req/s"
+                          + (f" | efficiency {result['efficiency']:.2f}" if "efficiency" in result else "")
+                          + (f" | errors {result['errors']}" if result["errors"] else ""))
+
+    output = args.output or os.path.join("benchmarks", "results", f"workers-{results['meta']['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"results saved to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
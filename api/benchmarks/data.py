@@ -0,0 +1,76 @@
+"""
+Synthetic users, workouts and plans shared by the benchmarks, and the seeding of the benchmark database.
+
+The workouts and plans are built as the bodies of the requests (the date as "YYYY-MM-DD"), and the
+stored workouts and the histories as they are read from the database (the date as a datetime).
+"""
+import datetime
+import subprocess
+
+BENCH_DATABASE = "sportreg_bench"
+PASSWORD = "benchpass1"
+FIRST_DAY = datetime.datetime(2020, 1, 1)
+
+def bench_username(i: int):
+    return f"bench{i:06d}"
+
+def build_exercises(count: int):
+    return [{"name": f"Exercise {j}", "sets": 4, "reps": "45s" if j % 3 == 0 else 10, "rest_minutes": "2",
+             "instruments": [{"name": "Dumbbell", "weight": 12.5}], "instruction": "Slow eccentric"}
+            for j in range(count)]
+
+def build_workout(day: int, exercises: int = 6):
+    date = FIRST_DAY + datetime.timedelta(days=day)
+    return {"date": date.date().isoformat(), "exercises": build_exercises(exercises), "completed": day % 3 != 0,
+            "post_workout_comments": "Felt good" if day % 2 else None}
+
+def build_plan(day: int, days: int = 7, exercises: int = 6):
+    date = FIRST_DAY + datetime.timedelta(days=day)
+    return {"date": date.date().isoformat(), "general_instructions": "Warm up",
+            "plan": [{"day": plan_day, "exercises": build_exercises(exercises), "completed": day % 2 == 0 or plan_day < 3}
+                     for plan_day in range(1, days + 1)]}
+
+def build_stored_workout(day: int, exercises: int = 8):
+    return {**build_workout(day, exercises), "date": FIRST_DAY + datetime.timedelta(days=day)}
+
+def build_history(workouts: int):
+    # the newest first, like the cursor of the export, with a plan every tenth entry
+    history = []
+    for i in range(workouts - 1, -1, -1):
+        workout = build_stored_workout(i)
+        if i % 10 == 0:
+            workout = {"type": "plan", "date": workout["date"], "general_instructions": "Warm up",
+                       "plan": [{"day": day, "exercises": workout["exercises"], "completed": day % 2 == 0,
+                                 "post_workout_comments": None} for day in range(1, 8)]}
+        history.append(workout)
+    return history
+
+async def seed(args):
+    from app.dependencies.db_dependencies import get_db
+    from app.models.work_out import workout_adapter, plan_adapter
+    from app.repositories import users as users_repository
+    from app.repositories import workouts as workouts_repository
+    from app.repositories import plans as plans_repository
+    from app.services import passwords
+
+    db = get_db()
+    await db.client.drop_database(BENCH_DATABASE)
+    hashed_password = await passwords.hash_password(PASSWORD)
+    usernames = [bench_username(i) for i in range(args.users)]
+    for username in usernames:
+        await users_repository.insert_user(db, {"username": username, "hashed_password": hashed_password,
+                                                "fecha_registro": datetime.datetime.now(datetime.timezone.utc)})
+        for start in range(0, args.workouts, 500):
+            workouts = [workout_adapter.validate_python(build_workout(day)) for day in range(start, min(start + 500, args.workouts))]
+            await workouts_repository.insert_workouts(db, username, workouts)
+        plans = [plan_adapter.validate_python(build_plan(day * 7, args.plan_days)) for day in range(args.plans)]
+        if plans:
+            await plans_repository.insert_plans(db, username, plans)
+    return usernames
+
+def git_commit():
+    # the commit the results belong to
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,58 @@
+"""
+A throwaway mongod for the benchmarks: started on a free port with a temporary data directory,
+stopped and removed on exit. Needs the "mongod" binary (MongoDB 5.0 or later) in the PATH.
+"""
+import contextlib
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_ready(uri: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    client = MongoClient(uri, serverSelectionTimeoutMS=500)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"mongod exited with code {process.returncode}")
+            try:
+                client.admin.command("ping")
+                return
+            except PyMongoError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"mongod did not answer in {timeout} seconds")
+    finally:
+        client.close()
+
+@contextlib.contextmanager
+def local_mongod(binary: str = "mongod", timeout: float = 30):
+    """
+    Start a mongod and yield its uri
+    """
+    path = shutil.which(binary)
+    if path is None:
+        raise RuntimeError(f"{binary} is not in the PATH, install MongoDB or pass the uri of a running one in MONGO_URI")
+    dbpath = tempfile.mkdtemp(prefix="sportreg-bench-")
+    port = free_port()
+    process = subprocess.Popen([path, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        uri = f"mongodb://127.0.0.1:{port}/"
+        wait_until_ready(uri, process, timeout)
+        yield uri
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(dbpath, ignore_errors=True)
@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Define the base URL and the output directory
-BASE_URL="http://localhost/api/markdown/get/workouts"
+BASE_URL="http://localhost/api/markdown/get/workouts/bulk"
 OUTPUT_DIR="/home/iswladi/Documents/Entrenamientos"
 
 # Create the output directory if it doesn't exist
@@ -10,15 +10,28 @@ mkdir -p "$OUTPUT_DIR"
 # Array of current users
 CURRENT_USERS=("wladi" "mime" "mama")
 
-# Loop through each current user and make a request
+# Build the query with every user, the api renders them in parallel and answers with a tar archive
+QUERY="lang=es"
 for USER in "${CURRENT_USERS[@]}"
 do
-  # Define the output file path
-  OUTPUT_FILE="$OUTPUT_DIR/$USER.md"
-
-  # Make the curl request and save the response
-  curl -X 'GET' \
-    "$BASE_URL?current_user=$USER&lang=es" \
-    -H 'accept: text/markdown' \
-    -o "$OUTPUT_FILE"
+  QUERY="$QUERY&users=$USER"
 done
+
+# Where the ETag of the last download is kept
+ETAG_FILE="$OUTPUT_DIR/.markdowns.etag"
+TMP_FILE="$(mktemp)"
+
+# Make a single curl request, the api answers 304 without a body if no user changed since the saved ETag
+STATUS=$(curl -s -X 'GET' \
+  "$BASE_URL?$QUERY" \
+  -H 'accept: application/x-tar' \
+  --etag-compare "$ETAG_FILE" \
+  --etag-save "$ETAG_FILE" \
+  -o "$TMP_FILE" \
+  -w '%{http_code}')
+
+# Only replace the files when there are new markdowns, the archive has a <user>.md per user
+if [ "$STATUS" = "200" ]; then
+  tar -xf "$TMP_FILE" -C "$OUTPUT_DIR"
+fi
+rm -f "$TMP_FILE"